@@ -0,0 +1,130 @@
+"""
+Benchmark dos backends de extração de PDF
+
+Executa cada backend sobre um corpus de PDFs (sem cache Redis e sem pool)
+e reporta páginas/s, tempo total e pico de memória (RSS) por backend.
+Cada backend roda em um processo próprio para que o pico de memória de um
+não contamine a medição do outro.
+
+Uso:
+    python benchmark_backends.py ./corpus
+    python benchmark_backends.py ./corpus --backends pypdf2,pymupdf --repeat 3 --json
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from typing import Any, Dict, List
+
+from pdf_backends import BACKENDS, get_backend
+
+
+def _find_pdfs(corpus: str) -> List[str]:
+    """Lista os PDFs do corpus (arquivo único ou diretório, recursivo)"""
+    if os.path.isfile(corpus):
+        return [corpus]
+    paths = []
+    for root, _, files in os.walk(corpus):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+    return sorted(paths)
+
+
+def _peak_rss_mb() -> float:
+    """Pico de RSS do processo atual em MB (ru_maxrss é KB no Linux, bytes no macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_backend(backend_name: str, paths: List[str], repeat: int) -> Dict[str, Any]:
+    """Extrai todas as páginas do corpus com um backend (executado em processo separado)"""
+    backend = get_backend(backend_name)
+    documents = []
+    for path in paths:
+        with open(path, "rb") as pdf_file:
+            documents.append((path, pdf_file.read()))
+    baseline_mb = _peak_rss_mb()
+
+    pages = 0
+    chars = 0
+    errors = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path, pdf_bytes in documents:
+            try:
+                doc = backend.open(io.BytesIO(pdf_bytes))
+                try:
+                    for page_num in range(backend.page_count(doc)):
+                        chars += len(backend.extract_page(doc, page_num) or "")
+                        pages += 1
+                finally:
+                    backend.close(doc)
+            except Exception as e:
+                errors.append(f"{os.path.basename(path)}: {e}")
+    elapsed = time.perf_counter() - start
+
+    return {
+        "backend": backend.name,
+        "version": backend.version,
+        "documents": len(documents) * repeat,
+        "pages": pages,
+        "chars": chars,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 1) if elapsed > 0 else 0.0,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "extraction_rss_mb": round(_peak_rss_mb() - baseline_mb, 1),
+        "errors": errors,
+    }
+
+
+def _run_isolated(backend_name: str, paths: List[str], repeat: int) -> Dict[str, Any]:
+    """Roda o benchmark de um backend em um processo novo (spawn)"""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(_run_backend, (backend_name, paths, repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de extração de PDF")
+    parser.add_argument("corpus", help="Diretório (ou arquivo) com os PDFs")
+    parser.add_argument("--backends", default=",".join(BACKENDS),
+                        help=f"Backends separados por vírgula (padrão: {','.join(BACKENDS)})")
+    parser.add_argument("--repeat", type=int, default=1, help="Repetições do corpus por backend")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    paths = _find_pdfs(args.corpus)
+    if not paths:
+        parser.error(f"Nenhum PDF encontrado em {args.corpus}")
+
+    results = []
+    for backend_name in [name.strip() for name in args.backends.split(",") if name.strip()]:
+        try:
+            get_backend(backend_name)
+        except ValueError as e:
+            results.append({"backend": backend_name, "skipped": str(e)})
+            continue
+        results.append(_run_isolated(backend_name, paths, args.repeat))
+
+    if args.json:
+        print(json.dumps({"corpus": args.corpus, "files": len(paths), "results": results}, indent=2, ensure_ascii=False))
+        return
+
+    print(f"📚 Corpus: {len(paths)} PDF(s) em {args.corpus} (x{args.repeat})\n")
+    print(f"{'backend':<10} {'versão':<10} {'páginas':>8} {'seg':>8} {'pág/s':>9} {'pico MB':>9} {'Δ MB':>8} {'erros':>6}")
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['backend']:<10} ⚠️ {result['skipped']}")
+            continue
+        print(f"{result['backend']:<10} {result['version']:<10} {result['pages']:>8} {result['seconds']:>8.3f} "
+              f"{result['pages_per_sec']:>9.1f} {result['peak_rss_mb']:>9.1f} {result['extraction_rss_mb']:>8.1f} "
+              f"{len(result['errors']):>6}")
+        for error in result["errors"][:5]:
+            print(f"    ❌ {error}")
+
+
+if __name__ == "__main__":
+    main()
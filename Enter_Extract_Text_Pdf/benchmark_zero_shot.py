@@ -0,0 +1,131 @@
+"""
+Comparação de acurácia e latência dos backends zero-shot (torch fp32 × ONNX × ONNX int8)
+
+Cada backend classifica os mesmos textos com os mesmos labels. A referência
+é o backend torch (fp32): para os demais são reportados a concordância do
+melhor label e a diferença média/máxima dos scores. Latência por texto
+(p50/p95, lote 1) e vazão com lotes (--batch-size) são medidas após um
+aquecimento.
+
+Uso:
+    python benchmark_zero_shot.py
+    python benchmark_zero_shot.py --texts blocos.txt --labels "label ou título de um campo,valor ou dado extraído" --json
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Any, Dict, List
+
+from zero_shot_onnx import ZERO_SHOT_BACKENDS, load_zero_shot_pipeline
+
+# Blocos típicos de documentos (labels e valores) usados quando --texts não é informado
+SAMPLE_TEXTS = [
+    "Nome Completo:", "JOANA D'ARC", "CPF:", "123.456.789-00", "Endereço:", "Rua das Flores, 123 - Centro",
+    "Data de Nascimento:", "12/03/1990", "Inscrição:", "101943", "Seccional:", "PR", "Subseção:",
+    "CONSELHO SECCIONAL - PARANÁ", "Categoria:", "SUPLEMENTAR", "Telefone Profissional:", "(41) 99999-0000",
+    "Situação:", "Situação Regular", "Valor total da fatura", "R$ 1.234,56", "Vencimento", "10/11/2025",
+]
+SAMPLE_LABELS = ["label ou título de um campo", "valor ou dado extraído"]
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))]
+
+
+def _run_backend(classifier, texts: List[str], labels: List[str], template: str, batch_size: int,
+                 repeat: int) -> Dict[str, Any]:
+    """Latência por texto (lote 1), vazão em lote e resultados do backend"""
+    classifier(texts[0], labels, hypothesis_template=template)  # aquecimento
+
+    latencies = []
+    outputs = []
+    for _ in range(repeat):
+        outputs = []
+        for text in texts:
+            start = time.perf_counter()
+            outputs.append(classifier(text, labels, hypothesis_template=template))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        classifier(texts, labels, hypothesis_template=template, batch_size=batch_size)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "batch_texts_per_sec": round(len(texts) * repeat / batch_seconds, 1),
+        "outputs": outputs,
+    }
+
+
+def _compare(reference: List[Dict[str, Any]], outputs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Concordância do melhor label e diferença dos scores em relação à referência"""
+    agreement = sum(1 for ref, out in zip(reference, outputs) if ref["labels"][0] == out["labels"][0])
+    diffs = []
+    for ref, out in zip(reference, outputs):
+        out_scores = dict(zip(out["labels"], out["scores"]))
+        diffs.extend(abs(score - out_scores[label]) for label, score in zip(ref["labels"], ref["scores"]))
+    return {
+        "top1_agreement": round(agreement / len(reference), 4),
+        "mean_score_diff": round(statistics.mean(diffs), 4),
+        "max_score_diff": round(max(diffs), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara os backends zero-shot (acurácia e latência)")
+    parser.add_argument("--model", default=os.getenv("ZERO_SHOT_MODEL", "MoritzLaurer/mDeBERTa-v3-base-xnli-multilingual-nli-2mil7"))
+    parser.add_argument("--backends", default=",".join(ZERO_SHOT_BACKENDS),
+                        help=f"Backends separados por vírgula (padrão: {','.join(ZERO_SHOT_BACKENDS)}; o primeiro é a referência)")
+    parser.add_argument("--texts", help="Arquivo com um texto por linha (padrão: blocos de exemplo)")
+    parser.add_argument("--labels", default=",".join(SAMPLE_LABELS), help="Labels candidatas separadas por vírgula")
+    parser.add_argument("--template", default="Este texto é {}", help="Template das hipóteses")
+    parser.add_argument("--batch-size", type=int, default=16, help="Pares por forward na medição de vazão")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições do conjunto de textos")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as texts_file:
+            texts = [line.strip() for line in texts_file if line.strip()]
+    else:
+        texts = SAMPLE_TEXTS
+    labels = [label.strip() for label in args.labels.split(",") if label.strip()]
+
+    results = []
+    reference = None
+    for backend in [name.strip() for name in args.backends.split(",") if name.strip()]:
+        try:
+            classifier = load_zero_shot_pipeline(args.model, backend)
+        except (ImportError, ValueError) as e:
+            results.append({"backend": backend, "skipped": str(e)})
+            continue
+        result = _run_backend(classifier, texts, labels, args.template, args.batch_size, args.repeat)
+        outputs = result.pop("outputs")
+        if reference is None:
+            reference = outputs
+        result.update(_compare(reference, outputs))
+        results.append({"backend": backend, **result})
+
+    if args.json:
+        print(json.dumps({"model": args.model, "texts": len(texts), "labels": labels, "results": results},
+                         indent=2, ensure_ascii=False))
+        return
+
+    print(f"🤖 {args.model} - {len(texts)} texto(s) x {len(labels)} label(s) (x{args.repeat})\n")
+    print(f"{'backend':<10} {'p50 ms':>8} {'p95 ms':>8} {'lote t/s':>9} {'top1':>7} {'Δ médio':>8} {'Δ máx':>8}")
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['backend']:<10} ⚠️ {result['skipped']}")
+            continue
+        print(f"{result['backend']:<10} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['batch_texts_per_sec']:>9.1f} "
+              f"{result['top1_agreement']:>7.2%} {result['mean_score_diff']:>8.4f} {result['max_score_diff']:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,5 +3,6 @@ Cache module for embeddings and other data
 """
 from .redis_client import RedisClient
 from .embedding_cache import EmbeddingCache
+from .embedding_codec import encode_embedding, decode_embedding
 
-__all__ = ['RedisClient', 'EmbeddingCache']
+__all__ = ['RedisClient', 'EmbeddingCache', 'encode_embedding', 'decode_embedding']
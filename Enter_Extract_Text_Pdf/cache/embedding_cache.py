@@ -3,12 +3,12 @@ Cache de embeddings usando Redis
 """
 import hashlib
 import json
-import pickle
 import numpy as np
 from typing import Optional, List
 from datetime import datetime, timedelta
 import logging
 
+from .embedding_codec import encode_embedding, decode_embedding, EMBEDDING_FORMAT_VERSION, EMBEDDING_CACHE_DTYPE
 from .redis_client import RedisClient
 
 logger = logging.getLogger(__name__)
@@ -17,14 +17,15 @@ logger = logging.getLogger(__name__)
 class EmbeddingCache:
     """Cache de embeddings com Redis"""
     
-    def __init__(self, model_name: str = "paraphrase-multilingual-mpnet-base-v2"):
+    def __init__(self, model_name: str = "paraphrase-multilingual-mpnet-base-v2", case_sensitive: bool = False):
         self.model_name = model_name
+        self.case_sensitive = case_sensitive  # modelos cased: "CPF" e "cpf" têm embeddings diferentes
         self.ttl_seconds = 30 * 24 * 60 * 60  # 30 dias
         self.redis = RedisClient.get_instance()
     
     def _normalize_text(self, text: str) -> str:
         """Normaliza texto para hashing consistente"""
-        return text.lower().strip()
+        return text.strip() if self.case_sensitive else text.lower().strip()
     
     def _calculate_hash(self, text: str) -> str:
         """Calcula hash SHA-256 do texto normalizado"""
@@ -57,12 +58,14 @@ class EmbeddingCache:
                 logger.debug(f"Cache MISS for text: {text[:30]}...")
                 return None
             
-            # Deserializar embedding (stored as pickle bytes)
+            # Deserializar embedding (binário versionado; pickle das entradas antigas é migrado)
             embedding_bytes = cached_data.get(b'embedding')
             if not embedding_bytes:
                 return None
             
-            embedding = pickle.loads(embedding_bytes)
+            embedding, legacy = decode_embedding(embedding_bytes)
+            if legacy:
+                self._migrate(self.redis, cache_key, embedding)
             logger.debug(f"Cache HIT for text: {text[:30]}... (dim: {len(embedding)})")
             
             return embedding
@@ -71,6 +74,28 @@ class EmbeddingCache:
             logger.warning(f"Error getting cached embedding: {e}")
             return None
     
+    def _build_cache_data(self, text: str, embedding: np.ndarray) -> dict:
+        """Campos do hash de um embedding"""
+        return {
+            'text': text[:100],  # Primeiros 100 chars para debug
+            'text_normalized': self._normalize_text(text)[:100],
+            'embedding': encode_embedding(embedding),  # cabeçalho + float32/float16 (embedding_codec)
+            'embedding_dim': len(embedding),
+            'model': self.model_name,
+            'created_at': datetime.utcnow().isoformat(),
+            'cache_version': f'{EMBEDDING_FORMAT_VERSION}.0'
+        }
+    
+    def _migrate(self, client, cache_key: str, embedding: np.ndarray):
+        """Regrava no formato binário atual um embedding lido no formato antigo (pickle)"""
+        try:
+            client.hset(cache_key, mapping={
+                'embedding': encode_embedding(embedding),
+                'cache_version': f'{EMBEDDING_FORMAT_VERSION}.0'
+            })
+        except Exception as e:
+            logger.debug(f"Failed to migrate cached embedding (non-critical): {e}")
+    
     def set(self, text: str, embedding: np.ndarray) -> bool:
         """
         Salva embedding no cache
@@ -88,21 +113,8 @@ class EmbeddingCache:
         try:
             cache_key = self._build_cache_key(text)
             
-            # Serializar embedding como pickle (mais eficiente que JSON)
-            embedding_bytes = pickle.dumps(embedding.tolist() if isinstance(embedding, np.ndarray) else embedding)
-            
-            cache_data = {
-                'text': text[:100],  # Primeiros 100 chars para debug
-                'text_normalized': self._normalize_text(text)[:100],
-                'embedding': embedding_bytes,
-                'embedding_dim': len(embedding),
-                'model': self.model_name,
-                'created_at': datetime.utcnow().isoformat(),
-                'cache_version': '1.0'
-            }
-            
             # Salvar no Redis
-            self.redis.hset(cache_key, mapping=cache_data)
+            self.redis.hset(cache_key, mapping=self._build_cache_data(text, embedding))
             self.redis.expire(cache_key, self.ttl_seconds)
             
             logger.debug(f"Cached embedding for text: {text[:30]}... (dim: {len(embedding)})")
@@ -116,20 +128,55 @@ class EmbeddingCache:
         """
         Obtém múltiplos embeddings do cache
         
+        Uma única verificação de disponibilidade e um único round trip
+        (pipeline com HGET do campo embedding de cada chave).
+        
         Args:
             texts: Lista de textos
             
         Returns:
             Lista de embeddings (None para cache miss)
         """
-        if not self.redis or not RedisClient.is_available():
+        if not texts or not self.redis or not RedisClient.is_available():
+            return [None] * len(texts)
+        
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for text in texts:
+                pipe.hget(self._build_cache_key(text), 'embedding')
+            cached = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Error getting cached embeddings batch: {e}")
             return [None] * len(texts)
         
         results = []
-        for text in texts:
-            embedding = self.get(text)
+        legacy_entries = []
+        for text, embedding_bytes in zip(texts, cached):
+            if not embedding_bytes:
+                results.append(None)
+                continue
+            try:
+                embedding, legacy = decode_embedding(embedding_bytes)
+            except Exception as e:
+                logger.warning(f"Error decoding cached embedding for text: {text[:30]}... ({e})")
+                results.append(None)
+                continue
             results.append(embedding)
+            if legacy:
+                legacy_entries.append((self._build_cache_key(text), embedding))
+        
+        # Entradas antigas (pickle) migradas para o formato binário em um único round trip
+        if legacy_entries:
+            pipe = self.redis.pipeline(transaction=False)
+            for cache_key, embedding in legacy_entries:
+                self._migrate(pipe, cache_key, embedding)
+            try:
+                pipe.execute(raise_on_error=False)
+                logger.debug(f"Migrated {len(legacy_entries)} cached embeddings to binary format v{EMBEDDING_FORMAT_VERSION}")
+            except Exception as e:
+                logger.debug(f"Failed to migrate cached embeddings (non-critical): {e}")
         
+        logger.debug(f"Cache batch: {sum(1 for r in results if r is not None)}/{len(texts)} hits")
         return results
     
     def set_batch(self, texts: List[str], embeddings: List[np.ndarray]) -> List[bool]:
@@ -143,17 +190,30 @@ class EmbeddingCache:
         Returns:
             Lista de booleanos indicando sucesso
         """
-        if not self.redis or not RedisClient.is_available():
-            return [False] * len(texts)
-        
         if len(texts) != len(embeddings):
             raise ValueError("texts and embeddings must have same length")
         
-        results = []
-        for text, embedding in zip(texts, embeddings):
-            success = self.set(text, embedding)
-            results.append(success)
+        if not texts or not self.redis or not RedisClient.is_available():
+            return [False] * len(texts)
+        
+        # HSET + EXPIRE de todas as chaves em um único round trip
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for text, embedding in zip(texts, embeddings):
+                cache_key = self._build_cache_key(text)
+                pipe.hset(cache_key, mapping=self._build_cache_data(text, embedding))
+                pipe.expire(cache_key, self.ttl_seconds)
+            replies = pipe.execute(raise_on_error=False)
+        except Exception as e:
+            logger.warning(f"Error caching embeddings batch: {e}")
+            return [False] * len(texts)
         
+        # Duas respostas por chave (HSET, EXPIRE)
+        results = [
+            not isinstance(replies[2 * i], Exception) and not isinstance(replies[2 * i + 1], Exception)
+            for i in range(len(texts))
+        ]
+        logger.debug(f"Cached embeddings batch: {sum(results)}/{len(texts)}")
         return results
     
     def delete(self, text: str) -> bool:
@@ -207,6 +267,7 @@ class EmbeddingCache:
                 "available": True,
                 "model": self.model_name,
                 "cached_embeddings": len(keys),
+                "format": f"v{EMBEDDING_FORMAT_VERSION} ({EMBEDDING_CACHE_DTYPE})",
                 "ttl_days": self.ttl_seconds / (24 * 60 * 60)
             }
         except Exception as e:
@@ -0,0 +1,203 @@
+"""
+Planejamento de CPUs por worker (threads do torch, executors e afinidade)
+
+Com vários workers do uvicorn, cada processo carregava o torch com uma
+thread intra-op por núcleo da máquina (ignorando a cota do cgroup), mais o
+executor e o pool de PDF dimensionados por os.cpu_count(): os workers
+disputavam os mesmos núcleos e a latência oscilava.
+
+O plano é calculado na importação (antes do torch/tokenizers, para que
+OMP_NUM_THREADS e afins tenham efeito):
+
+- CPUs efetivas = min(afinidade do processo, cota do cgroup v2/v1);
+- workers = WEB_CONCURRENCY (a mesma variável que o uvicorn usa como padrão
+  de --workers);
+- cada worker recebe CPUs efetivas / workers para as threads intra-op do
+  torch e do ONNX Runtime, o pool de PDF e o paralelismo dos tokenizers.
+
+Variáveis já definidas no ambiente têm precedência. Com CPU_PIN_WORKERS=true
+cada worker reserva um slot (lock de arquivo) e fixa sua afinidade em um
+conjunto disjunto de núcleos.
+"""
+import logging
+import math
+import os
+import tempfile
+from typing import Any, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+CPU_PIN_WORKERS = os.getenv("CPU_PIN_WORKERS", "false").lower() == "true"
+CPU_LAYOUT_LOCK_DIR = os.getenv("CPU_LAYOUT_LOCK_DIR", tempfile.gettempdir())
+
+_CGROUP_V2_MAX = "/sys/fs/cgroup/cpu.max"
+_CGROUP_V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+_CGROUP_V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+class CpuLayout(NamedTuple):
+    host_cpus: int  # os.cpu_count()
+    available_cpus: List[int]  # afinidade do processo
+    cgroup_quota: Optional[float]  # CPUs da cota do cgroup (None = sem cota)
+    effective_cpus: int
+    workers: int
+    cpus_per_worker: int
+    intra_op_threads: int
+    inter_op_threads: int
+    executor_threads: int
+    pdf_pool_workers: int
+    pdf_batch_concurrency: int
+    tokenizers_parallelism: bool
+
+
+def _read_cgroup_quota() -> Optional[float]:
+    """Cota de CPU do cgroup em CPUs (cgroup v2 e, na falta, v1)"""
+    try:
+        with open(_CGROUP_V2_MAX) as cpu_max:
+            quota, period = cpu_max.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(_CGROUP_V1_QUOTA) as quota_file, open(_CGROUP_V1_PERIOD) as period_file:
+            quota, period = int(quota_file.read()), int(period_file.read())
+        return None if quota <= 0 or period <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def _available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def plan_cpu_layout() -> CpuLayout:
+    """Calcula o plano a partir da topologia, do cgroup e das variáveis de ambiente"""
+    available = _available_cpus()
+    quota = _read_cgroup_quota()
+    effective = len(available) if quota is None else max(1, min(len(available), math.ceil(quota)))
+    workers = max(1, _env_int("WEB_CONCURRENCY", 1))
+    per_worker = max(1, effective // workers)
+
+    return CpuLayout(
+        host_cpus=os.cpu_count() or 1,
+        available_cpus=available,
+        cgroup_quota=quota,
+        effective_cpus=effective,
+        workers=workers,
+        cpus_per_worker=per_worker,
+        intra_op_threads=_env_int("CPU_INTRA_OP_THREADS", per_worker),
+        # Inferência serializada pelo scheduler: paralelismo entre operadores não compensa
+        inter_op_threads=_env_int("CPU_INTER_OP_THREADS", 1),
+        # I/O bloqueante e inferência sem scheduler
+        executor_threads=_env_int("CPU_EXECUTOR_THREADS", min(4, max(2, per_worker))),
+        pdf_pool_workers=_env_int("PDF_POOL_WORKERS", per_worker),
+        pdf_batch_concurrency=_env_int("PDF_BATCH_CONCURRENCY", 2 * per_worker),
+        tokenizers_parallelism=per_worker > 1,
+    )
+
+
+def _export_env(layout: CpuLayout):
+    """Limites de threads das bibliotecas nativas (precisam existir antes da importação delas)"""
+    defaults = {
+        "OMP_NUM_THREADS": layout.intra_op_threads,
+        "MKL_NUM_THREADS": layout.intra_op_threads,
+        "RAYON_RS_NUM_CPUS": layout.cpus_per_worker,
+        "TOKENIZERS_PARALLELISM": "true" if layout.tokenizers_parallelism else "false",
+        "PDF_POOL_WORKERS": layout.pdf_pool_workers,
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, str(value))
+
+
+# Plano do worker (calculado na importação)
+cpu_layout = plan_cpu_layout()
+_export_env(cpu_layout)
+
+# Slot do worker e núcleos fixados (apenas com CPU_PIN_WORKERS)
+worker_slot: Optional[int] = None
+pinned_cpus: Optional[List[int]] = None
+_slot_lock = None
+
+
+def _claim_worker_slot(workers: int) -> Optional[int]:
+    """Reserva o primeiro slot livre (lock exclusivo mantido enquanto o processo existir)"""
+    import fcntl
+
+    global _slot_lock
+    for slot in range(workers):
+        lock_file = open(os.path.join(CPU_LAYOUT_LOCK_DIR, f"cpu_layout_slot_{slot}.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        _slot_lock = lock_file
+        return slot
+    return None
+
+
+def apply_cpu_layout() -> Dict[str, Any]:
+    """Aplica o plano no worker (threads do torch e afinidade); chamar no startup, antes dos modelos"""
+    global worker_slot, pinned_cpus
+
+    layout = cpu_layout
+    if CPU_PIN_WORKERS and hasattr(os, "sched_setaffinity") and layout.workers > 1:
+        try:
+            worker_slot = _claim_worker_slot(layout.workers)
+        except OSError as e:
+            logger.warning(f"⚠️ Não foi possível reservar slot de CPU: {e}")
+        if worker_slot is None:
+            logger.warning("⚠️ Nenhum slot de CPU livre - worker sem afinidade fixa")
+        else:
+            start = worker_slot * layout.cpus_per_worker
+            pinned_cpus = [layout.available_cpus[(start + offset) % len(layout.available_cpus)]
+                           for offset in range(layout.cpus_per_worker)]
+            os.sched_setaffinity(0, pinned_cpus)
+
+    try:
+        import torch
+
+        torch.set_num_threads(layout.intra_op_threads)
+        try:
+            torch.set_num_interop_threads(layout.inter_op_threads)
+        except RuntimeError as e:
+            # Só pode ser definido antes do primeiro trabalho paralelo do torch
+            logger.warning(f"⚠️ Threads inter-op do torch já definidas: {e}")
+    except ImportError:
+        pass
+
+    quota = f"{layout.cgroup_quota:g}" if layout.cgroup_quota is not None else "sem cota"
+    logger.info(f"🧮 CPUs: {layout.effective_cpus} efetivas (host {layout.host_cpus}, afinidade "
+                f"{len(layout.available_cpus)}, cgroup {quota}) / {layout.workers} worker(s) → "
+                f"{layout.cpus_per_worker} por worker")
+    logger.info(f"   Threads intra/inter-op: {layout.intra_op_threads}/{layout.inter_op_threads}, "
+                f"executor: {layout.executor_threads}, pool de PDF: {layout.pdf_pool_workers}"
+                + (f", núcleos fixados {pinned_cpus} (slot {worker_slot})" if pinned_cpus else ""))
+    return describe_cpu_layout()
+
+
+def describe_cpu_layout() -> Dict[str, Any]:
+    """Plano e estado efetivo do worker (para o endpoint /system/layout)"""
+    runtime: Dict[str, Any] = {
+        "pid": os.getpid(),
+        "worker_slot": worker_slot,
+        "pinned_cpus": pinned_cpus,
+        "affinity": _available_cpus(),
+        "env": {name: os.environ.get(name) for name in
+                ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "RAYON_RS_NUM_CPUS", "TOKENIZERS_PARALLELISM")},
+    }
+    try:
+        import torch
+
+        runtime["torch_intra_op_threads"] = torch.get_num_threads()
+        runtime["torch_inter_op_threads"] = torch.get_num_interop_threads()
+    except ImportError:
+        pass
+    return {"plan": cpu_layout._asdict(), "runtime": runtime}
@@ -7,4 +7,10 @@ echo "📦 Instalando modelos de NLP..."
 echo "⬇️ Baixando modelo spaCy pt_core_news_lg..."
 python -m spacy download pt_core_news_lg
 
+# Modelo zero-shot em ONNX (apenas com ZERO_SHOT_BACKEND=onnx|onnx-int8 e optimum[onnxruntime] instalado)
+if [ "${ZERO_SHOT_BACKEND:-torch}" != "torch" ]; then
+    echo "⬇️ Exportando modelo zero-shot para ONNX (fp32 + int8)..."
+    python zero_shot_onnx.py export
+fi
+
 echo "✅ Modelos instalados com sucesso!"
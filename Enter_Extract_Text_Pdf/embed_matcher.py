@@ -63,8 +63,8 @@ def get_embedding_with_cache(text: str) -> torch.Tensor:
     if embedding_cache:
         cached = embedding_cache.get(text)
         if cached is not None:
-            # Cache HIT - converter para tensor
-            return torch.tensor(cached)
+            # Cache HIT - converter para tensor (float32 mesmo com EMBEDDING_CACHE_DTYPE=float16)
+            return torch.tensor(cached, dtype=torch.float32)
     
     # Cache MISS - calcular embedding
     embedding = model.encode(text, convert_to_tensor=True)
@@ -105,8 +105,8 @@ def get_embeddings_batch_with_cache(texts: List[str]) -> torch.Tensor:
         
         for i, (text, cached) in enumerate(zip(texts, cached_embeddings)):
             if cached is not None:
-                # Cache HIT
-                embeddings.append(torch.tensor(cached))
+                # Cache HIT (float32, como as saídas do modelo)
+                embeddings.append(torch.tensor(cached, dtype=torch.float32))
             else:
                 # Cache MISS - guardar para calcular depois
                 embeddings.append(None)
@@ -0,0 +1,177 @@
+"""
+Micro-batching de inferência entre requisições
+
+Os endpoints não chamam mais os modelos diretamente no event loop: cada
+chamada vira um job (função de lote, chave, entradas) enfileirado aqui. Um
+thread dedicado espera até INFERENCE_BATCH_WINDOW_MS pelo próximo job (ou
+até juntar INFERENCE_MAX_BATCH_SIZE entradas), agrupa os jobs de mesma
+função e chave em uma única chamada ao modelo e resolve o future de cada
+requisição com a sua fatia do resultado.
+
+A função de lote recebe (chave, entradas) e retorna uma sequência (lista ou
+tensor) com um resultado por entrada, na mesma ordem.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_SCHEDULER = os.getenv("INFERENCE_SCHEDULER", "true").lower() == "true"
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "5"))  # espera por jobs de outras requisições
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "64"))  # entradas por micro-lote (um job maior vai inteiro)
+
+BatchFunction = Callable[[Hashable, List[Any]], Sequence[Any]]
+
+
+class _Job(NamedTuple):
+    func: BatchFunction
+    key: Hashable
+    inputs: List[Any]
+    future: Future
+
+
+class MicroBatchScheduler:
+    """Fila única de inferência atendida por um thread dedicado"""
+
+    def __init__(self, max_batch_size: int = INFERENCE_MAX_BATCH_SIZE,
+                 window_ms: float = INFERENCE_BATCH_WINDOW_MS):
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._closed = False
+        self.batches = 0
+        self.jobs = 0
+        self.inputs = 0
+        self._thread = threading.Thread(target=self._loop, name="inference-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, func: BatchFunction, key: Hashable, inputs: List[Any]) -> Future:
+        """Enfileira um job; o future recebe um resultado por entrada"""
+        future: Future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("Scheduler de inferência encerrado"))
+        elif not inputs:
+            future.set_result([])
+        else:
+            self._queue.put(_Job(func, key, list(inputs), future))
+        return future
+
+    async def run(self, func: BatchFunction, key: Hashable, inputs: List[Any]) -> Sequence[Any]:
+        """Versão assíncrona de submit (cancelar a requisição descarta o job ainda não iniciado)"""
+        return await asyncio.wrap_future(self.submit(func, key, inputs))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "inputs": self.inputs,
+            "avg_jobs_per_batch": round(self.jobs / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def shutdown(self):
+        """Termina os jobs já enfileirados e encerra o thread"""
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=30)
+
+    def _loop(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            jobs = [job]
+            size = len(job.inputs)
+            deadline = time.monotonic() + self.window
+            stop = False
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                jobs.append(job)
+                size += len(job.inputs)
+
+            self._run(jobs)
+            if stop:
+                return
+
+    def _run(self, jobs: List[_Job]):
+        """Executa os jobs agrupados por (função, chave), uma chamada ao modelo por grupo"""
+        groups: Dict[Tuple[BatchFunction, Hashable], List[_Job]] = {}
+        for job in jobs:
+            # Jobs de requisições canceladas antes de começar são descartados
+            if job.future.set_running_or_notify_cancel():
+                groups.setdefault((job.func, job.key), []).append(job)
+
+        for (func, key), group in groups.items():
+            inputs = [item for job in group for item in job.inputs]
+            start = time.time()
+            try:
+                outputs = func(key, inputs)
+            except Exception as e:
+                for job in group:
+                    job.future.set_exception(e)
+                continue
+
+            offset = 0
+            for job in group:
+                job.future.set_result(outputs[offset:offset + len(job.inputs)])
+                offset += len(job.inputs)
+
+            self.batches += 1
+            self.jobs += len(group)
+            self.inputs += len(inputs)
+            logger.debug(f"⚙️ Micro-lote {getattr(func, '__name__', func)}: {len(group)} requisição(ões), "
+                         f"{len(inputs)} entradas em {time.time() - start:.3f}s")
+
+
+# Scheduler global (inicializado no startup)
+inference_scheduler: Optional[MicroBatchScheduler] = None
+
+
+def initialize_inference_scheduler() -> bool:
+    """Inicia o thread de inferência (INFERENCE_SCHEDULER=false → chamadas diretas no executor)"""
+    global inference_scheduler
+
+    if not INFERENCE_SCHEDULER:
+        logger.info("⚙️ Scheduler de inferência desabilitado (INFERENCE_SCHEDULER=false)")
+        inference_scheduler = None
+        return False
+
+    inference_scheduler = MicroBatchScheduler()
+    logger.info(f"✅ Scheduler de inferência iniciado (janela {INFERENCE_BATCH_WINDOW_MS:g}ms, "
+                f"até {INFERENCE_MAX_BATCH_SIZE} entradas por micro-lote)")
+    return True
+
+
+def shutdown_inference_scheduler():
+    """Encerra o thread de inferência"""
+    global inference_scheduler
+    if inference_scheduler is not None:
+        inference_scheduler.shutdown()
+        inference_scheduler = None
+        logger.info("🛑 Scheduler de inferência encerrado")
+
+
+async def run_inference(func: BatchFunction, key: Hashable, inputs: List[Any],
+                        executor: Optional[Executor] = None) -> Sequence[Any]:
+    """
+    Executa func(chave, entradas) pelo scheduler (micro-lotes entre requisições)
+    ou, com o scheduler desabilitado, diretamente no executor
+    """
+    if inference_scheduler is not None:
+        return await inference_scheduler.run(func, key, inputs)
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor, func, key, inputs)
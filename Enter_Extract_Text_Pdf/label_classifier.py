@@ -0,0 +1,323 @@
+"""
+Classificador destilado label × valor para o /nli/classify
+
+Com NLI_DECISIONS_LOG definido, o /nli/classify registra as decisões do
+modelo NLI (professor) nesse arquivo (JSONL, com rotação). A partir desse log é treinada uma regressão
+logística sobre o embedding do bloco (paraphrase-multilingual-MiniLM-L12-v2)
+e atributos léxicos (":" final, proporção de maiúsculas, dígitos, ...).
+
+No serviço, o classificador decide os blocos em que a probabilidade da
+classe prevista é >= LABEL_CLASSIFIER_THRESHOLD; os demais seguem para o
+NLI. Decisões do próprio classificador e do pré-filtro não são registradas
+(o log contém apenas decisões do NLI).
+
+Uso:
+    NLI_DECISIONS_LOG=data/nli_decisions.jsonl python label_classifier.py train
+    python label_classifier.py train --log data/nli_decisions.jsonl --min-confidence 0.6
+    python label_classifier.py evaluate --log data/nli_decisions.jsonl --threshold 0.9
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LABEL_CLASSIFIER = os.getenv("LABEL_CLASSIFIER", "true").lower() == "true"
+LABEL_CLASSIFIER_PATH = os.getenv("LABEL_CLASSIFIER_PATH", os.path.join(_BASE_DIR, "models", "label_classifier.joblib"))
+LABEL_CLASSIFIER_THRESHOLD = float(os.getenv("LABEL_CLASSIFIER_THRESHOLD", "0.90"))  # abaixo disso o bloco vai ao NLI
+# Log das decisões do NLI (dados de treino), desabilitado por padrão. ATENÇÃO: cada linha contém o
+# texto bruto do bloco do documento (nomes, CPF, endereços...): habilitar apenas em ambiente
+# controlado, com o arquivo em volume protegido, e apagar após o treino
+NLI_DECISIONS_LOG = os.getenv("NLI_DECISIONS_LOG", "")
+NLI_DECISIONS_LOG_MAX_MB = float(os.getenv("NLI_DECISIONS_LOG_MAX_MB", "50"))  # rotação ao atingir o tamanho
+NLI_DECISIONS_LOG_BACKUPS = int(os.getenv("NLI_DECISIONS_LOG_BACKUPS", "2"))  # arquivos rotacionados mantidos (.1, .2, ...)
+
+EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+
+_VALUE_PATTERN = re.compile(r"\d[\d.,/\-]*\d")  # datas, CPF/CNPJ, valores, telefones
+
+_log_lock = threading.Lock()
+
+
+def lexical_features(text: str) -> List[float]:
+    """Atributos léxicos do bloco (mesma ordem no treino e no serviço)"""
+    stripped = text.strip()
+    letters = [char for char in stripped if char.isalpha()]
+    words = stripped.split()
+    length = max(len(stripped), 1)
+    return [
+        1.0 if stripped.endswith(":") else 0.0,
+        sum(1 for char in letters if char.isupper()) / len(letters) if letters else 0.0,
+        sum(1 for char in stripped if char.isdigit()) / length,
+        sum(1 for char in stripped if not char.isalnum() and not char.isspace()) / length,
+        sum(1 for word in words if word[:1].isupper()) / len(words) if words else 0.0,
+        1.0 if _VALUE_PATTERN.search(stripped) else 0.0,
+        math.log1p(len(stripped)),
+        math.log1p(len(words)),
+    ]
+
+
+def build_features(texts: List[str], embeddings) -> np.ndarray:
+    """Embedding (n × d) concatenado aos atributos léxicos"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    lexical = np.array([lexical_features(text) for text in texts], dtype=np.float32)
+    return np.hstack([embeddings, lexical])
+
+
+class LabelClassifier:
+    """Regressão logística treinada com as decisões do NLI"""
+
+    def __init__(self, pipeline, embedding_model: str, metadata: Optional[Dict[str, Any]] = None):
+        self.pipeline = pipeline
+        self.embedding_model = embedding_model
+        self.metadata = metadata or {}
+
+    def predict_proba(self, texts: List[str], embeddings) -> np.ndarray:
+        """Probabilidade de cada bloco ser label"""
+        features = build_features(texts, embeddings)
+        label_column = list(self.pipeline.classes_).index(1)
+        return self.pipeline.predict_proba(features)[:, label_column]
+
+    def decide(self, texts: List[str], embeddings, threshold: float) -> Dict[str, Tuple[bool, float]]:
+        """
+        Decisões confiantes do classificador
+
+        Returns:
+            Dict {bloco: (é_label, confiança)} apenas dos blocos com confiança >= threshold
+        """
+        decided = {}
+        for text, probability in zip(texts, self.predict_proba(texts, embeddings).tolist()):
+            is_label = probability >= 0.5
+            confidence = probability if is_label else 1 - probability
+            if confidence >= threshold:
+                decided[text] = (is_label, confidence)
+        return decided
+
+    def save(self, path: str):
+        import joblib
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        joblib.dump({
+            "pipeline": self.pipeline,
+            "embedding_model": self.embedding_model,
+            "metadata": self.metadata,
+        }, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LabelClassifier":
+        import joblib
+
+        data = joblib.load(path)
+        return cls(data["pipeline"], data["embedding_model"], data.get("metadata"))
+
+
+def train_classifier(texts: List[str], labels: List[int], embeddings) -> LabelClassifier:
+    """Ajusta padronização + regressão logística (classes balanceadas)"""
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    pipeline = make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000, class_weight="balanced"))
+    pipeline.fit(build_features(texts, embeddings), labels)
+    return LabelClassifier(pipeline, EMBEDDING_MODEL, {"samples": len(texts), "trained_at": int(time.time())})
+
+
+def evaluate_classifier(classifier: LabelClassifier, texts: List[str], labels: List[int], embeddings,
+                        threshold: float) -> Dict[str, Any]:
+    """Acurácia geral, cobertura no threshold (blocos que dispensam o NLI) e acurácia nessa cobertura"""
+    probabilities = classifier.predict_proba(texts, embeddings)
+    predictions = (probabilities >= 0.5).astype(int)
+    expected = np.asarray(labels)
+    confident = np.maximum(probabilities, 1 - probabilities) >= threshold
+
+    true_labels = int(((predictions == 1) & (expected == 1)).sum())
+    predicted_labels = int((predictions == 1).sum())
+    actual_labels = int((expected == 1).sum())
+    return {
+        "samples": len(texts),
+        "accuracy": round(float((predictions == expected).mean()), 4),
+        "label_precision": round(true_labels / predicted_labels, 4) if predicted_labels else 0.0,
+        "label_recall": round(true_labels / actual_labels, 4) if actual_labels else 0.0,
+        "threshold": threshold,
+        "coverage": round(float(confident.mean()), 4),
+        "covered_accuracy": round(float((predictions[confident] == expected[confident]).mean()), 4) if confident.any() else 0.0,
+    }
+
+
+# ============================================================================
+# LOG DE DECISÕES DO NLI
+# ============================================================================
+
+def _rotate_log(path: str, backups: int):
+    """path → path.1 → path.2 ...; o mais antigo além de backups é apagado"""
+    for index in range(backups, 0, -1):
+        source = f"{path}.{index - 1}" if index > 1 else path
+        if os.path.exists(source):
+            os.replace(source, f"{path}.{index}")
+    if os.path.exists(path):
+        os.remove(path)  # backups = 0
+
+
+def log_nli_decisions(decisions: List[Dict[str, Any]]):
+    """
+    Acrescenta decisões do NLI ao log (uma linha JSON por bloco)
+
+    Escrita síncrona: no serviço, chamar no executor. Falhas são apenas logadas.
+    """
+    if not NLI_DECISIONS_LOG or not decisions:
+        return
+    try:
+        lines = "".join(json.dumps(decision, ensure_ascii=False) + "\n" for decision in decisions)
+        max_bytes = NLI_DECISIONS_LOG_MAX_MB * 1024 * 1024
+        with _log_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(NLI_DECISIONS_LOG)), exist_ok=True)
+            if max_bytes > 0 and os.path.exists(NLI_DECISIONS_LOG) and os.path.getsize(NLI_DECISIONS_LOG) >= max_bytes:
+                _rotate_log(NLI_DECISIONS_LOG, NLI_DECISIONS_LOG_BACKUPS)
+            with open(NLI_DECISIONS_LOG, "a", encoding="utf-8") as log_file:
+                log_file.write(lines)
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao registrar decisões do NLI: {e}")
+
+
+def load_nli_decisions(path: str, min_confidence: float = 0.0) -> Tuple[List[str], List[int]]:
+    """
+    Lê o log de decisões (incluindo os arquivos rotacionados); cada bloco entra uma vez (a decisão mais recente)
+
+    Returns:
+        (textos, classes) com classe 1 = label, 0 = valor
+    """
+    rotated = []
+    while os.path.exists(f"{path}.{len(rotated) + 1}"):
+        rotated.append(f"{path}.{len(rotated) + 1}")
+
+    by_text: Dict[str, int] = {}
+    for log_path in rotated[::-1] + [path]:  # do mais antigo ao atual
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path, encoding="utf-8") as log_file:
+            for line in log_file:
+                if not line.strip():
+                    continue
+                decision = json.loads(line)
+                if decision.get("confidence", 1.0) < min_confidence:
+                    continue
+                by_text.pop(decision["text"], None)
+                by_text[decision["text"]] = 1 if decision["is_label"] else 0
+    return list(by_text), list(by_text.values())
+
+
+# ============================================================================
+# CLASSIFICADOR GLOBAL (inicializado no startup)
+# ============================================================================
+
+label_classifier: Optional[LabelClassifier] = None
+
+
+def initialize_label_classifier() -> bool:
+    """Carrega o classificador treinado, se existir (sem ele todos os blocos ambíguos vão ao NLI)"""
+    global label_classifier
+
+    label_classifier = None
+    if not LABEL_CLASSIFIER:
+        logger.info("🏷️ Classificador destilado desabilitado (LABEL_CLASSIFIER=false)")
+        return False
+    if not os.path.exists(LABEL_CLASSIFIER_PATH):
+        logger.info(f"🏷️ Classificador destilado não treinado ({LABEL_CLASSIFIER_PATH}) - "
+                    f"execute: python label_classifier.py train")
+        return False
+
+    try:
+        classifier = LabelClassifier.load(LABEL_CLASSIFIER_PATH)
+    except Exception as e:
+        logger.error(f"❌ Erro ao carregar classificador destilado: {e}")
+        return False
+    if classifier.embedding_model != EMBEDDING_MODEL:
+        logger.warning(f"⚠️ Classificador destilado treinado com '{classifier.embedding_model}' "
+                       f"(esperado '{EMBEDDING_MODEL}') - ignorado")
+        return False
+
+    label_classifier = classifier
+    logger.info(f"✅ Classificador destilado carregado ({classifier.metadata.get('samples', '?')} amostras, "
+                f"threshold {LABEL_CLASSIFIER_THRESHOLD:g})")
+    return True
+
+
+# ============================================================================
+# CLI: treino e avaliação
+# ============================================================================
+
+def _encode(texts: List[str]) -> np.ndarray:
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(EMBEDDING_MODEL).encode(texts, batch_size=64, convert_to_numpy=True)
+
+
+def _print_metrics(title: str, metrics: Dict[str, Any]):
+    print(f"📊 {title}: {metrics['samples']} blocos")
+    print(f"   Acurácia: {metrics['accuracy']:.2%} | precisão (label): {metrics['label_precision']:.2%} | "
+          f"recall (label): {metrics['label_recall']:.2%}")
+    print(f"   Threshold {metrics['threshold']:g}: cobertura {metrics['coverage']:.2%} "
+          f"(acurácia {metrics['covered_accuracy']:.2%}) - o restante vai ao NLI")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina e avalia o classificador destilado label × valor")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("train", "Treina a partir do log de decisões do NLI"),
+                            ("evaluate", "Avalia o classificador salvo contra o log")):
+        command_parser = subparsers.add_parser(name, help=help_text)
+        command_parser.add_argument("--log", default=NLI_DECISIONS_LOG or None, required=not NLI_DECISIONS_LOG,
+                                    help="Log JSONL de decisões do NLI (padrão: NLI_DECISIONS_LOG)")
+        command_parser.add_argument("--model", default=LABEL_CLASSIFIER_PATH, help="Arquivo do classificador")
+        command_parser.add_argument("--min-confidence", type=float, default=0.5, help="Ignora decisões do NLI com confiança menor")
+        command_parser.add_argument("--threshold", type=float, default=LABEL_CLASSIFIER_THRESHOLD, help="Confiança mínima para dispensar o NLI")
+        command_parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    subparsers.choices["train"].add_argument("--test-size", type=float, default=0.2, help="Fração reservada para avaliação")
+    args = parser.parse_args()
+
+    texts, labels = load_nli_decisions(args.log, args.min_confidence)
+    if len(set(labels)) < 2:
+        parser.error(f"O log {args.log} precisa de decisões das duas classes ({len(texts)} bloco(s) lido(s))")
+    embeddings = _encode(texts)
+
+    if args.command == "evaluate":
+        metrics = evaluate_classifier(LabelClassifier.load(args.model), texts, labels, embeddings, args.threshold)
+        if args.json:
+            print(json.dumps(metrics, indent=2))
+        else:
+            _print_metrics("Avaliação", metrics)
+        return
+
+    # Avaliação em uma fração reservada; o modelo salvo é treinado com todos os blocos
+    indices = np.random.default_rng(0).permutation(len(texts))
+    test_count = int(len(texts) * args.test_size)
+    test, train = indices[:test_count], indices[test_count:]
+    metrics = None
+    if test_count and len(set(labels[i] for i in train)) == 2:
+        holdout = train_classifier([texts[i] for i in train], [labels[i] for i in train], embeddings[train])
+        metrics = evaluate_classifier(holdout, [texts[i] for i in test], [labels[i] for i in test], embeddings[test], args.threshold)
+
+    classifier = train_classifier(texts, labels, embeddings)
+    classifier.metadata["holdout"] = metrics
+    classifier.save(args.model)
+
+    if args.json:
+        print(json.dumps({"model": args.model, "samples": len(texts), "holdout": metrics}, indent=2))
+        return
+    print(f"✅ Classificador salvo em {args.model} ({len(texts)} blocos, {sum(labels)} labels)")
+    if metrics:
+        _print_metrics("Avaliação (fração reservada)", metrics)
+
+
+if __name__ == "__main__":
+    main()
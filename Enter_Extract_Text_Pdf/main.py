@@ -1,21 +1,38 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
-import PyPDF2
+from fastapi import FastAPI, HTTPException, Request, Query, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, constr
 import base64
-import io
 import logging
-from typing import Optional, List, Dict
+from typing import Any, Optional, List, Dict, Literal, Tuple
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 import time
-from transformers import pipeline
 import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import Counter
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+import anyio
 
 # Importar novos módulos
-from redis_client import initialize_redis, get_cache, set_cache, get_cache_stats
+# cpu_layout primeiro: define OMP/MKL/tokenizers threads antes da importação do torch
+from cpu_layout import cpu_layout, apply_cpu_layout, describe_cpu_layout
+from redis_client import initialize_redis, get_cache, set_cache, get_cache_stats, get_nli_cache_many, save_nli_cache_many
 from ner_extractor import initialize_ner, extract_entities, enrich_entities_with_patterns, extract_structured_patterns
 from embed_matcher import initialize_embeddings, match_fields_with_embeddings
 from gpt_fallback import initialize_openai, call_gpt_fallback, estimate_gpt_cost
+from pdf_extractor import initialize_pdf_pool, shutdown_pdf_pool, extract_document, iter_pages, iter_layout_pages, PdfSource, DocumentExtraction, ExtractionOptions, PDF_TIMEOUT_SECONDS, PDF_MEMORY_LIMIT_MB
+from pdf_workers import PdfBudgetExceeded, PdfExtractionCancelled
+from pdf_backends import get_backend, get_layout_backend, available_backends, PAGE_EMPTY, PAGE_IMAGE_ONLY
+from pdf_layout import LayoutLine, PositionalIndex
+from cache.embedding_cache import EmbeddingCache
+from zero_shot_onnx import load_zero_shot_pipeline, model_tag, ZERO_SHOT_BACKEND
+from inference_scheduler import initialize_inference_scheduler, shutdown_inference_scheduler, run_inference
+from nli_batching import classify_bucketed, supports_pair_assembly, NLI_LENGTH_BUCKETING
+from text_windows import split_windows, expand_windows, aggregate_zero_shot, pool_embeddings, ZERO_SHOT_WINDOW_TOKENS, ZERO_SHOT_WINDOW_OVERLAP, SEMANTIC_WINDOW_OVERLAP
+from label_classifier import initialize_label_classifier, log_nli_decisions, LABEL_CLASSIFIER_THRESHOLD, NLI_DECISIONS_LOG
 
 # Configuração de logging
 logging.basicConfig(
@@ -37,6 +54,9 @@ async def startup_event():
     """Inicializa todos os componentes ML na inicialização"""
     logger.info("🚀 Iniciando aplicação...")
     
+    # 0. Threads e afinidade do worker (antes de carregar os modelos)
+    apply_cpu_layout()
+    
     # 1. Redis
     redis_ok = initialize_redis()
     if not redis_ok:
@@ -57,50 +77,153 @@ async def startup_event():
     if not openai_ok:
         logger.warning("⚠️ OpenAI não disponível - fallback GPT desabilitado")
     
-    # 5. Zero-Shot Classification
-    logger.info("🤖 Carregando modelo Zero-Shot Classification...")
-    global zero_shot_classifier
+    # 5. Pool de processos para extração de PDF (antes dos modelos, para não herdar memória)
+    pdf_pool_ok = initialize_pdf_pool()
+    if not pdf_pool_ok:
+        logger.warning("⚠️ Pool de PDF não disponível - extração serial")
+    
+    # 6. Zero-Shot Classification
+    logger.info(f"🤖 Carregando modelo Zero-Shot Classification (backend: {ZERO_SHOT_BACKEND})...")
+    global zero_shot_classifier, zero_shot_model_name
     try:
-        zero_shot_classifier = pipeline(
-            "zero-shot-classification",
-            model="MoritzLaurer/mDeBERTa-v3-base-xnli-multilingual-nli-2mil7",
-            device=-1  # CPU (-1), para GPU use 0
-        )
+        zero_shot_classifier = load_zero_shot_pipeline(ZERO_SHOT_MODEL, ZERO_SHOT_BACKEND)
+        zero_shot_model_name = model_tag(ZERO_SHOT_MODEL, ZERO_SHOT_BACKEND)
         logger.info("✅ Modelo Zero-Shot carregado com sucesso!")
     except Exception as e:
         logger.error(f"❌ Erro ao carregar modelo: {e}")
         zero_shot_classifier = None
+        if ZERO_SHOT_BACKEND != "torch":
+            logger.warning("⚠️ Usando o backend torch (fp32) para o Zero-Shot")
+            try:
+                zero_shot_classifier = load_zero_shot_pipeline(ZERO_SHOT_MODEL, "torch")
+                zero_shot_model_name = model_tag(ZERO_SHOT_MODEL, "torch")
+            except Exception as e:
+                logger.error(f"❌ Erro ao carregar modelo: {e}")
     
-    # 6. Semantic Embeddings (para /semantic-extract)
+    # 7. Semantic Embeddings (para /semantic-extract)
     logger.info("🧠 Carregando modelo de embeddings para extração semântica...")
     global semantic_embeddings_model
     try:
         from sentence_transformers import SentenceTransformer
-        semantic_embeddings_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        semantic_embeddings_model = SentenceTransformer(SEMANTIC_EMBEDDINGS_MODEL)
         logger.info("✅ Modelo de embeddings carregado com sucesso!")
-        logger.info("   Modelo: paraphrase-multilingual-MiniLM-L12-v2")
+        logger.info(f"   Modelo: {SEMANTIC_EMBEDDINGS_MODEL}")
     except Exception as e:
         logger.error(f"❌ Erro ao carregar modelo de embeddings: {e}")
         semantic_embeddings_model = None
     
+    # Cache Redis dos embeddings semânticos (chaves por modelo)
+    global semantic_embedding_cache
+    semantic_embedding_cache = EmbeddingCache(model_name=SEMANTIC_EMBEDDINGS_MODEL, case_sensitive=True) if semantic_embeddings_model is not None else None
+    
+    # 8. Classificador destilado label × valor (opcional, treinado com as decisões do NLI)
+    initialize_label_classifier()
+    
+    # 9. Scheduler de inferência (micro-lotes entre requisições)
+    initialize_inference_scheduler()
+    
     logger.info("✅ Aplicação iniciada com sucesso!")
 
-# Thread pool para operações de I/O bloqueantes
-executor = ThreadPoolExecutor(max_workers=4)
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Libera recursos na finalização da aplicação"""
+    shutdown_inference_scheduler()
+    shutdown_pdf_pool()
+    background_executor.shutdown(wait=True)  # escritas de cache pendentes
+
+# Thread pool para operações de I/O bloqueantes (dimensionado pelo plano de CPUs do worker)
+executor = ThreadPoolExecutor(max_workers=cpu_layout.executor_threads)
+
+# Thread pool dedicado aos lotes de /extract-text/batch (cada thread só coordena; o parsing roda no pool de processos)
+PDF_BATCH_CONCURRENCY = cpu_layout.pdf_batch_concurrency
+batch_executor = ThreadPoolExecutor(max_workers=PDF_BATCH_CONCURRENCY)
+
+# Thread dedicada às escritas em segundo plano (cache de embeddings, log de decisões do NLI):
+# não disputa o executor com a inferência da próxima requisição
+background_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="background-write")
+
+def submit_background(description: str, fn, *args):
+    """Executa fn em background_executor sem aguardar; falhas são logadas"""
+    def log_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"⚠️ Falha em segundo plano ({description}): {future.exception()}")
+    future = background_executor.submit(fn, *args)
+    future.add_done_callback(log_failure)
+    return future
+
+# Uploads binários: até este tamanho ficam em memória, acima disso vão para disco
+PDF_SPOOL_MAX_MEMORY = int(os.getenv("PDF_SPOOL_MAX_MEMORY", str(8 * 1024 * 1024)))
+
+# Lotes de zero-shot: pares (texto, hipótese) por forward do modelo e máximo de textos por requisição
+ZERO_SHOT_BATCH_SIZE = int(os.getenv("ZERO_SHOT_BATCH_SIZE", "16"))
+ZERO_SHOT_MAX_BATCH_ITEMS = int(os.getenv("ZERO_SHOT_MAX_BATCH_ITEMS", "256"))
+# Tamanho máximo de cada texto zero-shot (acima do limite do modelo, o texto é dividido em janelas)
+ZERO_SHOT_MAX_TEXT_CHARS = int(os.getenv("ZERO_SHOT_MAX_TEXT_CHARS", "20000"))
+
+# Pré-filtro do /nli/classify: similaridade (embeddings) entre bloco e schema decide os casos claros
+NLI_PREFILTER = os.getenv("NLI_PREFILTER", "true").lower() == "true"
+NLI_PREFILTER_LABEL_THRESHOLD = float(os.getenv("NLI_PREFILTER_LABEL_THRESHOLD", "0.80"))  # >= → label sem NLI
+NLI_PREFILTER_VALUE_THRESHOLD = float(os.getenv("NLI_PREFILTER_VALUE_THRESHOLD", "0.20"))  # <= → valor sem NLI
+
+# Modo do /nli/classify: two_stage (label vs valor com 2 hipóteses) ou full (uma hipótese por campo)
+NLI_CLASSIFY_MODE = os.getenv("NLI_CLASSIFY_MODE", "two_stage")
+NLI_LABEL_HYPOTHESIS = "label ou título de um campo"
+NLI_VALUE_HYPOTHESIS = "valor ou dado extraído"
+
+# Logs detalhados (top 5 por label/candidato) dos endpoints semânticos: custo alto em documentos grandes
+SEMANTIC_DEBUG_LOGS = os.getenv("SEMANTIC_DEBUG_LOGS", "false").lower() == "true"
+
+# Modelo zero-shot (NLI): também identifica o modelo nas chaves do cache NLI
+ZERO_SHOT_MODEL = os.getenv("ZERO_SHOT_MODEL", "MoritzLaurer/mDeBERTa-v3-base-xnli-multilingual-nli-2mil7")
 
 # Variável global para zero-shot
 zero_shot_classifier = None
+zero_shot_model_name = ZERO_SHOT_MODEL  # modelo + backend (chaves do cache NLI)
 
 # Variável global para embeddings (semantic extraction)
+SEMANTIC_EMBEDDINGS_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
 semantic_embeddings_model = None
+semantic_embedding_cache = None
 
 # Modelos Pydantic para validação
-class PDFRequest(BaseModel):
+class PDFExtractionParams(BaseModel):
+    page_start: Optional[int] = Field(None, description="Primeira página a extrair (base 1)", ge=1)
+    page_end: Optional[int] = Field(None, description="Última página a extrair (base 1, inclusiva)", ge=1)
+    max_pages: Optional[int] = Field(None, description="Máximo de páginas a extrair", ge=1)
+    max_chars: Optional[int] = Field(None, description="Para a extração ao atingir N caracteres", ge=1)
+    backend: Optional[str] = Field(None, description="Backend de extração: pypdf2, pymupdf ou pdfium (padrão: PDF_BACKEND)")
+    layout: bool = Field(False, description="Retorna também as linhas com página, caixa e tamanho de fonte")
+    timeout_seconds: Optional[float] = Field(None, description="Tempo máximo da extração (limitado a PDF_TIMEOUT_SECONDS)", gt=0)
+    memory_limit_mb: Optional[float] = Field(None, description="Memória máxima do worker durante a extração (limitada a PDF_MEMORY_LIMIT_MB)", gt=0)
+    classify_pages: Optional[bool] = Field(None, description="Pré-análise: páginas vazias ou só com imagem não são extraídas (padrão: PDF_CLASSIFY_PAGES)")
+
+class PDFRequest(PDFExtractionParams):
+    pdf_base64: str = Field(..., description="PDF codificado em base64")
+
+class PDFBatchItem(PDFExtractionParams):
+    id: Optional[str] = Field(None, description="Identificador do documento (ecoado no resultado)")
     pdf_base64: str = Field(..., description="PDF codificado em base64")
 
+class PDFBatchRequest(BaseModel):
+    documents: List[PDFBatchItem] = Field(..., description="Documentos a extrair", min_items=1)
+
+class PDFLayoutLine(BaseModel):
+    page: int = Field(..., description="Página (base 1)")
+    text: str = Field(..., description="Texto da linha")
+    bbox: List[float] = Field(..., description="Caixa [x0, y0, x1, y1] em pontos, origem no topo da página")
+    font_size: float = Field(..., description="Tamanho da fonte")
+
 class PDFResponse(BaseModel):
     text: str = Field(..., description="Texto extraído do PDF")
     char_count: int = Field(..., description="Número de caracteres extraídos")
+    total_pages: int = Field(0, description="Número de páginas do PDF")
+    pages_extracted: int = Field(0, description="Número de páginas efetivamente extraídas")
+    cached_pages: int = Field(0, description="Páginas recuperadas do cache (sem reprocessar)")
+    truncated: bool = Field(False, description="Se o orçamento de caracteres (max_chars) interrompeu a extração")
+    lines: Optional[List[PDFLayoutLine]] = Field(None, description="Linhas posicionadas (apenas com layout=true)")
+    page_summary: Dict[str, int] = Field(default_factory=dict, description="Páginas entregues por classificação (text, empty, image_only)")
+    image_only_pages: List[int] = Field(default_factory=list, description="Páginas só com imagem, sem camada de texto (base 1, não extraídas)")
+    empty_pages: List[int] = Field(default_factory=list, description="Páginas vazias (base 1, não extraídas)")
     success: bool = Field(default=True, description="Status da operação")
 
 class ErrorResponse(BaseModel):
@@ -112,7 +235,7 @@ class HealthResponse(BaseModel):
 
 # Modelos para Zero-Shot Classification
 class ZeroShotRequest(BaseModel):
-    text: str = Field(..., description="Texto a ser classificado", max_length=512)
+    text: str = Field(..., description="Texto a ser classificado", max_length=ZERO_SHOT_MAX_TEXT_CHARS)
     candidate_labels: List[str] = Field(..., description="Lista de labels candidatas", min_items=1)
     hypothesis_template: Optional[str] = Field(
         default="Este texto é sobre {}",
@@ -129,7 +252,7 @@ class ZeroShotResponse(BaseModel):
     success: bool = Field(default=True, description="Status da operação")
 
 class BinaryClassificationRequest(BaseModel):
-    text: str = Field(..., description="Texto a ser validado", max_length=512)
+    text: str = Field(..., description="Texto a ser validado", max_length=ZERO_SHOT_MAX_TEXT_CHARS)
     category: str = Field(..., description="Categoria a validar")
     hypothesis_template: Optional[str] = Field(
         default="Este texto é {}",
@@ -143,6 +266,38 @@ class BinaryClassificationResponse(BaseModel):
     confidence: float = Field(..., description="Score de confiança (0.0 a 1.0)")
     success: bool = Field(default=True, description="Status da operação")
 
+class ZeroShotBatchRequest(BaseModel):
+    texts: List[constr(max_length=ZERO_SHOT_MAX_TEXT_CHARS)] = Field(..., description="Textos a classificar (longos são divididos em janelas)", min_items=1)
+    candidate_labels: List[str] = Field(..., description="Labels candidatas (as mesmas para todos os textos)", min_items=1)
+    hypothesis_template: Optional[str] = Field(
+        default="Este texto é sobre {}",
+        description="Template para construir hipóteses"
+    )
+    multi_label: bool = Field(default=False, description="Se True, permite múltiplas labels")
+
+class ZeroShotBatchResponse(BaseModel):
+    results: List[ZeroShotResponse] = Field(..., description="Resultados na ordem dos textos enviados")
+    total: int = Field(..., description="Número de textos classificados")
+    processing_time_ms: int = Field(..., description="Tempo de processamento")
+    success: bool = Field(default=True, description="Status da operação")
+
+class BinaryClassificationItem(BaseModel):
+    text: str = Field(..., description="Texto a ser validado", max_length=ZERO_SHOT_MAX_TEXT_CHARS)
+    category: str = Field(..., description="Categoria a validar")
+
+class BinaryClassificationBatchRequest(BaseModel):
+    items: List[BinaryClassificationItem] = Field(..., description="Pares texto/categoria a validar", min_items=1)
+    hypothesis_template: Optional[str] = Field(
+        default="Este texto é {}",
+        description="Template para construir hipótese"
+    )
+
+class BinaryClassificationBatchResponse(BaseModel):
+    results: List[BinaryClassificationResponse] = Field(..., description="Resultados na ordem dos pares enviados")
+    total: int = Field(..., description="Número de pares validados")
+    processing_time_ms: int = Field(..., description="Tempo de processamento")
+    success: bool = Field(default=True, description="Status da operação")
+
 # ============================================================================
 # MODELOS PARA /nli/classify (FASE 2 - Remoção de Labels)
 # ============================================================================
@@ -151,17 +306,31 @@ class NliClassifyRequest(BaseModel):
     label: Optional[str] = Field(None, description="Label do documento (para cache)")
     schema: Dict[str, str] = Field(..., description="Schema com {campo: descrição}")
     text_blocks: List[str] = Field(..., description="Lista de blocos de texto para classificar")
+    prefilter: Optional[bool] = Field(None, description="Pré-filtro com embeddings antes do NLI (padrão: NLI_PREFILTER)")
+    label_threshold: Optional[float] = Field(None, description="Similaridade mínima com o schema para label direto (padrão: NLI_PREFILTER_LABEL_THRESHOLD)", ge=0, le=1)
+    value_threshold: Optional[float] = Field(None, description="Similaridade máxima com o schema para valor direto (padrão: NLI_PREFILTER_VALUE_THRESHOLD)", ge=0, le=1)
+    mode: Optional[Literal["full", "two_stage"]] = Field(None, description="full: uma hipótese por campo; two_stage: label vs valor e campo só para labels (padrão: NLI_CLASSIFY_MODE)")
+    attribute_fields: bool = Field(False, description="two_stage: identifica o campo de cada label (segunda etapa)")
+    distilled: bool = Field(True, description="Classificador destilado antes do NLI (se treinado)")
+    distilled_threshold: Optional[float] = Field(None, description="Confiança mínima do classificador destilado (padrão: LABEL_CLASSIFIER_THRESHOLD)", ge=0.5, le=1)
 
 class ClassifiedBlock(BaseModel):
     text: str = Field(..., description="Texto do bloco")
     label: str = Field(..., description="'label' ou 'valor'")
     confidence: float = Field(..., description="Confiança da classificação")
+    source: str = Field("nli", description="Origem da decisão: cache, embedding, distilled ou nli")
+    field: Optional[str] = Field(None, description="Campo do schema ao qual o label pertence (quando conhecido)")
 
 class NliClassifyResponse(BaseModel):
     labels_detected: List[str] = Field(..., description="Blocos identificados como labels")
     classified_blocks: List[ClassifiedBlock] = Field(..., description="Todos os blocos classificados")
     processing_time_ms: int = Field(..., description="Tempo de processamento")
     cache_hits: int = Field(0, description="Quantos blocos vieram do cache")
+    prefilter_labels: int = Field(0, description="Blocos decididos como label pelo pré-filtro de embeddings")
+    prefilter_values: int = Field(0, description="Blocos decididos como valor pelo pré-filtro de embeddings")
+    distilled_blocks: int = Field(0, description="Blocos decididos pelo classificador destilado")
+    nli_blocks: int = Field(0, description="Blocos enviados ao modelo NLI")
+    nli_passes: int = Field(0, description="Pares (bloco, hipótese) avaliados pelo modelo NLI")
     total_blocks: int = Field(..., description="Total de blocos processados")
 
 # ============================================================================
@@ -193,6 +362,8 @@ class SemanticExtractResponse(BaseModel):
     processing_time_ms: int = Field(..., description="Tempo de processamento")
     total_candidates: int = Field(..., description="Total de candidatos avaliados")
     model_used: str = Field(..., description="Modelo de embedding usado")
+    cache_hits: int = Field(0, description="Textos (únicos) com embedding vindo do cache")
+    cache_misses: int = Field(0, description="Textos (únicos) calculados pelo modelo")
 
 # ============================================================================
 # MODELOS PARA /semantic-label-detect (Detecção de Labels no Texto)
@@ -217,6 +388,8 @@ class SemanticLabelDetectResponse(BaseModel):
     processing_time_ms: int = Field(..., description="Tempo de processamento")
     total_candidates: int = Field(..., description="Total de candidatos avaliados")
     model_used: str = Field(..., description="Modelo usado")
+    cache_hits: int = Field(0, description="Textos (únicos) com embedding vindo do cache")
+    cache_misses: int = Field(0, description="Textos (únicos) calculados pelo modelo")
 
 # ============================================================================
 # MODELOS PARA /smart-extract (FASE 2.5 - Smart Extract)
@@ -238,40 +411,413 @@ class FieldExtraction(BaseModel):
 class SmartExtractResponse(BaseModel):
     fields: Dict[str, Optional[str]] = Field(..., description="Campos extraídos com seus valores")
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
-    """Extrai texto de bytes de um arquivo PDF (função síncrona)."""
-    start_time = time.time()
+# ============================================================================
+# MODELOS PARA /layout-extract (Extração Posicional)
+# ============================================================================
+
+class LayoutExtractRequest(PDFRequest):
+    labels: Dict[str, str] = Field(..., description="Dicionário com {campo: texto do label como aparece no documento}")
+    direction: Literal["auto", "right", "below"] = Field("auto", description="Onde procurar o valor: auto (mesma linha → direita → abaixo), right ou below")
+    max_gap: Optional[float] = Field(None, description="Distância máxima (pontos) entre label e valor", gt=0)
+
+class LayoutFieldMatch(BaseModel):
+    value: Optional[str] = Field(None, description="Valor encontrado (None se o label não foi localizado)")
+    relation: Optional[str] = Field(None, description="Posição do valor em relação ao label: same_line, right ou below")
+    label_line: Optional[PDFLayoutLine] = Field(None, description="Linha onde o label foi encontrado")
+    value_line: Optional[PDFLayoutLine] = Field(None, description="Linha de onde o valor foi lido")
+
+class LayoutExtractResponse(BaseModel):
+    fields: Dict[str, Optional[str]] = Field(..., description="Extração final {campo: valor}")
+    matches: Dict[str, LayoutFieldMatch] = Field(..., description="Detalhe geométrico por campo")
+    total_lines: int = Field(..., description="Linhas indexadas")
+    total_pages: int = Field(0, description="Número de páginas do PDF")
+    processing_time_ms: int = Field(..., description="Tempo de processamento")
+
+async def watch_disconnect(http_request: Request, cancel_event: threading.Event, interval: float = 0.5):
+    """Sinaliza cancel_event quando o cliente desconecta (a extração em andamento é abortada)."""
+    while not cancel_event.is_set():
+        if await http_request.is_disconnected():
+            logger.warning("🔌 Cliente desconectou - cancelando extração")
+            cancel_event.set()
+            return
+        await asyncio.sleep(interval)
+
+async def extract_text_from_pdf_async(pdf_source: PdfSource, options: Optional[ExtractionOptions] = None,
+                                      http_request: Optional[Request] = None) -> DocumentExtraction:
+    """Wrapper assíncrono para extração de texto do PDF (cancelada se o cliente desconectar)."""
+    loop = asyncio.get_event_loop()
+    if http_request is None:
+        return await loop.run_in_executor(executor, extract_document, pdf_source, options)
+    
+    cancel_event = threading.Event()
+    options = (options or ExtractionOptions())._replace(cancel_event=cancel_event)
+    watcher = asyncio.create_task(watch_disconnect(http_request, cancel_event))
     try:
-        logger.info(f"📄 Iniciando extração de PDF ({len(pdf_bytes)} bytes)")
-        
-        pdf_file = io.BytesIO(pdf_bytes)
-        reader = PyPDF2.PdfReader(pdf_file)
-        
-        num_pages = len(reader.pages)
-        logger.info(f"📖 PDF contém {num_pages} página(s)")
-        
-        text = ""
-        for page_num in range(num_pages):
-            page_start = time.time()
-            page_text = reader.pages[page_num].extract_text()
-            text += page_text + "\n"
-            page_time = time.time() - page_start
-            logger.info(f"  ✓ Página {page_num + 1}/{num_pages} processada em {page_time:.3f}s ({len(page_text)} caracteres)")
-        
-        total_time = time.time() - start_time
-        logger.info(f"✅ Extração completa em {total_time:.3f}s - Total: {len(text.strip())} caracteres")
-        
-        return text.strip()
+        return await loop.run_in_executor(executor, extract_document, pdf_source, options)
+    finally:
+        cancel_event.set()
+        watcher.cancel()
+
+def pdf_error_to_http(e: Exception) -> HTTPException:
+    """Converte falhas de extração em respostas HTTP (limites → 422, cancelamento → 499)."""
+    if isinstance(e, PdfExtractionCancelled):
+        return HTTPException(status_code=499, detail=str(e))
+    if isinstance(e, PdfBudgetExceeded):
+        return HTTPException(status_code=422, detail=str(e))
+    return HTTPException(status_code=500, detail=str(e))
+
+def cap_limit(requested: Optional[float], server_limit: float) -> Optional[float]:
+    """Limite efetivo: o cliente pode reduzir, mas não ultrapassar, o limite do servidor (0 = sem limite)."""
+    if requested is None:
+        return None
+    return min(requested, server_limit) if server_limit else requested
+
+def build_extraction_options(params: PDFExtractionParams) -> ExtractionOptions:
+    """Converte os parâmetros da requisição em opções do extrator, validando a faixa de páginas."""
+    if params.page_start is not None and params.page_end is not None and params.page_end < params.page_start:
+        raise HTTPException(
+            status_code=400,
+            detail=f"page_end ({params.page_end}) deve ser maior ou igual a page_start ({params.page_start})"
+        )
+    try:
+        backend = (get_layout_backend(params.backend) if params.layout else get_backend(params.backend)).name
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ExtractionOptions(
+        page_start=params.page_start,
+        page_end=params.page_end,
+        max_pages=params.max_pages,
+        max_chars=params.max_chars,
+        backend=backend,
+        layout=params.layout,
+        timeout=cap_limit(params.timeout_seconds, PDF_TIMEOUT_SECONDS),
+        memory_mb=cap_limit(params.memory_limit_mb, PDF_MEMORY_LIMIT_MB),
+        classify_pages=params.classify_pages
+    )
+
+def layout_line_to_dict(line: LayoutLine) -> dict:
+    """Serializa uma linha do layout (página em base 1)."""
+    return {
+        "page": line.page + 1,
+        "text": line.text,
+        "bbox": [line.x0, line.y0, line.x1, line.y1],
+        "font_size": line.font_size
+    }
+
+def pages_of_kind(page_kinds: Dict[int, str], kind: str) -> List[int]:
+    """Páginas (base 1) com a classificação indicada."""
+    return [page_num + 1 for page_num, page_kind in sorted(page_kinds.items()) if page_kind == kind]
+
+def build_pdf_response(extraction: DocumentExtraction) -> PDFResponse:
+    """Monta a resposta padrão dos endpoints de extração."""
+    page_kinds = extraction.page_kinds or {}
+    return PDFResponse(
+        text=extraction.text,
+        char_count=len(extraction.text),
+        total_pages=extraction.total_pages,
+        pages_extracted=extraction.extracted_pages,
+        cached_pages=extraction.cached_pages,
+        truncated=extraction.truncated,
+        lines=[layout_line_to_dict(line) for line in extraction.lines] if extraction.lines is not None else None,
+        page_summary=dict(Counter(page_kinds.values())),
+        image_only_pages=pages_of_kind(page_kinds, PAGE_IMAGE_ONLY),
+        empty_pages=pages_of_kind(page_kinds, PAGE_EMPTY),
+        success=True
+    )
+
+async def spool_pdf_upload(http_request: Request):
+    """
+    Lê o corpo binário da requisição (application/pdf ou multipart) em um buffer spooled.
+    
+    O buffer fica em memória até PDF_SPOOL_MAX_MEMORY e depois é transferido para disco,
+    sem passar por base64 nem por uma string JSON.
+    """
+    content_type = http_request.headers.get("content-type", "").split(";")[0].strip().lower()
+    
+    if content_type == "multipart/form-data":
+        form = await http_request.form()
+        upload = form.get("file")
+        if upload is None:
+            upload = next((value for value in form.values() if hasattr(value, "file")), None)
+        if upload is None or not hasattr(upload, "file"):
+            raise HTTPException(
+                status_code=400,
+                detail="Nenhum arquivo encontrado no multipart (campo 'file')"
+            )
+        # UploadFile já é um SpooledTemporaryFile - usar diretamente
+        return upload.file
+    
+    if content_type not in ("application/pdf", "application/octet-stream"):
+        raise HTTPException(
+            status_code=415,
+            detail="Content-Type deve ser application/pdf, application/octet-stream ou multipart/form-data"
+        )
+    
+    buffer = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_MEMORY)
+    async for chunk in http_request.stream():
+        buffer.write(chunk)
+    
+    if buffer.tell() == 0:
+        buffer.close()
+        raise HTTPException(
+            status_code=400,
+            detail="Corpo da requisição vazio"
+        )
+    
+    buffer.seek(0)
+    return buffer
+
+async def read_pdf_source(http_request: Request, params: PDFExtractionParams):
+    """
+    Lê o PDF da requisição: JSON com pdf_base64 ou corpo binário/multipart.
+    
+    Returns:
+        (pdf_source, opções) - no JSON as opções vêm do corpo; nos demais, dos query params
+    """
+    content_type = http_request.headers.get("content-type", "").split(";")[0].strip().lower()
+    
+    if content_type == "application/json":
+        try:
+            pdf_request = PDFRequest(**(await http_request.json()))
+        except ValidationError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Requisição inválida: {e}"
+            )
+        except (ValueError, TypeError):
+            raise HTTPException(
+                status_code=400,
+                detail="Corpo JSON inválido"
+            )
+        try:
+            pdf_bytes = base64.b64decode(pdf_request.pdf_base64)
+        except Exception:
+            raise HTTPException(
+                status_code=400,
+                detail="PDF base64 inválido"
+            )
+        return pdf_bytes, build_extraction_options(pdf_request)
+    
+    options = build_extraction_options(params)
+    return await spool_pdf_upload(http_request), options
+
+def format_stream_event(event_type: str, data: dict, stream_format: str) -> str:
+    """Serializa um evento de streaming como linha NDJSON ou mensagem SSE."""
+    if stream_format == "sse":
+        return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return json.dumps({"type": event_type, **data}, ensure_ascii=False) + "\n"
+
+def generate_page_events(pdf_source: PdfSource, options: ExtractionOptions, stream_format: str, request_start: float):
+    """
+    Gera um evento por página extraída e um evento final de resumo.
+    
+    Eventos (compatíveis com o hook useSSE do frontend):
+    - progress: página extraída (page, total_pages, text, char_count, elapsed_ms, cached, kind; lines com layout=true)
+    - complete: resumo (total_pages, pages_extracted, char_count, truncated, image_only_pages, empty_pages, processing_time_ms)
+    - error: falha durante a extração (detail, page) - inclui limites de tempo/memória estourados
+    """
+    total_chars = 0
+    pages_done = 0
+    page_kinds: Dict[int, str] = {}
+    summary: Dict[str, Any] = {}
+    try:
+        if options.layout:
+            pages = iter_layout_pages(pdf_source, options, summary)
+        else:
+            pages = ((page, None) for page in iter_pages(pdf_source, options, summary))
+        
+        for page, lines in pages:
+            page_kinds[page.index] = page.kind
+            pages_done += 1
+            total_chars += len(page.text)
+            event = {
+                "page": page.index + 1,
+                "total_pages": page.total,
+                "text": page.text,
+                "char_count": len(page.text),
+                "elapsed_ms": int(page.seconds * 1000),
+                "cached": page.cached,
+                "kind": page.kind
+            }
+            if lines is not None:
+                event["lines"] = [layout_line_to_dict(line) for line in lines]
+            yield format_stream_event("progress", event, stream_format)
+        
+        elapsed_ms = int((time.time() - request_start) * 1000)
+        logger.info(f"✨ Streaming completo em {elapsed_ms}ms - {pages_done} página(s), {total_chars} caracteres")
+        yield format_stream_event("complete", {
+            "total_pages": summary["total_pages"],
+            "pages_extracted": pages_done,
+            "char_count": total_chars,
+            "truncated": summary["truncated"],
+            "image_only_pages": pages_of_kind(page_kinds, PAGE_IMAGE_ONLY),
+            "empty_pages": pages_of_kind(page_kinds, PAGE_EMPTY),
+            "processing_time_ms": elapsed_ms,
+            "success": True
+        }, stream_format)
     except Exception as e:
-        error_time = time.time() - start_time
-        logger.error(f"❌ Erro ao extrair texto do PDF após {error_time:.3f}s: {e}")
-        raise
+        logger.error(f"❌ Erro no streaming após {pages_done} página(s): {e}")
+        failed_page = getattr(e, "page", None)
+        yield format_stream_event("error", {
+            "detail": str(e),
+            "page": failed_page + 1 if failed_page is not None else pages_done + 1,
+            "success": False
+        }, stream_format)
+    finally:
+        if not isinstance(pdf_source, (bytes, bytearray)):
+            pdf_source.close()
 
-async def extract_text_from_pdf_async(pdf_bytes: bytes) -> str:
-    """Wrapper assíncrono para extração de texto do PDF."""
-    loop = asyncio.get_event_loop()
-    text = await loop.run_in_executor(executor, extract_text_from_pdf, pdf_bytes)
-    return text
+def close_batch_source(pdf_source):
+    """Fecha o arquivo enviado no multipart (base64 e bytes não têm o que fechar)"""
+    if not isinstance(pdf_source, (str, bytes, bytearray)):
+        pdf_source.close()
+
+def extract_batch_item(pdf_source, options: ExtractionOptions) -> DocumentExtraction:
+    """
+    Extrai um documento do lote (base64 é decodificado aqui, fora do event loop).
+    
+    O arquivo enviado é fechado aqui ao final, pela própria thread que o lê.
+    """
+    try:
+        source = pdf_source
+        if isinstance(source, str):
+            try:
+                source = base64.b64decode(source)
+            except Exception:
+                raise ValueError("PDF base64 inválido")
+        return extract_document(source, options)
+    finally:
+        close_batch_source(pdf_source)
+
+async def read_batch_documents(http_request: Request, params: PDFExtractionParams):
+    """
+    Lê os documentos do lote: JSON (PDFBatchRequest) ou multipart com vários arquivos.
+    
+    Returns:
+        Lista de (id, pdf_source, opções) na ordem recebida
+    """
+    content_type = http_request.headers.get("content-type", "").split(";")[0].strip().lower()
+    
+    if content_type == "application/json":
+        try:
+            batch_request = PDFBatchRequest(**(await http_request.json()))
+        except Exception as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Lote inválido: {e}"
+            )
+        return [
+            (item.id or str(index), item.pdf_base64, build_extraction_options(item)._replace(force_pool=True))
+            for index, item in enumerate(batch_request.documents)
+        ]
+    
+    if content_type == "multipart/form-data":
+        options = build_extraction_options(params)._replace(force_pool=True)
+        form = await http_request.form()
+        uploads = [value for _, value in form.multi_items() if hasattr(value, "file")]
+        if not uploads:
+            raise HTTPException(
+                status_code=400,
+                detail="Nenhum arquivo encontrado no multipart"
+            )
+        return [
+            (upload.filename or str(index), upload.file, options)
+            for index, upload in enumerate(uploads)
+        ]
+    
+    raise HTTPException(
+        status_code=415,
+        detail="Content-Type deve ser application/json ou multipart/form-data"
+    )
+
+async def stream_until_disconnect(events, cancel_event: threading.Event, http_request: Request):
+    """
+    Itera um gerador síncrono de eventos no threadpool; se o cliente desconectar,
+    sinaliza cancel_event para abortar a extração (o worker é morto).
+    
+    O next() em andamento no threadpool não é cancelável: a desconexão é detectada
+    por watch_disconnect, em paralelo, para abortar também a página em extração.
+    Ao final o gerador é fechado fora do event loop (o finally dele grava o cache
+    e encerra workers).
+    """
+    watcher = asyncio.create_task(watch_disconnect(http_request, cancel_event))
+    try:
+        async for event in iterate_in_threadpool(events):
+            yield event
+    finally:
+        cancel_event.set()
+        watcher.cancel()
+        # Protegido: com o cliente desconectado o escopo da resposta já está cancelado
+        with anyio.CancelScope(shield=True):
+            await run_in_threadpool(events.close)
+
+async def generate_batch_events(documents, stream_format: str, request_start: float):
+    """
+    Agenda todos os documentos do lote e emite um evento por documento, na ordem em que terminam.
+    
+    Eventos (compatíveis com o hook useSSE do frontend):
+    - result: documento extraído (index, id, text, char_count, total_pages, ...)
+    - error: falha em um documento específico (index, id, detail, page) - o lote continua
+    - complete: resumo (total, success_count, error_count, processing_time_ms)
+    
+    Cada documento tem o próprio orçamento de tempo/memória: um PDF patológico
+    tem o worker morto e vira um evento error, sem segurar o restante do lote.
+    """
+    cancel_event = threading.Event()
+    # Futures do executor (cancel() só tem efeito em documentos que ainda não começaram)
+    submitted = [
+        (batch_executor.submit(extract_batch_item, pdf_source, options._replace(cancel_event=cancel_event)), pdf_source)
+        for doc_id, pdf_source, options in documents
+    ]
+    pending = {
+        asyncio.wrap_future(future): (index, doc_id)
+        for index, ((future, _), (doc_id, _, _)) in enumerate(zip(submitted, documents))
+    }
+    success_count = 0
+    error_count = 0
+    
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                index, doc_id = pending.pop(future)
+                try:
+                    extraction = future.result()
+                    success_count += 1
+                    yield format_stream_event("result", {
+                        "index": index,
+                        "id": doc_id,
+                        **build_pdf_response(extraction).model_dump()
+                    }, stream_format)
+                except Exception as e:
+                    error_count += 1
+                    logger.warning(f"⚠️ Documento {doc_id} do lote falhou: {e}")
+                    failed_page = getattr(e, "page", None)
+                    yield format_stream_event("error", {
+                        "index": index,
+                        "id": doc_id,
+                        "detail": str(e),
+                        "page": failed_page + 1 if failed_page is not None else None,
+                        "success": False
+                    }, stream_format)
+        
+        elapsed_ms = int((time.time() - request_start) * 1000)
+        logger.info(f"✨ Lote completo em {elapsed_ms}ms - {success_count} sucesso(s), {error_count} erro(s)")
+        yield format_stream_event("complete", {
+            "total": success_count + error_count,
+            "success_count": success_count,
+            "error_count": error_count,
+            "processing_time_ms": elapsed_ms,
+            "success": True
+        }, stream_format)
+    finally:
+        # Cliente desconectou: não iniciar os documentos da fila e abortar os que estão em andamento.
+        # Documentos em andamento fecham o próprio arquivo ao terminar (extract_batch_item);
+        # aqui só os que nunca começaram
+        cancel_event.set()
+        for future, pdf_source in submitted:
+            if future.cancel():
+                close_batch_source(pdf_source)
 
 @app.get('/health', response_model=HealthResponse, tags=["Health"])
 async def health():
@@ -284,6 +830,16 @@ async def health():
         "embeddings_model": embeddings_status
     }
 
+@app.get('/system/layout', tags=["Health"])
+async def system_layout():
+    """Plano de CPUs do worker: cota do cgroup, workers, threads do torch, executors e afinidade"""
+    return describe_cpu_layout()
+
+@app.get('/extract-text/backends', tags=["PDF"])
+async def list_pdf_backends():
+    """Lista os backends de extração de PDF (disponibilidade, versão e padrão)"""
+    return {"backends": available_backends()}
+
 @app.post('/cache/clear', tags=["Cache"])
 async def clear_cache():
     """Limpa todo o cache Redis (use com cuidado!)"""
@@ -294,13 +850,231 @@ async def clear_cache():
         return {"status": "ok", "message": "Cache limpo com sucesso"}
     return {"status": "error", "message": "Redis não disponível"}
 
+def run_zero_shot_batch(texts: List[str], candidate_labels: List[str], hypothesis_template: str,
+                        multi_label: bool) -> List[dict]:
+    """
+    Classifica vários textos com os mesmos labels em uma única chamada ao pipeline.
+    
+    Com NLI_LENGTH_BUCKETING, os pares (texto, hipótese) são agrupados por comprimento
+    e cada lote tem seu próprio padding; senão vão ao pipeline em lotes de
+    ZERO_SHOT_BATCH_SIZE. Textos repetidos são classificados uma única vez.
+    Resultados na ordem de entrada.
+    """
+    unique_texts = list(dict.fromkeys(texts))
+    if NLI_LENGTH_BUCKETING and supports_pair_assembly(zero_shot_classifier.tokenizer):
+        results = classify_bucketed(zero_shot_classifier, unique_texts, candidate_labels, hypothesis_template, multi_label)
+    else:
+        results = zero_shot_classifier(
+            unique_texts,
+            candidate_labels,
+            hypothesis_template=hypothesis_template,
+            multi_label=multi_label,
+            batch_size=ZERO_SHOT_BATCH_SIZE
+        )
+    if isinstance(results, dict):
+        results = [results]
+    by_text = dict(zip(unique_texts, results))
+    return [by_text[text] for text in texts]
+
+def zero_shot_batch_fn(key: tuple, texts: List[str]) -> List[dict]:
+    """Função de lote do scheduler: key = (labels, template, multi_label)."""
+    candidate_labels, hypothesis_template, multi_label = key
+    return run_zero_shot_batch(texts, list(candidate_labels), hypothesis_template, multi_label)
+
+def zero_shot_windows(text: str) -> List[str]:
+    """Janelas de ZERO_SHOT_WINDOW_TOKENS tokens (o texto inteiro se couber)."""
+    return split_windows(zero_shot_classifier.tokenizer, text, ZERO_SHOT_WINDOW_TOKENS, ZERO_SHOT_WINDOW_OVERLAP)
+
+async def classify_zero_shot(texts: List[str], candidate_labels: List[str], hypothesis_template: str,
+                             multi_label: bool) -> List[dict]:
+    """
+    Zero-shot pelo scheduler de inferência: requisições concorrentes com os mesmos labels viram um único lote.
+    
+    Textos longos são divididos em janelas, classificadas no mesmo lote e agregadas de volta por texto.
+    """
+    windows, owners = expand_windows(texts, zero_shot_windows)
+    key = (tuple(candidate_labels), hypothesis_template, multi_label)
+    results = await run_inference(zero_shot_batch_fn, key, windows, executor)
+    return aggregate_zero_shot(texts, owners, results, multi_label=multi_label)
+
+def semantic_encode_fn(key: str, texts: List[str]):
+    """Função de lote do scheduler para o modelo de embeddings semânticos."""
+    return semantic_embeddings_model.encode(texts, convert_to_tensor=True)
+
+def semantic_windows(text: str) -> List[str]:
+    """Janelas do tamanho máximo do modelo de embeddings (o texto inteiro se couber)."""
+    tokenizer = semantic_embeddings_model.tokenizer
+    max_tokens = semantic_embeddings_model.max_seq_length - tokenizer.num_special_tokens_to_add()
+    return split_windows(tokenizer, text, max_tokens, SEMANTIC_WINDOW_OVERLAP)
+
+def similarity_matrix(queries, keys):
+    """Similaridade cosseno (queries × keys) em uma única multiplicação de matrizes normalizadas."""
+    import torch.nn.functional as F
+    return F.normalize(queries, dim=-1) @ F.normalize(keys, dim=-1).T
+
+async def encode_semantic(texts: List[str]):
+    """
+    Embeddings (tensor) pelo scheduler de inferência, em micro-lote com as requisições concorrentes.
+    
+    Textos acima do max_seq_length do modelo viram janelas; o embedding do texto é o pooling das janelas.
+    """
+    if not texts:
+        import torch
+        return torch.empty((0, semantic_embeddings_model.get_sentence_embedding_dimension()))
+    windows, owners = expand_windows(texts, semantic_windows)
+    embeddings = await run_inference(semantic_encode_fn, "semantic", windows, executor)
+    return pool_embeddings(len(texts), owners, embeddings)
+
+async def prefilter_nli_blocks(blocks: List[str], schema: Dict[str, str], label_threshold: float,
+                               value_threshold: float) -> Dict[str, Tuple[bool, float, Optional[str]]]:
+    """
+    Decide pelos embeddings os blocos claros do /nli/classify.
+    
+    Cada bloco (sem ":" final) é comparado com o nome e a descrição de cada campo:
+    similaridade >= label_threshold → label; <= value_threshold → valor.
+    Blocos na faixa intermediária ficam de fora (vão ao NLI).
+    
+    Returns:
+        Dict {bloco: (é_label, confiança, campo mais próximo se label)} apenas dos blocos decididos
+    """
+    from sentence_transformers import util
+    
+    prototypes = []
+    owners = []
+    for field_name, description in schema.items():
+        prototypes.append(field_name.replace("_", " "))
+        owners.append(field_name)
+        if description.strip():
+            prototypes.append(description)
+            owners.append(field_name)
+    
+    embeddings = await encode_semantic([block.strip().rstrip(":").strip() for block in blocks] + prototypes)
+    best = util.cos_sim(embeddings[:len(blocks)], embeddings[len(blocks):]).max(dim=1)
+    
+    decided = {}
+    for block, score, index in zip(blocks, best.values.tolist(), best.indices.tolist()):
+        if score >= label_threshold:
+            decided[block] = (True, score, owners[index])
+        elif score <= value_threshold:
+            decided[block] = (False, 1 - max(score, 0.0), None)
+    return decided
+
+async def distill_nli_blocks(blocks: List[str], threshold: float) -> Dict[str, Tuple[bool, float, Optional[str]]]:
+    """
+    Decide pelo classificador destilado os blocos em que ele está confiante.
+    
+    Returns:
+        Dict {bloco: (é_label, confiança, None)} apenas dos blocos decididos (vazio se não houver classificador)
+    """
+    from label_classifier import label_classifier
+    
+    if label_classifier is None:
+        return {}
+    try:
+        embeddings = await encode_semantic(blocks)
+        decided = label_classifier.decide(blocks, embeddings.cpu().numpy(), threshold)
+    except Exception as e:
+        logger.warning(f"⚠️ Classificador destilado falhou, usando NLI: {e}")
+        return {}
+    return {block: (is_label, confidence, None) for block, (is_label, confidence) in decided.items()}
+
+def lookup_nli_cache(blocks: List[str], candidate_labels: List[str], hypothesis_template: str) -> Dict[str, Dict[str, float]]:
+    """Scores NLI já cacheados (bloco, conjunto de hipóteses, modelo), em um único MGET."""
+    hypotheses = [hypothesis_template.format(label) for label in candidate_labels]
+    return {
+        block: cached["scores"]
+        for block, cached in zip(blocks, get_nli_cache_many(blocks, hypotheses, zero_shot_model_name))
+        if cached is not None
+    }
+
+async def run_nli(blocks: List[str], candidate_labels: List[str], hypothesis_template: str) -> Dict[str, Dict[str, float]]:
+    """Classifica os blocos no modelo NLI (em lote) e salva os scores no cache."""
+    if not blocks:
+        return {}
+    results = await classify_zero_shot(blocks, candidate_labels, hypothesis_template, False)
+    scores = {
+        block: dict(zip(result['labels'], result['scores']))
+        for block, result in zip(blocks, results)
+    }
+    save_nli_cache_many(scores, [hypothesis_template.format(label) for label in candidate_labels], zero_shot_model_name)
+    return scores
+
+async def encode_semantic_cached(texts: List[str]):
+    """
+    Embeddings pelo cache Redis do modelo (EmbeddingCache): apenas textos novos vão ao modelo.
+    
+    Returns:
+        (tensor na ordem de texts, hits, misses) - hits/misses contados por texto único
+    """
+    import numpy as np
+    import torch
+    
+    unique_texts = list(dict.fromkeys(texts))
+    loop = asyncio.get_event_loop()
+    cached = [None] * len(unique_texts)
+    if semantic_embedding_cache is not None:
+        cached = await loop.run_in_executor(executor, semantic_embedding_cache.get_batch, unique_texts)
+    
+    misses = [text for text, embedding in zip(unique_texts, cached) if embedding is None]
+    computed = await encode_semantic(misses)
+    
+    rows = {text: emb for text, emb in zip(misses, computed)}
+    for text, embedding in zip(unique_texts, cached):
+        if embedding is not None:
+            # Arrays do cache são somente leitura (np.frombuffer): cópia única para float32 no device
+            rows[text] = torch.tensor(embedding, dtype=torch.float32, device=computed.device)
+    
+    # Salvar os novos no cache sem esperar (falhas de cache não afetam a resposta)
+    if misses and semantic_embedding_cache is not None:
+        submit_background("cache de embeddings", semantic_embedding_cache.set_batch, misses, list(computed.cpu().numpy()))
+    
+    embeddings = torch.stack([rows[text] for text in texts]) if texts else computed
+    return embeddings, len(unique_texts) - len(misses), len(misses)
+
+def build_zero_shot_response(text: str, result: dict) -> ZeroShotResponse:
+    """Converte a saída do pipeline em ZeroShotResponse."""
+    return ZeroShotResponse(
+        text=text,
+        labels=result['labels'],
+        scores=result['scores'],
+        best_label=result['labels'][0],
+        best_score=result['scores'][0],
+        success=True
+    )
+
+def build_binary_response(text: str, category: str, result: dict) -> BinaryClassificationResponse:
+    """Converte a saída do pipeline ([categoria, "outro"]) em BinaryClassificationResponse."""
+    # O texto pertence à categoria se ela for a melhor label
+    is_category = result['labels'][0] == category
+    confidence = result['scores'][0] if is_category else (1 - result['scores'][0])
+    return BinaryClassificationResponse(
+        text=text,
+        category=category,
+        is_category=is_category,
+        confidence=confidence,
+        success=True
+    )
+
+def check_zero_shot_batch(size: int):
+    """Valida modelo carregado e tamanho do lote."""
+    if zero_shot_classifier is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Modelo Zero-Shot não está carregado"
+        )
+    if size > ZERO_SHOT_MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Lote com {size} itens excede o máximo de {ZERO_SHOT_MAX_BATCH_ITEMS} (ZERO_SHOT_MAX_BATCH_ITEMS)"
+        )
+
 @app.post('/zero-shot/classify', response_model=ZeroShotResponse, tags=["Zero-Shot Classification"])
 async def zero_shot_classify(request: ZeroShotRequest):
     """
     Classifica um texto usando Zero-Shot Classification.
     
     **Parâmetros:**
-    - **text**: Texto a ser classificado (max 512 caracteres)
+    - **text**: Texto a ser classificado (textos longos são divididos em janelas sobrepostas e os scores agregados)
     - **candidate_labels**: Lista de labels candidatas (ex: ["nome de pessoa", "número", "endereço"])
     - **hypothesis_template**: Template para construir hipóteses (padrão: "Este texto é sobre {}")
     - **multi_label**: Se True, permite múltiplas labels simultâneas
@@ -330,26 +1104,19 @@ async def zero_shot_classify(request: ZeroShotRequest):
     try:
         start_time = time.time()
         
-        # Executar classificação
-        result = zero_shot_classifier(
-            request.text,
+        # Executar classificação (micro-lote com requisições concorrentes)
+        result = (await classify_zero_shot(
+            [request.text],
             request.candidate_labels,
-            hypothesis_template=request.hypothesis_template,
-            multi_label=request.multi_label
-        )
+            request.hypothesis_template,
+            request.multi_label
+        ))[0]
         
         elapsed = time.time() - start_time
         
         logger.info(f"✅ Classificação concluída em {elapsed:.3f}s - Melhor: '{result['labels'][0]}' ({result['scores'][0]:.3f})")
         
-        return ZeroShotResponse(
-            text=request.text,
-            labels=result['labels'],
-            scores=result['scores'],
-            best_label=result['labels'][0],
-            best_score=result['scores'][0],
-            success=True
-        )
+        return build_zero_shot_response(request.text, result)
         
     except Exception as e:
         logger.error(f"❌ Erro na classificação: {e}")
@@ -400,31 +1167,124 @@ async def zero_shot_validate(request: BinaryClassificationRequest):
         start_time = time.time()
         
         # Classificar entre a categoria e "outro"
-        result = zero_shot_classifier(
-            request.text,
+        result = (await classify_zero_shot(
+            [request.text],
             [request.category, "outro"],
-            hypothesis_template=request.hypothesis_template,
-            multi_label=False
-        )
+            request.hypothesis_template,
+            False
+        ))[0]
         
         elapsed = time.time() - start_time
         
-        # O texto pertence à categoria se ela for a melhor label
-        is_category = result['labels'][0] == request.category
-        confidence = result['scores'][0] if is_category else (1 - result['scores'][0])
+        response = build_binary_response(request.text, request.category, result)
+        logger.info(f"{'✅' if response.is_category else '❌'} Validação em {elapsed:.3f}s - Confiança: {response.confidence:.3f}")
+        
+        return response
+        
+    except Exception as e:
+        logger.error(f"❌ Erro na validação: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao validar: {str(e)}"
+        )
+
+@app.post('/zero-shot/classify/batch', response_model=ZeroShotBatchResponse, tags=["Zero-Shot Classification"])
+async def zero_shot_classify_batch(request: ZeroShotBatchRequest):
+    """
+    Classifica vários textos com as mesmas labels candidatas em uma única requisição.
+    
+    Os pares (texto, hipótese) são processados pelo modelo em lotes
+    (ZERO_SHOT_BATCH_SIZE), em vez de uma chamada HTTP e um forward por texto.
+    
+    **Retorna:**
+    - **results**: Um ZeroShotResponse por texto, na ordem enviada
+    
+    **Exemplo:**
+    ```json
+    {
+        "texts": ["JOANA D'ARC", "Rua ABC, 123", "12/03/1990"],
+        "candidate_labels": ["nome de pessoa", "endereço", "data"]
+    }
+    ```
+    """
+    logger.info(f"🔍 Zero-Shot em lote: {len(request.texts)} textos com {len(request.candidate_labels)} labels")
+    check_zero_shot_batch(len(request.texts))
+    
+    try:
+        start_time = time.time()
+        
+        results = await classify_zero_shot(
+            request.texts, request.candidate_labels, request.hypothesis_template, request.multi_label
+        )
         
-        logger.info(f"{'✅' if is_category else '❌'} Validação em {elapsed:.3f}s - Confiança: {confidence:.3f}")
+        elapsed_ms = int((time.time() - start_time) * 1000)
+        logger.info(f"✅ Lote classificado em {elapsed_ms}ms ({len(request.texts)} textos)")
         
-        return BinaryClassificationResponse(
-            text=request.text,
-            category=request.category,
-            is_category=is_category,
-            confidence=confidence,
+        return ZeroShotBatchResponse(
+            results=[build_zero_shot_response(text, result) for text, result in zip(request.texts, results)],
+            total=len(results),
+            processing_time_ms=elapsed_ms,
             success=True
         )
         
     except Exception as e:
-        logger.error(f"❌ Erro na validação: {e}")
+        logger.error(f"❌ Erro na classificação em lote: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao classificar: {str(e)}"
+        )
+
+@app.post('/zero-shot/validate/batch', response_model=BinaryClassificationBatchResponse, tags=["Zero-Shot Classification"])
+async def zero_shot_validate_batch(request: BinaryClassificationBatchRequest):
+    """
+    Valida vários pares texto/categoria em uma única requisição.
+    
+    Os pares são agrupados por categoria e cada grupo é processado pelo modelo
+    em lotes (ZERO_SHOT_BATCH_SIZE). Os resultados voltam na ordem enviada.
+    
+    **Exemplo:**
+    ```json
+    {
+        "items": [
+            {"text": "JOANA D'ARC", "category": "nome de pessoa"},
+            {"text": "123.456.789-00", "category": "CPF"}
+        ]
+    }
+    ```
+    """
+    logger.info(f"✓ Validação binária em lote: {len(request.items)} pares")
+    check_zero_shot_batch(len(request.items))
+    
+    async def validate_group(category: str, indices: List[int]):
+        texts = [request.items[index].text for index in indices]
+        outputs = await classify_zero_shot(texts, [category, "outro"], request.hypothesis_template, False)
+        for index, text, output in zip(indices, texts, outputs):
+            results[index] = build_binary_response(text, category, output)
+    
+    try:
+        start_time = time.time()
+        
+        # Agrupar por categoria: cada grupo compartilha as hipóteses [categoria, "outro"]
+        groups: Dict[str, List[int]] = {}
+        for index, item in enumerate(request.items):
+            groups.setdefault(item.category, []).append(index)
+        
+        results: List[Optional[BinaryClassificationResponse]] = [None] * len(request.items)
+        await asyncio.gather(*(validate_group(category, indices) for category, indices in groups.items()))
+        
+        elapsed_ms = int((time.time() - start_time) * 1000)
+        positives = sum(1 for result in results if result.is_category)
+        logger.info(f"✅ Lote validado em {elapsed_ms}ms - {positives}/{len(results)} positivos")
+        
+        return BinaryClassificationBatchResponse(
+            results=results,
+            total=len(results),
+            processing_time_ms=elapsed_ms,
+            success=True
+        )
+        
+    except Exception as e:
+        logger.error(f"❌ Erro na validação em lote: {e}")
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao validar: {str(e)}"
@@ -439,12 +1299,16 @@ async def nli_classify(request: NliClassifyRequest):
     Otimizado com:
     - Processamento em batch
     - Cache Redis
-    - Pré-filtragem com embeddings (futuro)
+    - Pré-filtragem com embeddings: labels e valores claros não passam pelo NLI
     
     **Parâmetros:**
     - **label**: Label do documento (para cache)
     - **schema**: Dict {campo: descrição} dos campos pendentes
     - **text_blocks**: Lista de blocos de texto para classificar
+    - **prefilter**, **label_threshold**, **value_threshold**: Pré-filtro com embeddings (opcional)
+    - **distilled**, **distilled_threshold**: Classificador destilado (treinado com as decisões do NLI); só os blocos de baixa confiança vão ao NLI
+    - **mode**: two_stage (label vs valor, custo constante por bloco) ou full (uma hipótese por campo)
+    - **attribute_fields**: two_stage - identifica o campo de cada label em uma segunda etapa
     
     **Retorna:**
     - **labels_detected**: Blocos identificados como labels (para remover)
@@ -484,57 +1348,107 @@ async def nli_classify(request: NliClassifyRequest):
     
     try:
         # 1️⃣ Construir candidatos a partir do schema
-        candidate_labels = []
-        for field_name in request.schema.keys():
-            candidate_labels.append(f"label do campo '{field_name}'")
-        candidate_labels.append("valor ou dado extraído")
-        
-        logger.info(f"🎯 Candidatos: {len(candidate_labels)}")
+        # full: uma hipótese por campo + valor (O(campos) por bloco)
+        # two_stage: label vs valor (2 hipóteses); campo só para labels, se attribute_fields
+        mode = request.mode or NLI_CLASSIFY_MODE
+        field_labels = {f"label do campo '{field_name}'": field_name for field_name in request.schema.keys()}
+        if mode == "two_stage":
+            candidate_labels = [NLI_LABEL_HYPOTHESIS, NLI_VALUE_HYPOTHESIS]
+        else:
+            candidate_labels = list(field_labels) + [NLI_VALUE_HYPOTHESIS]
+        
+        logger.info(f"🎯 Candidatos ({mode}): {len(candidate_labels)}")
         for label in candidate_labels:
             logger.info(f"  • {label}")
         
-        # 2️⃣ Processar blocos (com cache Redis futuro)
+        # 2️⃣ Cache Redis: (bloco, conjunto de hipóteses, modelo) → scores, um único MGET
+        hypothesis_template = "Este texto é {}"
+        blocks = [block for block in request.text_blocks if block.strip()]
+        unique_blocks = list(dict.fromkeys(blocks))
+        
+        scores_by_block = lookup_nli_cache(unique_blocks, candidate_labels, hypothesis_template)
+        cached_blocks = set(scores_by_block)
+        cache_hits = sum(1 for block in blocks if block in cached_blocks)
+        
+        # 3️⃣ Pré-filtro com embeddings: labels e valores claros não vão ao modelo NLI
+        misses = [block for block in unique_blocks if block not in scores_by_block]
+        prefiltered: Dict[str, Tuple[bool, float, Optional[str]]] = {}
+        use_prefilter = request.prefilter if request.prefilter is not None else NLI_PREFILTER
+        if use_prefilter and misses and semantic_embeddings_model is not None:
+            prefiltered = await prefilter_nli_blocks(
+                misses,
+                request.schema,
+                request.label_threshold if request.label_threshold is not None else NLI_PREFILTER_LABEL_THRESHOLD,
+                request.value_threshold if request.value_threshold is not None else NLI_PREFILTER_VALUE_THRESHOLD
+            )
+            misses = [block for block in misses if block not in prefiltered]
+        
+        # 4️⃣ Classificador destilado: decide os blocos em que está confiante
+        distilled: Dict[str, Tuple[bool, float, Optional[str]]] = {}
+        if request.distilled and misses and semantic_embeddings_model is not None:
+            distilled = await distill_nli_blocks(
+                misses,
+                request.distilled_threshold if request.distilled_threshold is not None else LABEL_CLASSIFIER_THRESHOLD
+            )
+            misses = [block for block in misses if block not in distilled]
+        
+        # 5️⃣ Apenas a faixa ambígua vai ao modelo (em lote)
+        logger.info(f"🔄 Processando {len(blocks)} blocos ({len(misses)} no modelo, {len(prefiltered)} pelo pré-filtro, "
+                    f"{len(distilled)} pelo classificador destilado, {cache_hits} do cache)...")
+        scores_by_block.update(await run_nli(misses, candidate_labels, hypothesis_template))
+        nli_passes = len(misses) * len(candidate_labels)
+        
+        decisions: Dict[str, Tuple[bool, float, Optional[str], str]] = {}
+        for block in unique_blocks:
+            if block in prefiltered:
+                decisions[block] = prefiltered[block] + ("embedding",)
+                continue
+            if block in distilled:
+                decisions[block] = distilled[block] + ("distilled",)
+                continue
+            best_label, best_score = max(scores_by_block[block].items(), key=lambda item: item[1])
+            # Se NÃO for "valor ou dado extraído" → é label
+            is_label = best_label != NLI_VALUE_HYPOTHESIS and best_score > 0.30
+            source = "cache" if block in cached_blocks else "nli"
+            decisions[block] = (is_label, best_score, field_labels.get(best_label) if is_label else None, source)
+        
+        # Decisões novas do NLI alimentam o treino do classificador destilado (opt-in, escrita em segundo plano)
+        if NLI_DECISIONS_LOG and misses:
+            submit_background("log de decisões do NLI", log_nli_decisions, [
+                {"text": block, "is_label": decisions[block][0], "confidence": round(decisions[block][1], 4),
+                 "mode": mode, "document": request.label, "model": zero_shot_model_name, "ts": int(time.time())}
+                for block in misses
+            ])
+        
+        # 6️⃣ two_stage: atribuição de campo apenas para os blocos julgados labels (sem a hipótese de valor)
+        if mode == "two_stage" and request.attribute_fields and field_labels:
+            pending = [block for block, decision in decisions.items() if decision[0] and decision[2] is None]
+            field_scores = lookup_nli_cache(pending, list(field_labels), hypothesis_template)
+            field_misses = [block for block in pending if block not in field_scores]
+            field_scores.update(await run_nli(field_misses, list(field_labels), hypothesis_template))
+            nli_passes += len(field_misses) * len(field_labels)
+            for block in pending:
+                best_label = max(field_scores[block].items(), key=lambda item: item[1])[0]
+                decisions[block] = decisions[block][:2] + (field_labels[best_label],) + decisions[block][3:]
+        
         classified_blocks = []
         labels_detected = []
-        cache_hits = 0
-        
-        logger.info(f"🔄 Processando {len(request.text_blocks)} blocos...")
         
-        # Processar em batch (otimização)
-        for block in request.text_blocks:
-            if not block.strip():
-                continue
-            
-            # TODO: Adicionar cache Redis aqui
-            # cache_key = f"nli:{hash(block)}:{hash(tuple(candidate_labels))}"
-            # cached = get_cache(cache_key)
-            # if cached: ...
-            
-            # Classificar bloco
-            result = zero_shot_classifier(
-                block,
-                candidate_labels,
-                hypothesis_template="Este texto é {}",
-                multi_label=False
-            )
-            
-            best_label = result['labels'][0]
-            best_score = result['scores'][0]
-            
-            # Se NÃO for "valor ou dado extraído" → é label
-            is_label = best_label != "valor ou dado extraído" and best_score > 0.30
-            
+        for block in blocks:
+            is_label, best_score, field, source = decisions[block]
             classified_blocks.append(ClassifiedBlock(
                 text=block,
                 label="label" if is_label else "valor",
-                confidence=best_score
+                confidence=best_score,
+                source=source,
+                field=field
             ))
             
             if is_label:
                 labels_detected.append(block)
-                logger.info(f"  🏷️ Label: '{block}' → {best_label} ({best_score:.2f})")
+                logger.info(f"  🏷️ Label: '{block}' → {field or 'label'} ({best_score:.2f}, {source})")
             else:
-                logger.info(f"  ✅ Valor: '{block}' ({best_score:.2f})")
+                logger.info(f"  ✅ Valor: '{block}' ({best_score:.2f}, {source})")
         
         elapsed_ms = int((time.time() - start_time) * 1000)
         
@@ -548,6 +1462,11 @@ async def nli_classify(request: NliClassifyRequest):
             classified_blocks=classified_blocks,
             processing_time_ms=elapsed_ms,
             cache_hits=cache_hits,
+            prefilter_labels=sum(1 for block in blocks if block in prefiltered and prefiltered[block][0]),
+            prefilter_values=sum(1 for block in blocks if block in prefiltered and not prefiltered[block][0]),
+            distilled_blocks=sum(1 for block in blocks if block in distilled),
+            nli_blocks=len(misses),
+            nli_passes=nli_passes,
             total_blocks=len(request.text_blocks)
         )
         
@@ -649,79 +1568,60 @@ async def semantic_extract(request: SemanticExtractRequest):
                 detail="Modelo de embeddings não está carregado. Reinicie a aplicação."
             )
         
-        from sentence_transformers import util
-        model = semantic_embeddings_model
-        logger.info("   ✓ Usando modelo pré-carregado: paraphrase-multilingual-MiniLM-L12-v2")
+        logger.info(f"   ✓ Usando modelo pré-carregado: {SEMANTIC_EMBEDDINGS_MODEL}")
         
         # Embeddings das descrições dos labels
         label_descriptions = [desc for desc in request.labels.values()]
         label_names = list(request.labels.keys())
         
-        logger.info(f"   • Gerando embeddings para {len(label_descriptions)} labels...")
-        label_embeddings = model.encode(label_descriptions, convert_to_tensor=True)
-        
-        logger.info(f"   • Gerando embeddings para {len(candidates)} candidatos...")
-        candidate_embeddings = model.encode(candidates, convert_to_tensor=True)
+        logger.info(f"   • Gerando embeddings para {len(label_descriptions)} labels e {len(candidates)} candidatos...")
+        embeddings, cache_hits, cache_misses = await encode_semantic_cached(label_descriptions + candidates)
+        label_embeddings = embeddings[:len(label_descriptions)]
+        candidate_embeddings = embeddings[len(label_descriptions):]
         
-        logger.info("   ✓ Embeddings gerados com sucesso")
+        logger.info(f"   ✓ Embeddings gerados com sucesso (cache: {cache_hits} hits, {cache_misses} misses)")
         
-        # 3️⃣ Calcular similaridades e extrair top K para cada label
+        # 3️⃣ Similaridades: uma única multiplicação (labels × candidatos) e top K de todas as labels de uma vez
         logger.info("🔍 Calculando similaridades...")
+        similarities = similarity_matrix(label_embeddings, candidate_embeddings)
+        top_k = min(request.top_k, len(candidates))
+        fetch_k = min(max(top_k, 5 if SEMANTIC_DEBUG_LOGS else 0), len(candidates))
+        top_scores, top_indices = similarities.topk(fetch_k, dim=1)
+        top_scores = top_scores.tolist()
+        top_indices = top_indices.tolist()
+        
         results = []
         extraction_summary = {}
         
-        # CORREÇÃO: Processar cada label independentemente
         for label_idx, (label_name, label_desc) in enumerate(request.labels.items()):
-            logger.info(f"\n📋 {label_name.upper()} (descrição: '{label_desc[:50]}...')")
-            
-            # CRÍTICO: Pegar o embedding correto para ESTE label específico
-            label_embedding = label_embeddings[label_idx]
-            
-            # Calcular similaridade cosine APENAS para este label
-            similarities = util.cos_sim(label_embedding, candidate_embeddings)[0]
+            scores_row = top_scores[label_idx]
+            indices_row = top_indices[label_idx]
             
-            # DEBUG: Log dos top 5 scores brutos
-            top_5_debug = similarities.argsort(descending=True)[:5]
-            logger.info(f"   🔍 DEBUG - Top 5 scores:")
-            for rank, idx in enumerate(top_5_debug, start=1):
-                logger.info(f"      {rank}. '{candidates[idx]}' → {float(similarities[idx]):.4f}")
+            if SEMANTIC_DEBUG_LOGS:
+                logger.info(f"\n📋 {label_name.upper()} (descrição: '{label_desc[:50]}...')")
+                logger.info(f"   🔍 DEBUG - Top 5 scores:")
+                for rank, (idx, score) in enumerate(zip(indices_row[:5], scores_row[:5]), start=1):
+                    logger.info(f"      {rank}. '{candidates[idx]}' → {score:.4f}")
             
-            # Obter top K índices
-            top_k_indices = similarities.argsort(descending=True)[:request.top_k]
-            
-            top_matches = []
-            for rank, candidate_idx in enumerate(top_k_indices, start=1):
-                candidate_text = candidates[candidate_idx]
-                score = float(similarities[candidate_idx])
-                
-                # Filtrar por threshold
-                if score >= request.similarity_threshold:
-                    top_matches.append(SemanticMatch(
-                        text=candidate_text,
-                        score=round(score, 3),
-                        rank=rank
-                    ))
-                    
-                    logger.info(f"   ✅ {rank}. '{candidate_text}' (score: {score:.3f})")
+            # Top K acima do threshold (o rank é a posição no top K)
+            top_matches = [
+                SemanticMatch(text=candidates[idx], score=round(score, 3), rank=rank)
+                for rank, (idx, score) in enumerate(zip(indices_row[:top_k], scores_row[:top_k]), start=1)
+                if score >= request.similarity_threshold
+            ]
             
             # Se não tem matches acima do threshold, pegar o melhor mesmo assim
-            if not top_matches and len(top_k_indices) > 0:
-                best_idx = top_k_indices[0]
-                best_text = candidates[best_idx]
-                best_score = float(similarities[best_idx])
-                
+            if not top_matches:
                 top_matches.append(SemanticMatch(
-                    text=best_text,
-                    score=round(best_score, 3),
+                    text=candidates[indices_row[0]],
+                    score=round(scores_row[0], 3),
                     rank=1
                 ))
-                logger.info(f"   ⚠️  1. '{best_text}' (score: {best_score:.3f}) [único match, abaixo do threshold]")
             
             # Melhor match
-            best_match = top_matches[0].text if top_matches else ""
-            best_score = top_matches[0].score if top_matches else 0.0
+            best_match = top_matches[0].text
+            best_score = top_matches[0].score
             
-            # IMPORTANTE: Salvar resultado com label correto
             results.append(LabelExtractionResult(
                 label=label_name,
                 description=label_desc,
@@ -732,7 +1632,8 @@ async def semantic_extract(request: SemanticExtractRequest):
             
             extraction_summary[label_name] = best_match
             
-            logger.info(f"   🎯 Melhor match para '{label_name}': '{best_match}' ({best_score:.3f})")
+            if SEMANTIC_DEBUG_LOGS:
+                logger.info(f"   🎯 Melhor match para '{label_name}': '{best_match}' ({best_score:.3f})")
         
         # 4️⃣ Retornar resultado
         elapsed_ms = int((time.time() - start_time) * 1000)
@@ -749,7 +1650,9 @@ async def semantic_extract(request: SemanticExtractRequest):
             extraction_summary=extraction_summary,
             processing_time_ms=elapsed_ms,
             total_candidates=len(candidates),
-            model_used="paraphrase-multilingual-MiniLM-L12-v2"
+            model_used=SEMANTIC_EMBEDDINGS_MODEL,
+            cache_hits=cache_hits,
+            cache_misses=cache_misses
         )
         
     except Exception as e:
@@ -879,60 +1782,50 @@ async def semantic_label_detect(request: SemanticLabelDetectRequest):
                 detail="Modelo de embeddings não está carregado. Reinicie a aplicação."
             )
         
-        from sentence_transformers import util
-        model = semantic_embeddings_model
-        logger.info("   ✓ Usando modelo pré-carregado: paraphrase-multilingual-MiniLM-L12-v2")
+        logger.info(f"   ✓ Usando modelo pré-carregado: {SEMANTIC_EMBEDDINGS_MODEL}")
         
         # INVERSÃO: Embeddings das DESCRIÇÕES dos labels do schema
         label_descriptions = list(request.labels.values())
         label_names = list(request.labels.keys())
         
-        logger.info(f"   • Gerando embeddings para {len(label_descriptions)} labels do schema...")
-        label_embeddings = model.encode(label_descriptions, convert_to_tensor=True)
-        
-        logger.info(f"   • Gerando embeddings para {len(candidates)} candidatos do texto...")
-        candidate_embeddings = model.encode(candidates, convert_to_tensor=True)
+        logger.info(f"   • Gerando embeddings para {len(label_descriptions)} labels do schema e {len(candidates)} candidatos do texto...")
+        embeddings, cache_hits, cache_misses = await encode_semantic_cached(label_descriptions + candidates)
+        label_embeddings = embeddings[:len(label_descriptions)]
+        candidate_embeddings = embeddings[len(label_descriptions):]
         
-        logger.info("   ✓ Embeddings gerados com sucesso")
+        logger.info(f"   ✓ Embeddings gerados com sucesso (cache: {cache_hits} hits, {cache_misses} misses)")
         
-        # 3️⃣ INVERSÃO: Para cada CANDIDATO, buscar labels mais similares
+        # 3️⃣ INVERSÃO: matriz candidatos × labels em uma única multiplicação; melhor label e threshold em lote
         logger.info("🔍 Calculando similaridades (candidato → labels do schema)...")
         detected_labels = []
         labels_summary = {}
         
-        for candidate_idx, candidate_text in enumerate(candidates):
-            # Embedding do candidato
-            candidate_embedding = candidate_embeddings[candidate_idx]
-            
-            # Calcular similaridade com TODOS os labels do schema
-            similarities = util.cos_sim(candidate_embedding, label_embeddings)[0]
+        if label_names:
+            similarities = similarity_matrix(candidate_embeddings, label_embeddings)
+            best_scores, best_indices = similarities.max(dim=1)
+            detected_rows = (best_scores >= request.similarity_threshold).nonzero().flatten()
             
-            # Obter top K labels
-            top_k_indices = similarities.argsort(descending=True)[:request.top_k]
+            if SEMANTIC_DEBUG_LOGS and len(detected_rows):
+                debug_scores, debug_indices = similarities[detected_rows].topk(min(3, request.top_k, len(label_names)), dim=1)
+                for row, candidate_idx in enumerate(detected_rows.tolist()):
+                    logger.info(f"\n✅ Candidato: '{candidates[candidate_idx]}'")
+                    logger.info(f"   → Label: '{label_names[debug_indices[row][0]]}' (score: {float(debug_scores[row][0]):.3f})")
+                    logger.info(f"   🔍 Top 3:")
+                    for rank, (idx, score) in enumerate(zip(debug_indices[row].tolist(), debug_scores[row].tolist()), start=1):
+                        logger.info(f"      {rank}. '{label_names[idx]}' → {score:.4f}")
             
-            # Processar apenas se o melhor score >= threshold
-            best_idx = top_k_indices[0]
-            best_score = float(similarities[best_idx])
-            
-            if best_score >= request.similarity_threshold:
-                best_label = label_names[best_idx]
-                
-                logger.info(f"\n✅ Candidato: '{candidate_text}'")
-                logger.info(f"   → Label: '{best_label}' (score: {best_score:.3f})")
-                
-                # DEBUG: Mostrar top 3
-                logger.info(f"   🔍 Top 3:")
-                for rank, idx in enumerate(top_k_indices[:3], start=1):
-                    logger.info(f"      {rank}. '{label_names[idx]}' → {float(similarities[idx]):.4f}")
-                
+            # Apenas as linhas detectadas viram CandidateLabelMatch
+            for candidate_idx, label_idx, score in zip(detected_rows.tolist(),
+                                                       best_indices[detected_rows].tolist(),
+                                                       best_scores[detected_rows].tolist()):
+                candidate_text = candidates[candidate_idx]
                 detected_labels.append(CandidateLabelMatch(
                     candidate_text=candidate_text,
-                    matched_label=best_label,
-                    score=round(best_score, 3),
+                    matched_label=label_names[label_idx],
+                    score=round(score, 3),
                     rank=1
                 ))
-                
-                labels_summary[candidate_text] = best_label
+                labels_summary[candidate_text] = label_names[label_idx]
         
         # 4️⃣ Retornar resultado
         elapsed_ms = int((time.time() - start_time) * 1000)
@@ -950,7 +1843,9 @@ async def semantic_label_detect(request: SemanticLabelDetectRequest):
             labels_summary=labels_summary,
             processing_time_ms=elapsed_ms,
             total_candidates=len(candidates),
-            model_used="paraphrase-multilingual-MiniLM-L12-v2"
+            model_used=SEMANTIC_EMBEDDINGS_MODEL,
+            cache_hits=cache_hits,
+            cache_misses=cache_misses
         )
         
     except Exception as e:
@@ -1077,16 +1972,30 @@ async def smart_extract(request: SmartExtractRequest):
         )
 
 @app.post('/extract-text', response_model=PDFResponse, tags=["PDF"])
-async def extract_text(request: PDFRequest):
+async def extract_text(request: PDFRequest, http_request: Request):
     """
     Endpoint assíncrono para extrair texto de PDF.
     
     **Parâmetros:**
     - **pdf_base64**: PDF codificado em base64
+    - **page_start** / **page_end**: Faixa de páginas (base 1, inclusiva) - opcional
+    - **max_pages**: Máximo de páginas a extrair - opcional
+    - **max_chars**: Para de ler páginas quando o texto atinge N caracteres - opcional
+    - **backend**: pypdf2, pymupdf ou pdfium - opcional
+    - **layout**: Inclui as linhas com página, caixa e tamanho de fonte - opcional
+    - **timeout_seconds** / **memory_limit_mb**: Limites da extração (até os máximos do servidor) - opcional
+    
+    A extração roda em workers isolados: estourar tempo ou memória retorna 422 com a
+    página em andamento, e a extração é cancelada se o cliente desconectar.
     
     **Retorna:**
     - **text**: Texto extraído do PDF
     - **char_count**: Número de caracteres extraídos
+    - **total_pages**: Número de páginas do PDF
+    - **pages_extracted**: Páginas efetivamente extraídas
+    - **cached_pages**: Páginas reaproveitadas do cache (SHA256 do PDF ou hash da página)
+    - **truncated**: Se o orçamento de caracteres (max_chars) interrompeu a extração
+    - **lines**: Linhas posicionadas (apenas com layout=true)
     - **success**: Status da operação
     """
     request_start = time.time()
@@ -1100,17 +2009,13 @@ async def extract_text(request: PDFRequest):
                 detail="PDF base64 inválido"
             )
         
-        # Extrair texto de forma assíncrona
-        extracted_text = await extract_text_from_pdf_async(pdf_bytes)
+        # Extrair texto de forma assíncrona (cache por SHA256 do PDF e por página)
+        extraction = await extract_text_from_pdf_async(pdf_bytes, build_extraction_options(request), http_request)
         
         total_time = time.time() - request_start
-        logger.info(f"✨ Requisição completa em {total_time:.3f}s - {len(extracted_text)} caracteres extraídos")
+        logger.info(f"✨ Requisição completa em {total_time:.3f}s - {len(extraction.text)} caracteres extraídos")
         
-        return PDFResponse(
-            text=extracted_text,
-            char_count=len(extracted_text),
-            success=True
-        )
+        return build_pdf_response(extraction)
         
     except HTTPException:
         error_time = time.time() - request_start
@@ -1120,10 +2025,187 @@ async def extract_text(request: PDFRequest):
         error_time = time.time() - request_start
         logger.error(f"❌ Erro no endpoint após {error_time:.3f}s: {e}")
         logger.info("="*60)
-        raise HTTPException(
-            status_code=500,
-            detail=str(e)
+        raise pdf_error_to_http(e)
+
+@app.post('/layout-extract', response_model=LayoutExtractResponse, tags=["Layout Extraction"])
+async def layout_extract(request: LayoutExtractRequest, http_request: Request):
+    """
+    📐 Extração Posicional (sem embeddings)
+    
+    Extrai o PDF em modo layout e localiza cada campo por geometria: o valor é
+    o restante da linha do label ("Nome: João"), a linha à direita ou a linha abaixo.
+    
+    **Parâmetros:**
+    - **pdf_base64**: PDF codificado em base64 (aceita também page_start, page_end, max_pages e backend)
+    - **labels**: Dicionário {campo: texto do label no documento}
+    - **direction**: auto (padrão), right ou below
+    - **max_gap**: Distância máxima entre label e valor, em pontos - opcional
+    
+    **Exemplo:**
+    ```json
+    {
+        "pdf_base64": "...",
+        "labels": {"nome": "Nome", "inscricao": "Inscrição"}
+    }
+    ```
+    """
+    request_start = time.time()
+    
+    try:
+        try:
+            pdf_bytes = base64.b64decode(request.pdf_base64)
+        except Exception:
+            raise HTTPException(
+                status_code=400,
+                detail="PDF base64 inválido"
+            )
+        
+        options = build_extraction_options(request.model_copy(update={"layout": True}))
+        extraction = await extract_text_from_pdf_async(pdf_bytes, options, http_request)
+        index = PositionalIndex(extraction.lines)
+        
+        fields = {}
+        matches = {}
+        for field_name, label_text in request.labels.items():
+            match = index.value_for(label_text, request.direction, max_gap=request.max_gap)
+            if match is None:
+                fields[field_name] = None
+                matches[field_name] = LayoutFieldMatch()
+                continue
+            fields[field_name] = match.value
+            matches[field_name] = LayoutFieldMatch(
+                value=match.value,
+                relation=match.relation,
+                label_line=layout_line_to_dict(match.label_line),
+                value_line=layout_line_to_dict(match.value_line)
+            )
+        
+        processing_time = int((time.time() - request_start) * 1000)
+        found = sum(1 for value in fields.values() if value is not None)
+        logger.info(f"📐 Layout-extract: {found}/{len(fields)} campos em {len(extraction.lines)} linhas ({processing_time}ms)")
+        
+        return LayoutExtractResponse(
+            fields=fields,
+            matches=matches,
+            total_lines=len(extraction.lines),
+            total_pages=extraction.total_pages,
+            processing_time_ms=processing_time
         )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Erro no layout-extract: {e}")
+        raise pdf_error_to_http(e)
+
+@app.post('/extract-text/raw', response_model=PDFResponse, tags=["PDF"])
+async def extract_text_raw(http_request: Request, params: PDFExtractionParams = Depends()):
+    """
+    Extrai texto de um PDF enviado como binário (sem base64).
+    
+    **Corpo aceito:**
+    - `Content-Type: application/pdf` (ou `application/octet-stream`) com os bytes do PDF
+    - `Content-Type: multipart/form-data` com o arquivo no campo **file**
+    
+    O upload é gravado em um buffer spooled e passado direto ao leitor de PDF,
+    evitando o overhead de ~33% do base64 e a cópia extra da decodificação.
+    
+    **Query params:** `page_start`, `page_end`, `max_pages`, `max_chars`, `backend`, `layout` (mesmo significado de `/extract-text`).
+    
+    **Retorna:** o mesmo formato de `/extract-text`.
+    """
+    request_start = time.time()
+    pdf_buffer = None
+    
+    try:
+        options = build_extraction_options(params)
+        pdf_buffer = await spool_pdf_upload(http_request)
+        
+        extraction = await extract_text_from_pdf_async(pdf_buffer, options, http_request)
+        
+        total_time = time.time() - request_start
+        logger.info(f"✨ Requisição (raw) completa em {total_time:.3f}s - {len(extraction.text)} caracteres extraídos")
+        
+        return build_pdf_response(extraction)
+        
+    except HTTPException:
+        error_time = time.time() - request_start
+        logger.warning(f"⚠️  Requisição (raw) falhou após {error_time:.3f}s")
+        raise
+    except Exception as e:
+        error_time = time.time() - request_start
+        logger.error(f"❌ Erro no endpoint raw após {error_time:.3f}s: {e}")
+        logger.info("="*60)
+        raise pdf_error_to_http(e)
+    finally:
+        if pdf_buffer is not None:
+            pdf_buffer.close()
+
+@app.post('/extract-text/stream', tags=["PDF"])
+async def extract_text_stream(
+    http_request: Request,
+    format: Literal["ndjson", "sse"] = Query("ndjson", description="Formato do stream: ndjson ou sse"),
+    params: PDFExtractionParams = Depends()
+):
+    """
+    Extrai texto de PDF emitindo cada página assim que ela é processada.
+    
+    **Corpo aceito:** JSON `{"pdf_base64": "..."}`, `application/pdf` ou `multipart/form-data` (campo **file**).
+    
+    **Eventos:**
+    - **progress**: `{page, total_pages, text, char_count, elapsed_ms, cached}` para cada página, em ordem
+    - **complete**: `{total_pages, pages_extracted, char_count, truncated, processing_time_ms}` ao final
+    - **error**: `{detail, page}` se a extração falhar no meio do caminho (inclusive por limite de tempo/memória)
+    
+    Em NDJSON cada linha é um objeto com o campo `type`; em SSE o tipo vai em `event:`.
+    Faixa e limites (`page_start`, `page_end`, `max_pages`, `max_chars`, `timeout_seconds`,
+    `memory_limit_mb`) vêm do corpo JSON ou dos query params. Se o cliente desconectar,
+    a extração é cancelada.
+    """
+    request_start = time.time()
+    pdf_source, options = await read_pdf_source(http_request, params)
+    cancel_event = threading.Event()
+    options = options._replace(cancel_event=cancel_event)
+    
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_until_disconnect(generate_page_events(pdf_source, options, format, request_start), cancel_event, http_request),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post('/extract-text/batch', tags=["PDF"])
+async def extract_text_batch(
+    http_request: Request,
+    format: Literal["ndjson", "sse"] = Query("ndjson", description="Formato do stream: ndjson ou sse"),
+    params: PDFExtractionParams = Depends()
+):
+    """
+    Extrai texto de vários PDFs em uma única requisição, devolvendo cada resultado assim que fica pronto.
+    
+    **Corpo aceito:**
+    - JSON `{"documents": [{"id": "a.pdf", "pdf_base64": "...", "max_pages": 1}, ...]}`
+      (cada documento aceita `page_start`, `page_end`, `max_pages`, `max_chars`)
+    - `multipart/form-data` com vários arquivos (id = nome do arquivo; limites via query params)
+    
+    Os documentos são agendados em paralelo (PDF_BATCH_CONCURRENCY) e o parsing roda no pool
+    de processos. Erros são reportados por documento, sem interromper o lote.
+    
+    **Eventos:**
+    - **result**: `{index, id, text, char_count, total_pages, pages_extracted, cached_pages, truncated}`
+    - **error**: `{index, id, detail}`
+    - **complete**: `{total, success_count, error_count, processing_time_ms}`
+    """
+    request_start = time.time()
+    documents = await read_batch_documents(http_request, params)
+    logger.info(f"📦 Lote recebido: {len(documents)} documento(s)")
+    
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        generate_batch_events(documents, format, request_start),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get('/cache/stats', tags=["Cache"])
 async def cache_stats():
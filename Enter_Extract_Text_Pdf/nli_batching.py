@@ -0,0 +1,164 @@
+"""
+Execução NLI em lotes por comprimento (padding dinâmico)
+
+O pipeline zero-shot do transformers monta os pares (texto, hipótese) na
+ordem de entrada e preenche cada lote até o par mais longo: um parágrafo no
+mesmo lote que "CPF:" faz todo o lote pagar pelo parágrafo. Aqui:
+
+- cada texto e cada hipótese são tokenizados uma única vez por chamada
+  (o template da hipótese não é re-tokenizado a cada par);
+- os pares são montados a partir dos ids (tokens especiais e truncamento
+  apenas do texto, como no pipeline), ordenados por comprimento e divididos
+  em lotes limitados por NLI_BUCKET_MAX_PAIRS pares e NLI_BUCKET_MAX_TOKENS
+  tokens com padding;
+- cada lote é preenchido apenas até o seu par mais longo;
+- os scores são calculados como no pipeline e devolvidos na ordem original.
+
+Tokenizers que não montam pares a partir de ids de forma idêntica ao
+pipeline (verificado uma vez por tokenizer) usam o pipeline diretamente.
+"""
+import logging
+import os
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NLI_LENGTH_BUCKETING = os.getenv("NLI_LENGTH_BUCKETING", "true").lower() == "true"
+NLI_BUCKET_MAX_PAIRS = int(os.getenv("NLI_BUCKET_MAX_PAIRS", "64"))  # pares por forward
+NLI_BUCKET_MAX_TOKENS = int(os.getenv("NLI_BUCKET_MAX_TOKENS", "4096"))  # pares × comprimento do lote (com padding)
+
+_PAIR_CHECK_PREMISE = "Nome Completo:"
+_PAIR_CHECK_HYPOTHESIS = "Este texto é valor ou dado extraído"
+
+# Tokenizers verificados (id → monta pares igual ao pipeline)
+_pair_assembly_ok: Dict[int, bool] = {}
+
+
+def _max_length(tokenizer):
+    """Comprimento máximo do par (None = sem truncamento, como no pipeline sem limite definido)"""
+    max_length = tokenizer.model_max_length
+    return max_length if max_length and max_length < 1_000_000 else None
+
+
+def _assemble_pair(tokenizer, premise_ids: List[int], hypothesis_ids: List[int], max_length) -> Dict[str, List[int]]:
+    """Par (texto, hipótese) a partir dos ids, truncando apenas o texto"""
+    return tokenizer.prepare_for_model(
+        premise_ids,
+        hypothesis_ids,
+        add_special_tokens=True,
+        truncation="only_first" if max_length else False,
+        max_length=max_length,
+        return_attention_mask=True,
+    )
+
+
+def supports_pair_assembly(tokenizer) -> bool:
+    """Verifica (uma vez) se montar o par a partir dos ids reproduz a tokenização do pipeline"""
+    key = id(tokenizer)
+    if key not in _pair_assembly_ok:
+        try:
+            expected = tokenizer(_PAIR_CHECK_PREMISE, _PAIR_CHECK_HYPOTHESIS)
+            assembled = _assemble_pair(
+                tokenizer,
+                tokenizer.encode(_PAIR_CHECK_PREMISE, add_special_tokens=False),
+                tokenizer.encode(_PAIR_CHECK_HYPOTHESIS, add_special_tokens=False),
+                _max_length(tokenizer)
+            )
+            _pair_assembly_ok[key] = all(assembled.get(name) == expected[name] for name in expected.keys())
+        except Exception as e:
+            logger.debug(f"Montagem de pares indisponível: {e}")
+            _pair_assembly_ok[key] = False
+        if not _pair_assembly_ok[key]:
+            logger.warning("⚠️ Tokenizer não suporta montagem de pares por ids - NLI sem lotes por comprimento")
+    return _pair_assembly_ok[key]
+
+
+def _length_buckets(lengths: List[int], max_pairs: int, max_tokens: int) -> List[List[int]]:
+    """Índices dos pares ordenados por comprimento, divididos em lotes (pares × maior comprimento <= max_tokens)"""
+    buckets = []
+    current: List[int] = []
+    for index in sorted(range(len(lengths)), key=lengths.__getitem__):
+        # Ordem crescente: o par atual é o mais longo do lote
+        if current and (len(current) >= max_pairs or (len(current) + 1) * lengths[index] > max_tokens):
+            buckets.append(current)
+            current = []
+        current.append(index)
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+def _entailment_id(model) -> int:
+    for label, index in model.config.label2id.items():
+        if label.lower().startswith("entail"):
+            return index
+    return -1
+
+
+def classify_bucketed(classifier, texts: List[str], candidate_labels: List[str], hypothesis_template: str,
+                      multi_label: bool = False, max_pairs: int = NLI_BUCKET_MAX_PAIRS,
+                      max_tokens: int = NLI_BUCKET_MAX_TOKENS) -> List[dict]:
+    """
+    Equivalente a classifier(texts, candidate_labels, ...) com pares agrupados por comprimento
+
+    Returns:
+        Um dict {"sequence", "labels", "scores"} por texto, na ordem de entrada
+    """
+    import torch
+
+    if not texts:
+        return []
+
+    tokenizer = classifier.tokenizer
+    model = classifier.model
+    max_length = _max_length(tokenizer)
+
+    hypothesis_ids = [
+        tokenizer.encode(hypothesis_template.format(label), add_special_tokens=False)
+        for label in candidate_labels
+    ]
+    premise_ids = [tokenizer.encode(text, add_special_tokens=False) for text in texts]
+
+    # Par i = texto i // n, hipótese i % n (mesma disposição do pipeline)
+    pairs = [
+        _assemble_pair(tokenizer, premise, hypothesis, max_length)
+        for premise in premise_ids
+        for hypothesis in hypothesis_ids
+    ]
+    lengths = [len(pair["input_ids"]) for pair in pairs]
+
+    logits = None
+    device = getattr(model, "device", None)
+    with torch.inference_mode():
+        for bucket in _length_buckets(lengths, max_pairs, max_tokens):
+            batch = tokenizer.pad([pairs[index] for index in bucket], padding=True, return_tensors="pt")
+            if device is not None:
+                batch = batch.to(device)
+            bucket_logits = model(**batch).logits.float().cpu().numpy()
+            if logits is None:
+                logits = np.empty((len(pairs), bucket_logits.shape[-1]), dtype=np.float32)
+            logits[bucket] = bucket_logits
+
+    # Scores como no postprocess do pipeline zero-shot
+    reshaped = logits.reshape((len(texts), len(candidate_labels), -1))
+    entailment_id = _entailment_id(model)
+    if multi_label or len(candidate_labels) == 1:
+        contradiction_id = -1 if entailment_id == 0 else 0
+        entail_contr_logits = reshaped[..., [contradiction_id, entailment_id]]
+        scores = np.exp(entail_contr_logits) / np.exp(entail_contr_logits).sum(-1, keepdims=True)
+        scores = scores[..., 1]
+    else:
+        entail_logits = reshaped[..., entailment_id]
+        scores = np.exp(entail_logits) / np.exp(entail_logits).sum(-1, keepdims=True)
+
+    results = []
+    for text, text_scores in zip(texts, scores):
+        order = list(reversed(text_scores.argsort()))
+        results.append({
+            "sequence": text,
+            "labels": [candidate_labels[index] for index in order],
+            "scores": text_scores[order].tolist(),
+        })
+    return results
@@ -0,0 +1,471 @@
+"""
+Backends de extração de texto de PDF (PyPDF2, PyMuPDF, pypdfium2)
+
+Cada backend expõe a mesma interface mínima usada pelo pdf_extractor:
+abrir o documento, contar páginas, extrair o texto de uma página e
+(quando possível) calcular uma impressão digital do conteúdo da página
+para o cache compartilhado entre PDFs. Backends com supports_layout
+também entregam as linhas com posição e tamanho de fonte. classify_page
+é a pré-análise barata (fontes, imagens, tamanho do content stream) usada
+para pular páginas sem camada de texto.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from importlib import metadata
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from pdf_layout import LayoutLine
+
+logger = logging.getLogger(__name__)
+
+# Backend usado quando a requisição não escolhe um
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pypdf2").lower()
+# Backend usado no modo layout quando a requisição não escolhe um (PyPDF2 não expõe coordenadas confiáveis)
+PDF_LAYOUT_BACKEND = os.getenv("PDF_LAYOUT_BACKEND", "pymupdf").lower()
+
+# Classificação das páginas (pré-análise)
+PAGE_TEXT = "text"
+PAGE_EMPTY = "empty"
+PAGE_IMAGE_ONLY = "image_only"
+PAGE_KINDS = (PAGE_TEXT, PAGE_EMPTY, PAGE_IMAGE_ONLY)
+
+# Profundidade máxima de Form XObjects aninhados inspecionados na classificação e na impressão digital
+_CLASSIFY_MAX_DEPTH = 3
+
+# Operadores que desenham texto (Tj, TJ, ' e "): blocos BT/ET vazios não contam como texto
+_TEXT_SHOW_OPERATORS = re.compile(rb"\bT[jJ]\b|[)>\]]\s*['\"]")
+_INLINE_IMAGE = re.compile(rb"\bBI\b")
+
+
+def _shows_text(content: bytes) -> bool:
+    """Se o content stream desenha algum texto"""
+    return _TEXT_SHOW_OPERATORS.search(content) is not None
+
+
+@lru_cache(maxsize=None)
+def _package_version(dist_name: str) -> str:
+    try:
+        return metadata.version(dist_name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class PdfBackend:
+    """Interface comum dos backends de extração"""
+    name = ""
+    dist_name = ""
+    supports_layout = False
+
+    @property
+    def version(self) -> str:
+        return _package_version(self.dist_name)
+
+    def is_available(self) -> bool:
+        raise NotImplementedError
+
+    def open(self, stream: BinaryIO) -> Any:
+        """Abre o documento a partir de um stream binário posicionado no início"""
+        raise NotImplementedError
+
+    def page_count(self, doc: Any) -> int:
+        raise NotImplementedError
+
+    def extract_page(self, doc: Any, page_num: int) -> str:
+        raise NotImplementedError
+
+    def page_fingerprint(self, doc: Any, page_num: int) -> Optional[str]:
+        """Hash do conteúdo da página (None se o backend não conseguir identificá-la)"""
+        return None
+
+    def extract_page_layout(self, doc: Any, page_num: int) -> List[LayoutLine]:
+        """Linhas da página com caixa (origem no topo) e tamanho de fonte"""
+        raise NotImplementedError
+
+    def classify_page(self, doc: Any, page_num: int) -> str:
+        """
+        Classifica a página sem extrair o texto: text, empty ou image_only
+
+        Na dúvida, retorna text (a página é extraída normalmente).
+        """
+        return PAGE_TEXT
+
+    def close(self, doc: Any):
+        pass
+
+
+class PyPDF2Backend(PdfBackend):
+    """PyPDF2 (Python puro) - backend padrão"""
+    name = "pypdf2"
+    dist_name = "PyPDF2"
+
+    def is_available(self) -> bool:
+        try:
+            import PyPDF2  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def open(self, stream: BinaryIO) -> Any:
+        import PyPDF2
+        return PyPDF2.PdfReader(stream)
+
+    def page_count(self, doc: Any) -> int:
+        return len(doc.pages)
+
+    def extract_page(self, doc: Any, page_num: int) -> str:
+        return doc.pages[page_num].extract_text()
+
+    def page_fingerprint(self, doc: Any, page_num: int) -> Optional[str]:
+        """
+        Hash do content stream + rotação + fontes usadas (encoding e ToUnicode) + Form XObjects
+
+        None (cache por documento) se algum Form XObject não puder ser incluído no hash.
+        """
+        page = doc.pages[page_num]
+        digest = hashlib.sha256()
+        digest.update(_pypdf2_page_contents(page))
+        digest.update(str(page.get("/Rotate", 0)).encode())
+
+        if not _hash_pypdf2_resources(digest, page.get("/Resources"), 0):
+            return None
+        return digest.hexdigest()[:40]
+
+    def classify_page(self, doc: Any, page_num: int) -> str:
+        page = doc.pages[page_num]
+        data = _pypdf2_page_contents(page)
+        if not data.strip():
+            return PAGE_EMPTY
+
+        has_text, has_images = _scan_pypdf2_content(data, page.get("/Resources"), 0)
+        if has_text:
+            return PAGE_TEXT
+        return PAGE_IMAGE_ONLY if has_images else PAGE_EMPTY
+
+
+def _pypdf2_page_contents(page: Any) -> bytes:
+    """Content stream da página (/Contents pode ser um array de streams)"""
+    contents = page.get_contents()
+    if contents is None:
+        return b""
+    if hasattr(contents, "get_data"):
+        return contents.get_data()
+    return b"\n".join(stream.get_object().get_data() for stream in contents)
+
+
+def _hash_pypdf2_resources(digest: "hashlib._Hash", resources: Any, depth: int) -> bool:
+    """
+    Inclui no hash as fontes e os Form XObjects (stream, matriz e recursos, recursivamente)
+
+    Returns:
+        False se algum Form XObject não puder ser incluído (profundidade ou erro de leitura)
+    """
+    resources = resources.get_object() if resources is not None else {}
+    fonts = resources.get("/Font")
+    if fonts is not None:
+        fonts = fonts.get_object()
+        for font_name in sorted(fonts.keys()):
+            font = fonts[font_name].get_object()
+            digest.update(f"{font_name}|{font.get('/BaseFont')}|{font.get('/Subtype')}".encode())
+
+            encoding = font.get("/Encoding")
+            if encoding is not None:
+                encoding = encoding.get_object()
+                digest.update(str(encoding.get("/Differences") if hasattr(encoding, "keys") else encoding).encode())
+
+            to_unicode = font.get("/ToUnicode")
+            if to_unicode is not None:
+                digest.update(to_unicode.get_object().get_data())
+
+    xobjects = resources.get("/XObject")
+    if xobjects is not None:
+        xobjects = xobjects.get_object()
+        for xobject_name in sorted(xobjects.keys()):
+            xobject = xobjects[xobject_name].get_object()
+            if xobject.get("/Subtype") != "/Form":
+                continue  # imagens não alteram o texto extraído
+            if depth >= _CLASSIFY_MAX_DEPTH:
+                return False
+            try:
+                data = xobject.get_data()
+            except Exception as e:
+                logger.debug(f"Form XObject {xobject_name} sem hash: {e}")
+                return False
+            digest.update(f"{xobject_name}|{xobject.get('/Matrix')}|{len(data)}".encode())
+            digest.update(data)
+            if not _hash_pypdf2_resources(digest, xobject.get("/Resources"), depth + 1):
+                return False
+    return True
+
+
+def _scan_pypdf2_content(data: bytes, resources: Any, depth: int) -> Tuple[bool, bool]:
+    """(desenha texto, tem imagens) de um content stream, incluindo Form XObjects aninhados"""
+    resources = resources.get_object() if resources is not None else {}
+    fonts = resources.get("/Font")
+    if fonts is not None and len(fonts.get_object()) > 0 and _shows_text(data):
+        return True, False
+
+    has_images = _INLINE_IMAGE.search(data) is not None
+    xobjects = resources.get("/XObject")
+    if xobjects is not None:
+        for xobject in xobjects.get_object().values():
+            xobject = xobject.get_object()
+            subtype = xobject.get("/Subtype")
+            if subtype == "/Image":
+                has_images = True
+            elif subtype == "/Form" and depth < _CLASSIFY_MAX_DEPTH:
+                form_text, form_images = _scan_pypdf2_content(xobject.get_data(), xobject.get("/Resources"), depth + 1)
+                if form_text:
+                    return True, has_images or form_images
+                has_images = has_images or form_images
+    return False, has_images
+
+
+def _import_pymupdf():
+    """PyMuPDF >= 1.24 expõe 'pymupdf'; versões anteriores apenas 'fitz'"""
+    try:
+        import pymupdf
+    except ImportError:
+        import fitz as pymupdf
+    return pymupdf
+
+
+class PyMuPDFBackend(PdfBackend):
+    """PyMuPDF (MuPDF em C)"""
+    name = "pymupdf"
+    dist_name = "PyMuPDF"
+    supports_layout = True
+
+    def is_available(self) -> bool:
+        try:
+            _import_pymupdf()
+            return True
+        except ImportError:
+            return False
+
+    def open(self, stream: BinaryIO) -> Any:
+        return _import_pymupdf().open(stream=stream.read(), filetype="pdf")
+
+    def page_count(self, doc: Any) -> int:
+        return doc.page_count
+
+    def extract_page(self, doc: Any, page_num: int) -> str:
+        return doc.load_page(page_num).get_text("text")
+
+    def page_fingerprint(self, doc: Any, page_num: int) -> Optional[str]:
+        """
+        Hash do content stream + rotação + fontes (com ToUnicode) + Form XObjects (sem xrefs, que variam entre arquivos)
+
+        None (cache por documento) se algum Form XObject não puder ser incluído no hash.
+        """
+        page = doc.load_page(page_num)
+        digest = hashlib.sha256()
+        digest.update(page.read_contents())
+        digest.update(str(page.rotation).encode())
+
+        # full=True inclui as fontes e Form XObjects usados dentro de Form XObjects;
+        # o último campo (referenciador) é o xref do Form XObject que os usa (0 = página)
+        forms = page.get_xobjects()
+        form_names = {xref: name for xref, name, *_ in forms}
+        form_depths = _pymupdf_form_depths(forms)
+        fonts = page.get_fonts(full=True)
+        for xref, ext, font_type, base_font, font_name, encoding, referencer in sorted(
+                fonts, key=lambda f: (form_depths.get(f[6], 0), form_names.get(f[6], ""), f[4])):
+            digest.update(f"{form_names.get(referencer, '')}|{font_name}|{base_font}|{font_type}|{ext}|{encoding}".encode())
+            to_unicode = doc.xref_get_key(xref, "ToUnicode")
+            if to_unicode[0] == "xref":
+                digest.update(doc.xref_stream(int(to_unicode[1].split()[0])) or b"")
+
+        for xref, name, invoker, _ in sorted(forms, key=lambda f: (form_depths.get(f[0], 0), form_names.get(f[2], ""), f[1])):
+            depth = form_depths.get(xref)
+            if depth is None or depth > _CLASSIFY_MAX_DEPTH:
+                return None
+            try:
+                data = doc.xref_stream(xref) or b""
+            except Exception as e:
+                logger.debug(f"Form XObject {name} sem hash: {e}")
+                return None
+            digest.update(f"{form_names.get(invoker, '')}|{name}|{doc.xref_get_key(xref, 'Matrix')[1]}|{len(data)}".encode())
+            digest.update(data)
+        return digest.hexdigest()[:40]
+
+    def extract_page_layout(self, doc: Any, page_num: int) -> List[LayoutLine]:
+        lines = []
+        for block in doc.load_page(page_num).get_text("dict")["blocks"]:
+            for line in block.get("lines", []):  # blocos de imagem não têm linhas
+                spans = line["spans"]
+                text = "".join(span["text"] for span in spans)
+                if not text.strip():
+                    continue
+                x0, y0, x1, y1 = (round(coord, 2) for coord in line["bbox"])
+                font_size = max(span["size"] for span in spans)
+                lines.append(LayoutLine(page_num, text, x0, y0, x1, y1, round(font_size, 2)))
+        return lines
+
+    def classify_page(self, doc: Any, page_num: int) -> str:
+        page = doc.load_page(page_num)
+        contents = page.read_contents()
+        if not contents.strip():
+            return PAGE_EMPTY
+        # Fontes declaradas não bastam (recursos costumam ser compartilhados entre páginas):
+        # o content stream da página ou de algum Form XObject precisa desenhar texto
+        streams = [contents] + [doc.xref_stream(xobject[0]) or b"" for xobject in page.get_xobjects()]
+        if page.get_fonts(full=True) and any(_shows_text(stream) for stream in streams):
+            return PAGE_TEXT
+        # full=True inclui imagens usadas dentro de Form XObjects
+        return PAGE_IMAGE_ONLY if page.get_images(full=True) else PAGE_EMPTY
+
+    def close(self, doc: Any):
+        doc.close()
+
+
+def _pymupdf_form_depths(forms: List[Tuple]) -> Dict[int, int]:
+    """Profundidade de cada Form XObject (1 = usado pela página), pela cadeia de invocadores"""
+    invokers = {xref: invoker for xref, _, invoker, _ in forms}
+    depths: Dict[int, int] = {}
+    for xref in invokers:
+        depth, current = 0, xref
+        while current and depth <= _CLASSIFY_MAX_DEPTH:
+            depth += 1
+            current = invokers.get(current, 0)
+        depths[xref] = depth  # > _CLASSIFY_MAX_DEPTH: cadeia longa demais (ou cíclica)
+    return depths
+
+
+class PdfiumBackend(PdfBackend):
+    """pypdfium2 (PDFium do Chromium)"""
+    name = "pdfium"
+    dist_name = "pypdfium2"
+    supports_layout = True
+
+    # PDFium não é thread-safe: chamadas serializadas dentro do processo
+    _lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        try:
+            import pypdfium2  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def open(self, stream: BinaryIO) -> Any:
+        import pypdfium2
+        with self._lock:
+            return pypdfium2.PdfDocument(stream.read())
+
+    def page_count(self, doc: Any) -> int:
+        with self._lock:
+            return len(doc)
+
+    def extract_page(self, doc: Any, page_num: int) -> str:
+        with self._lock:
+            page = doc[page_num]
+            try:
+                text_page = page.get_textpage()
+                try:
+                    text = text_page.get_text_range()
+                finally:
+                    text_page.close()
+            finally:
+                page.close()
+        return text.replace("\r\n", "\n")
+
+    def extract_page_layout(self, doc: Any, page_num: int) -> List[LayoutLine]:
+        """Trechos de texto (retângulos do PDFium) convertidos para origem no topo"""
+        import pypdfium2.raw as pdfium_c
+
+        lines = []
+        with self._lock:
+            page = doc[page_num]
+            try:
+                page_height = page.get_height()
+                text_page = page.get_textpage()
+                try:
+                    for rect_index in range(text_page.count_rects()):
+                        left, bottom, right, top = text_page.get_rect(rect_index)
+                        text = text_page.get_text_bounded(left, bottom, right, top)
+                        if not text.strip():
+                            continue
+                        # Tamanho da fonte do primeiro caractere do trecho (altura da caixa como fallback)
+                        char_index = text_page.get_index((left + right) / 2, (bottom + top) / 2, right - left, top - bottom)
+                        font_size = pdfium_c.FPDFText_GetFontSize(text_page.raw, char_index) if char_index >= 0 else 0.0
+                        lines.append(LayoutLine(page_num, text.replace("\r\n", " "),
+                                                round(left, 2), round(page_height - top, 2),
+                                                round(right, 2), round(page_height - bottom, 2),
+                                                round(font_size or top - bottom, 2)))
+                finally:
+                    text_page.close()
+            finally:
+                page.close()
+        return lines
+
+    def classify_page(self, doc: Any, page_num: int) -> str:
+        import pypdfium2.raw as pdfium_c
+
+        with self._lock:
+            page = doc[page_num]
+            try:
+                object_types = {obj.type for obj in page.get_objects(max_depth=_CLASSIFY_MAX_DEPTH)}
+            finally:
+                page.close()
+        if pdfium_c.FPDF_PAGEOBJ_TEXT in object_types:
+            return PAGE_TEXT
+        return PAGE_IMAGE_ONLY if pdfium_c.FPDF_PAGEOBJ_IMAGE in object_types else PAGE_EMPTY
+
+    def close(self, doc: Any):
+        with self._lock:
+            doc.close()
+
+
+# Registro dos backends disponíveis (nome → instância)
+BACKENDS: Dict[str, PdfBackend] = {
+    backend.name: backend
+    for backend in (PyPDF2Backend(), PyMuPDFBackend(), PdfiumBackend())
+}
+
+
+def get_backend(name: Optional[str] = None) -> PdfBackend:
+    """
+    Retorna o backend pelo nome (padrão: PDF_BACKEND)
+
+    Raises:
+        ValueError: Se o backend não existir ou a biblioteca não estiver instalada
+    """
+    name = (name or PDF_BACKEND).lower()
+    backend = BACKENDS.get(name)
+    if backend is None:
+        raise ValueError(f"Backend de PDF desconhecido: '{name}' (opções: {', '.join(BACKENDS)})")
+    if not backend.is_available():
+        raise ValueError(f"Backend de PDF '{name}' indisponível: biblioteca '{backend.dist_name}' não instalada")
+    return backend
+
+
+def get_layout_backend(name: Optional[str] = None) -> PdfBackend:
+    """
+    Retorna o backend do modo layout (padrão: PDF_LAYOUT_BACKEND)
+
+    Raises:
+        ValueError: Se o backend não existir, não estiver instalado ou não suportar layout
+    """
+    backend = get_backend(name or PDF_LAYOUT_BACKEND)
+    if not backend.supports_layout:
+        layout_backends = ", ".join(b.name for b in BACKENDS.values() if b.supports_layout)
+        raise ValueError(f"Backend de PDF '{backend.name}' não suporta modo layout (opções: {layout_backends})")
+    return backend
+
+
+def available_backends() -> List[Dict[str, Any]]:
+    """Lista os backends registrados com disponibilidade e versão"""
+    return [
+        {
+            "name": backend.name,
+            "available": backend.is_available(),
+            "version": backend.version if backend.is_available() else None,
+            "default": backend.name == PDF_BACKEND,
+            "layout": backend.supports_layout,
+        }
+        for backend in BACKENDS.values()
+    ]
@@ -0,0 +1,692 @@
+"""
+PDF Text Extractor com paralelismo por página (pool de processos isolados,
+com orçamento de tempo/memória e cancelamento - ver pdf_workers) e
+backends de extração plugáveis (ver pdf_backends); modo layout com
+linhas posicionadas (ver pdf_layout)
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from pdf_backends import PAGE_TEXT, PdfBackend, get_backend, get_layout_backend
+from pdf_layout import LayoutLine, lines_to_text
+from pdf_workers import KillablePdfPool, PageMarker, TaskBudget, make_budget
+from redis_client import get_cache, set_cache, get_cache_many, set_cache_many
+
+logger = logging.getLogger(__name__)
+
+# Configuração do pool de processos
+PDF_POOL_WORKERS = int(os.getenv("PDF_POOL_WORKERS", str(os.cpu_count() or 1)))
+PDF_POOL_START_METHOD = os.getenv("PDF_POOL_START_METHOD", "spawn")
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))  # abaixo disso usa uma única faixa (um worker)
+PDF_SHARDS_PER_WORKER = int(os.getenv("PDF_SHARDS_PER_WORKER", "2"))  # granularidade do balanceamento
+PDF_WORKER_DOC_CACHE = int(os.getenv("PDF_WORKER_DOC_CACHE", "4"))  # PDFs abertos mantidos por worker
+PDF_PAGE_CACHE = os.getenv("PDF_PAGE_CACHE", "true").lower() == "true"  # reaproveitar páginas já cacheadas por outros PDFs
+# Pré-análise das páginas: páginas vazias ou só com imagem (digitalizadas) não são extraídas
+PDF_CLASSIFY_PAGES = os.getenv("PDF_CLASSIFY_PAGES", "true").lower() == "true"
+
+# Isolamento: com o pool ativo, todo o parsing (inclusive abrir o PDF) roda nos workers,
+# onde prazo e memória são garantidos matando o processo. false = PDFs pequenos no próprio thread
+PDF_ISOLATE_EXTRACTION = os.getenv("PDF_ISOLATE_EXTRACTION", "true").lower() == "true"
+PDF_TIMEOUT_SECONDS = float(os.getenv("PDF_TIMEOUT_SECONDS", "120"))  # por requisição (0 = sem limite)
+PDF_MEMORY_LIMIT_MB = float(os.getenv("PDF_MEMORY_LIMIT_MB", "1024"))  # crescimento do worker por tarefa (0 = sem limite)
+
+# Versão do formato de cache: junto com backend e versão da biblioteca, faz parte das chaves
+# (mudar invalida o texto cacheado)
+CACHE_FORMAT_VERSION = "v2"  # v2: impressão digital das páginas inclui Form XObjects
+
+# Origem aceita pelo extrator: bytes em memória ou arquivo/buffer binário (ex: SpooledTemporaryFile)
+PdfSource = Union[bytes, BinaryIO]
+
+
+class PageResult(NamedTuple):
+    """Página extraída"""
+    index: int
+    total: int
+    text: str
+    seconds: float
+    cached: bool = False
+    kind: str = PAGE_TEXT  # text | empty | image_only (as duas últimas não são extraídas)
+
+
+class ExtractionOptions(NamedTuple):
+    """Parâmetros de uma extração (páginas em base 1, limites opcionais)"""
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+    max_pages: Optional[int] = None
+    max_chars: Optional[int] = None
+    use_cache: bool = True
+    force_pool: bool = False  # envia ao pool mesmo PDFs pequenos (lotes: tira o trabalho do GIL do processo principal)
+    backend: Optional[str] = None  # backend de extração (padrão: PDF_BACKEND, ou PDF_LAYOUT_BACKEND no modo layout)
+    layout: bool = False  # linhas com página, caixa e tamanho de fonte (além do texto)
+    timeout: Optional[float] = None  # segundos (padrão: PDF_TIMEOUT_SECONDS)
+    memory_mb: Optional[float] = None  # MB (padrão: PDF_MEMORY_LIMIT_MB)
+    cancel_event: Optional[threading.Event] = None  # sinalizado quando o cliente desconecta
+    classify_pages: Optional[bool] = None  # pré-análise das páginas (padrão: PDF_CLASSIFY_PAGES)
+
+
+class DocumentExtraction(NamedTuple):
+    """Resultado da extração de um documento"""
+    text: str
+    total_pages: int
+    extracted_pages: int
+    cached_pages: int
+    truncated: bool
+    lines: Optional[List[LayoutLine]] = None  # apenas no modo layout
+    page_kinds: Optional[Dict[int, str]] = None  # classificação das páginas entregues (base 0)
+
+
+# Pool global (inicializado no startup)
+process_pool: Optional[KillablePdfPool] = None
+
+# Cache de documentos abertos DENTRO de cada worker (um PDF é parseado uma única vez por processo e backend)
+_worker_readers: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+
+
+def initialize_pdf_pool() -> bool:
+    """Inicializa o pool de processos para extração paralela de páginas"""
+    global process_pool
+
+    if PDF_POOL_WORKERS <= 1:
+        logger.info("📄 Pool de PDF desabilitado (PDF_POOL_WORKERS <= 1) - extração serial")
+        process_pool = None
+        return False
+
+    try:
+        process_pool = KillablePdfPool(PDF_POOL_WORKERS, PDF_POOL_START_METHOD)
+
+        # Aquecer workers para não pagar o spawn na primeira requisição
+        process_pool.warmup(timeout=60)
+
+        logger.info(f"✅ Pool de extração de PDF iniciado ({PDF_POOL_WORKERS} processos, método '{PDF_POOL_START_METHOD}', "
+                    f"limites: {PDF_TIMEOUT_SECONDS:g}s / {PDF_MEMORY_LIMIT_MB:g} MB)")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Erro ao iniciar pool de PDF: {e}")
+        if process_pool is not None:
+            process_pool.shutdown()
+        process_pool = None
+        return False
+
+
+def shutdown_pdf_pool():
+    """Encerra o pool de processos"""
+    global process_pool
+    if process_pool is not None:
+        process_pool.shutdown()
+        process_pool = None
+        logger.info("🛑 Pool de extração de PDF encerrado")
+
+
+def _open_stream(pdf_source: PdfSource) -> BinaryIO:
+    """Retorna um stream binário posicionado no início do PDF"""
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(pdf_source)
+    pdf_source.seek(0)
+    return pdf_source
+
+
+def _read_source_bytes(pdf_source: PdfSource) -> bytes:
+    """Lê os bytes do PDF (necessário para enviar o documento aos workers)"""
+    if isinstance(pdf_source, bytes):
+        return pdf_source
+    if isinstance(pdf_source, (bytearray, memoryview)):
+        return bytes(pdf_source)
+    pdf_source.seek(0)
+    return pdf_source.read()
+
+
+def source_size(pdf_source: PdfSource) -> int:
+    """Tamanho do PDF em bytes, sem ler o conteúdo"""
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        return len(pdf_source)
+    pdf_source.seek(0, io.SEEK_END)
+    size = pdf_source.tell()
+    pdf_source.seek(0)
+    return size
+
+
+def _get_worker_reader(backend: PdfBackend, doc_key: str, pdf_bytes: bytes) -> Any:
+    """Obtém (ou abre) o documento no worker atual"""
+    cache_key = (backend.name, doc_key)
+    reader = _worker_readers.get(cache_key)
+    if reader is not None:
+        _worker_readers.move_to_end(cache_key)
+        return reader
+
+    reader = backend.open(io.BytesIO(pdf_bytes))
+    _worker_readers[cache_key] = reader
+    while len(_worker_readers) > PDF_WORKER_DOC_CACHE:
+        (evicted_backend, _), evicted = _worker_readers.popitem(last=False)
+        get_backend(evicted_backend).close(evicted)
+    return reader
+
+
+def _classify_page(backend: PdfBackend, reader: Any, page_num: int) -> str:
+    """Classificação da página; se a pré-análise falhar, a página é tratada como texto"""
+    try:
+        return backend.classify_page(reader, page_num)
+    except Exception as e:
+        logger.debug(f"⚠️ Não foi possível classificar a página {page_num + 1}: {e}")
+        return PAGE_TEXT
+
+
+def _probe_pages(backend: PdfBackend, reader: Any, doc_hash: str, options: ExtractionOptions,
+                 with_page_keys: bool) -> Iterator[Any]:
+    """
+    Conta e seleciona as páginas e (opcionalmente) calcula as chaves de cache e
+    a classificação de cada página selecionada
+
+    Yields:
+        PageMarker durante a análise de cada página e, por último,
+        (num_pages, selecionadas, chaves, classificação das páginas)
+    """
+    num_pages = backend.page_count(reader)
+    selected = select_pages(num_pages, options)
+    classify = options.classify_pages if options.classify_pages is not None else PDF_CLASSIFY_PAGES
+    page_keys: Dict[int, str] = {}
+    page_kinds: Dict[int, str] = {}
+    if with_page_keys or classify:
+        for page_num in selected:
+            yield PageMarker(page_num)
+            if with_page_keys:
+                page_keys[page_num] = _page_cache_key(backend, reader, page_num, doc_hash)
+            if classify:
+                page_kinds[page_num] = _classify_page(backend, reader, page_num)
+    yield num_pages, selected, page_keys, page_kinds
+
+
+def _extract_page_range(backend: PdfBackend, reader: Any, page_numbers: List[int],
+                        layout: bool) -> Iterator[Any]:
+    """
+    Extrai as páginas indicadas, na ordem recebida
+
+    Yields:
+        PageMarker ao iniciar cada página e (índice, texto ou linhas, tempo_em_segundos) ao concluí-la
+    """
+    for page_num in page_numbers:
+        yield PageMarker(page_num)
+        page_start = time.time()
+        if layout:
+            payload = backend.extract_page_layout(reader, page_num)
+        else:
+            payload = backend.extract_page(reader, page_num)
+        yield page_num, payload, time.time() - page_start
+
+
+def _worker_probe(backend_name: str, doc_key: str, pdf_bytes: bytes, options: ExtractionOptions,
+                  with_page_keys: bool) -> Iterator[Any]:
+    """Tarefa do worker: _probe_pages sobre o documento aberto no worker"""
+    backend = get_backend(backend_name)
+    yield from _probe_pages(backend, _get_worker_reader(backend, doc_key, pdf_bytes), doc_key, options, with_page_keys)
+
+
+def _worker_extract(backend_name: str, doc_key: str, pdf_bytes: bytes, page_numbers: List[int],
+                    layout: bool) -> Iterator[Any]:
+    """Tarefa do worker: _extract_page_range sobre o documento aberto no worker"""
+    backend = get_backend(backend_name)
+    yield from _extract_page_range(backend, _get_worker_reader(backend, doc_key, pdf_bytes), page_numbers, layout)
+
+
+def _run_local(task: Iterator[Any], budget: TaskBudget) -> Iterator[Any]:
+    """
+    Executa uma tarefa no thread atual, conferindo prazo e cancelamento entre as páginas
+
+    Sem processo separado não há como interromper uma página travada nem medir memória.
+    """
+    for item in task:
+        if isinstance(item, PageMarker):
+            budget.check(item.page)
+            continue
+        yield item
+
+
+def _build_shards(num_pages: int, num_shards: int) -> List[Tuple[int, int]]:
+    """Divide as páginas em faixas contíguas [start, end) de tamanho equilibrado"""
+    num_shards = max(1, min(num_shards, num_pages))
+    base, extra = divmod(num_pages, num_shards)
+    shards = []
+    start = 0
+    for i in range(num_shards):
+        end = start + base + (1 if i < extra else 0)
+        shards.append((start, end))
+        start = end
+    return shards
+
+
+# ============================================================================
+# CACHE ENDEREÇADO POR CONTEÚDO (documento e página)
+# ============================================================================
+
+def compute_source_hash(pdf_source: PdfSource) -> str:
+    """Calcula o SHA256 do PDF (em blocos, sem carregar buffers inteiros na memória)"""
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(pdf_source).hexdigest()
+
+    digest = hashlib.sha256()
+    pdf_source.seek(0)
+    for chunk in iter(lambda: pdf_source.read(1024 * 1024), b""):
+        digest.update(chunk)
+    pdf_source.seek(0)
+    return digest.hexdigest()
+
+
+def _extractor_version(backend: PdfBackend) -> str:
+    """Versão do extrator: backend + versão da biblioteca + formato do cache"""
+    return f"{backend.name}-{backend.version}-{CACHE_FORMAT_VERSION}"
+
+
+def _doc_cache_key(backend: PdfBackend, doc_hash: str) -> str:
+    return f"pdftext:{_extractor_version(backend)}:{doc_hash}"
+
+
+def _page_cache_key(backend: PdfBackend, reader: Any, page_num: int, doc_hash: str) -> str:
+    """
+    Chave de cache de uma página: hash do conteúdo da página calculado pelo backend
+
+    Duas páginas com o mesmo conteúdo em PDFs diferentes geram a mesma chave,
+    permitindo reaproveitar páginas entre documentos parcialmente iguais.
+    Se o backend não conseguir identificar a página com segurança, a chave
+    fica restrita ao documento (hash do PDF + número da página).
+    """
+    try:
+        fingerprint = backend.page_fingerprint(reader, page_num)
+    except Exception as e:
+        logger.debug(f"⚠️ Não foi possível calcular hash da página: {e}")
+        fingerprint = None
+
+    if fingerprint is None:
+        return f"pdfpage:{_extractor_version(backend)}:{doc_hash}:{page_num}"
+    return f"pdfpage:{_extractor_version(backend)}:{fingerprint}"
+
+
+def _layout_cache_key(backend: PdfBackend, doc_hash: str, page_num: int) -> str:
+    """Layout é cacheado por documento: coordenadas dependem da página inteira (mediabox), não só do conteúdo"""
+    return f"pdflayout:{_extractor_version(backend)}:{doc_hash}:{page_num}"
+
+
+def _load_cached_document(backend: PdfBackend, doc_hash: str) -> Optional[List[Dict[str, Any]]]:
+    """Busca o documento inteiro no cache (índice de páginas + texto e classificação das páginas)"""
+    cached_doc = get_cache(_doc_cache_key(backend, doc_hash))
+    if not cached_doc:
+        return None
+
+    page_keys = cached_doc.get("page_keys", [])
+    cached_pages = get_cache_many(page_keys)
+    if any(page is None for page in cached_pages):
+        # Alguma página foi removida pelo LRU - reprocessar normalmente
+        return None
+    return cached_pages
+
+
+def _page_cache_entry(text: str, kind: str) -> Dict[str, Any]:
+    """Entrada de cache de uma página (kind só é gravado para páginas que não são texto)"""
+    return {"text": text} if kind == PAGE_TEXT else {"text": text, "kind": kind}
+
+
+def _save_to_cache(backend: PdfBackend, doc_hash: str, page_keys: Dict[int, str], new_pages: Dict[int, PageResult],
+                   full_document: bool):
+    """Salva as páginas novas e, se o documento foi lido por completo, o índice do documento"""
+    new_pages = {
+        page_keys[page_num]: _page_cache_entry(page.text, page.kind)
+        for page_num, page in new_pages.items()
+        if page_num in page_keys
+    }
+    if new_pages:
+        set_cache_many(new_pages)
+
+    ordered_keys = [page_keys[page_num] for page_num in sorted(page_keys)]
+    if full_document and ordered_keys:
+        set_cache(_doc_cache_key(backend, doc_hash), {"page_keys": ordered_keys, "total_pages": len(ordered_keys)})
+
+
+# ============================================================================
+# EXTRAÇÃO
+# ============================================================================
+
+class _DocumentSession:
+    """
+    Acesso a um documento durante uma extração
+
+    Isolado: o PDF é aberto e parseado apenas nos workers do pool (prazo,
+    memória e cancelamento garantidos). Local: aberto no thread atual, com
+    as páginas enviadas ao pool apenas a partir de PDF_PARALLEL_MIN_PAGES.
+    """
+
+    def __init__(self, backend: PdfBackend, pdf_source: PdfSource, doc_hash: str, options: ExtractionOptions):
+        self.backend = backend
+        self.pdf_source = pdf_source
+        self.doc_hash = doc_hash
+        self.budget = make_budget(
+            options.timeout if options.timeout is not None else PDF_TIMEOUT_SECONDS,
+            options.memory_mb if options.memory_mb is not None else PDF_MEMORY_LIMIT_MB,
+            options.cancel_event
+        )
+        self.isolated = process_pool is not None and (PDF_ISOLATE_EXTRACTION or options.force_pool)
+        self.force_pool = options.force_pool
+        self._pdf_bytes: Optional[bytes] = None
+        self.reader = None if self.isolated else backend.open(_open_stream(pdf_source))
+
+    @property
+    def pdf_bytes(self) -> bytes:
+        """Bytes do PDF (necessários para enviar o documento aos workers)"""
+        if self._pdf_bytes is None:
+            self._pdf_bytes = _read_source_bytes(self.pdf_source)
+        return self._pdf_bytes
+
+    def probe(self, options: ExtractionOptions,
+              with_page_keys: bool) -> Tuple[int, List[int], Dict[int, str], Dict[int, str]]:
+        """Número de páginas, páginas selecionadas, chaves de cache e classificação por página"""
+        if self.isolated:
+            # Evento de cancelamento não vai para o worker (não é serializável)
+            args = (self.backend.name, self.doc_hash, self.pdf_bytes, options._replace(cancel_event=None), with_page_keys)
+            return process_pool.run_one(_worker_probe, args, self.budget)[-1]
+        task = _probe_pages(self.backend, self.reader, self.doc_hash, options, with_page_keys)
+        return list(_run_local(task, self.budget))[-1]
+
+    def extract(self, page_numbers: List[int], num_pages: int, layout: bool = False) -> Iterator[Tuple[int, Any, float]]:
+        """
+        Extrai as páginas indicadas (no pool ou no thread atual), entregando-as na ordem
+
+        No pool, no máximo PDF_POOL_WORKERS faixas ficam em execução ao mesmo tempo:
+        se o consumidor parar (orçamento de caracteres, cliente desconectado),
+        os workers ocupados são liberados e as faixas seguintes nem chegam a ser enviadas.
+
+        Yields:
+            (índice_da_página, texto ou linhas do layout, tempo_em_segundos)
+        """
+        if not page_numbers:
+            return
+
+        use_pool = self.isolated or (
+            process_pool is not None and (len(page_numbers) >= PDF_PARALLEL_MIN_PAGES or self.force_pool)
+        )
+        if not use_pool:
+            for page_num, payload, page_time in _run_local(
+                    _extract_page_range(self.backend, self.reader, page_numbers, layout), self.budget):
+                unit = "linhas" if layout else "caracteres"
+                logger.info(f"  ✓ Página {page_num + 1}/{num_pages} processada em {page_time:.3f}s ({len(payload)} {unit})")
+                yield page_num, payload, page_time
+            return
+
+        # PDFs pequenos vão inteiros para um único worker
+        num_shards = PDF_POOL_WORKERS * PDF_SHARDS_PER_WORKER if len(page_numbers) >= PDF_PARALLEL_MIN_PAGES else 1
+        shards = [
+            page_numbers[start:end]
+            for start, end in _build_shards(len(page_numbers), num_shards)
+        ]
+        logger.info(f"⚡ Extração no pool: {len(page_numbers)} páginas em {len(shards)} faixa(s) ({PDF_POOL_WORKERS} processos)")
+
+        args_list = [(self.backend.name, self.doc_hash, self.pdf_bytes, shard, layout) for shard in shards]
+        for page_num, payload, page_time in process_pool.run_ordered(_worker_extract, args_list, self.budget):
+            logger.debug(f"  ✓ Página {page_num + 1}/{num_pages} processada em {page_time:.3f}s")
+            yield page_num, payload, page_time
+
+    def close(self):
+        if self.reader is not None:
+            self.backend.close(self.reader)
+            self.reader = None
+
+
+def _log_skipped_pages(page_kinds: Dict[int, str]) -> Dict[int, str]:
+    """Páginas que a pré-análise classificou como sem texto (não serão extraídas)"""
+    skipped = {page_num: kind for page_num, kind in page_kinds.items() if kind != PAGE_TEXT}
+    if skipped:
+        counts = Counter(skipped.values())
+        logger.info(f"🖼️ {len(skipped)}/{len(page_kinds)} página(s) sem camada de texto não serão extraídas "
+                    f"({', '.join(f'{kind}: {count}' for kind, count in sorted(counts.items()))})")
+    return skipped
+
+
+def select_pages(num_pages: int, options: ExtractionOptions) -> List[int]:
+    """
+    Calcula os índices (base 0) das páginas a extrair a partir da faixa e do limite de páginas
+
+    Raises:
+        ValueError: Se a faixa de páginas for inválida
+    """
+    first = (options.page_start or 1) - 1
+    last = min(options.page_end or num_pages, num_pages)
+    if options.page_end is not None and options.page_start is not None and options.page_end < options.page_start:
+        raise ValueError(f"page_end ({options.page_end}) menor que page_start ({options.page_start})")
+
+    selected = list(range(first, last))
+    if options.max_pages is not None:
+        selected = selected[:options.max_pages]
+    return selected
+
+
+def iter_pages(pdf_source: PdfSource, options: Optional[ExtractionOptions] = None,
+               summary: Optional[Dict[str, Any]] = None) -> Iterator[PageResult]:
+    """
+    Extrai as páginas do PDF e as entrega uma a uma, na ordem, assim que ficam prontas
+
+    1. Documento inteiro no cache (SHA256 dos bytes) → nenhuma página é parseada
+    2. Páginas no cache (hash do conteúdo da página) → reaproveitadas entre PDFs
+    3. Páginas sem camada de texto (pré-análise: vazias ou só com imagem) → não
+       são extraídas, saem com texto vazio e a classificação em PageResult.kind
+    4. Páginas restantes: extraídas nos workers do pool (isolados, ver _DocumentSession)
+       ou, sem pool, no thread atual
+
+    A extração respeita a faixa de páginas (page_start/page_end), o limite de
+    páginas (max_pages) e para assim que o orçamento de caracteres (max_chars)
+    é atingido - as páginas seguintes não são parseadas.
+
+    Args:
+        pdf_source: Bytes do PDF ou buffer binário (lido diretamente, sem cópia)
+        options: Faixa, limites, orçamento e uso de cache (padrão: documento inteiro, com cache)
+        summary: Preenchido com total_pages (páginas do documento, mesmo sem páginas selecionadas)
+            e truncated (True apenas quando o orçamento de max_chars interrompeu a extração)
+
+    Raises:
+        PdfBudgetExceeded: Prazo ou memória esgotados (com a página em andamento)
+        PdfExtractionCancelled: cancel_event sinalizado
+        PdfExtractionError: PDF inválido ou worker encerrado
+
+    Yields:
+        PageResult com índice, total de páginas, texto, tempo e origem (cache ou extração)
+    """
+    options = options or ExtractionOptions()
+    backend = get_backend(options.backend)
+    doc_hash = compute_source_hash(pdf_source)
+    summary = summary if summary is not None else {}
+    summary.update(total_pages=0, truncated=False)
+
+    if options.use_cache:
+        cached_pages = _load_cached_document(backend, doc_hash)
+        if cached_pages is not None:
+            selected = select_pages(len(cached_pages), options)
+            summary["total_pages"] = len(cached_pages)
+            logger.info(f"💾 Texto do PDF {doc_hash[:12]} recuperado do cache ({len(selected)}/{len(cached_pages)} páginas)")
+            total_chars = 0
+            for page_num in selected:
+                cached = cached_pages[page_num]
+                yield PageResult(page_num, len(cached_pages), cached["text"], 0.0, True, cached.get("kind", PAGE_TEXT))
+                total_chars += len(cached["text"])
+                if options.max_chars is not None and total_chars >= options.max_chars and page_num != selected[-1]:
+                    summary["truncated"] = True
+                    return
+            return
+
+    session = _DocumentSession(backend, pdf_source, doc_hash, options)
+    try:
+        num_pages, selected, page_keys, page_kinds = session.probe(options, with_page_keys=options.use_cache)
+        summary["total_pages"] = num_pages
+        logger.info(f"📖 PDF contém {num_pages} página(s) - {len(selected)} selecionada(s) [backend: {backend.name}]")
+        skipped = _log_skipped_pages(page_kinds)
+
+        cached_texts: Dict[int, Dict[str, Any]] = {}
+        if options.use_cache and PDF_PAGE_CACHE:
+            for page_num, cached in zip(selected, get_cache_many([page_keys[n] for n in selected])):
+                if cached is not None:
+                    cached_texts[page_num] = cached
+
+        missing = [page_num for page_num in selected if page_num not in cached_texts and page_num not in skipped]
+        if cached_texts:
+            logger.info(f"💾 {len(cached_texts)}/{len(selected)} páginas recuperadas do cache")
+
+        extracted = session.extract(missing, num_pages)
+        new_pages: Dict[int, PageResult] = {}
+        total_chars = 0
+        completed = True
+        try:
+            for page_num in selected:
+                if page_num in cached_texts:
+                    cached = cached_texts[page_num]
+                    kind = page_kinds.get(page_num, cached.get("kind", PAGE_TEXT))
+                    page = PageResult(page_num, num_pages, cached["text"], 0.0, True, kind)
+                elif page_num in skipped:
+                    page = PageResult(page_num, num_pages, "", 0.0, False, skipped[page_num])
+                    new_pages[page_num] = page
+                else:
+                    _, page_text, page_time = next(extracted)
+                    page = PageResult(page_num, num_pages, page_text, page_time, False)
+                    new_pages[page_num] = page
+
+                yield page
+                total_chars += len(page.text)
+                if options.max_chars is not None and total_chars >= options.max_chars and page_num != selected[-1]:
+                    logger.info(f"✂️ Orçamento de {options.max_chars} caracteres atingido na página {page_num + 1}/{num_pages}")
+                    completed = False
+                    summary["truncated"] = True
+                    break
+        finally:
+            extracted.close()
+            if options.use_cache:
+                # Documento só é indexado quando todas as páginas foram lidas
+                # (páginas já extraídas são salvas mesmo se a extração falhar no meio)
+                full_document = completed and len(new_pages) + len(cached_texts) == num_pages
+                _save_to_cache(backend, doc_hash, page_keys, new_pages, full_document)
+    finally:
+        session.close()
+
+
+def iter_layout_pages(pdf_source: PdfSource, options: Optional[ExtractionOptions] = None,
+                      summary: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[PageResult, List[LayoutLine]]]:
+    """
+    Modo layout: entrega cada página com suas linhas posicionadas
+
+    Respeita faixa, limite de páginas, orçamento de caracteres e limites de
+    tempo/memória como iter_pages. O texto de cada página é a junção das
+    linhas, na ordem do backend. summary é preenchido como em iter_pages.
+
+    Raises:
+        ValueError: Se o backend escolhido não suportar layout
+
+    Yields:
+        (PageResult, linhas da página)
+    """
+    options = options or ExtractionOptions(layout=True)
+    backend = get_layout_backend(options.backend)
+    doc_hash = compute_source_hash(pdf_source)
+    summary = summary if summary is not None else {}
+    summary.update(total_pages=0, truncated=False)
+
+    session = _DocumentSession(backend, pdf_source, doc_hash, options)
+    new_pages: Dict[str, Dict[str, Any]] = {}
+    try:
+        num_pages, selected, _, page_kinds = session.probe(options, with_page_keys=False)
+        summary["total_pages"] = num_pages
+        logger.info(f"📐 Layout: {len(selected)}/{num_pages} página(s) [backend: {backend.name}]")
+        skipped = _log_skipped_pages(page_kinds)
+
+        cached_layouts: Dict[int, Dict[str, Any]] = {}
+        if options.use_cache:
+            keys = [_layout_cache_key(backend, doc_hash, page_num) for page_num in selected]
+            cached_layouts = {
+                page_num: cached
+                for page_num, cached in zip(selected, get_cache_many(keys))
+                if cached is not None
+            }
+
+        missing = [page_num for page_num in selected if page_num not in cached_layouts and page_num not in skipped]
+        extracted = session.extract(missing, num_pages, layout=True)
+        try:
+            total_chars = 0
+            for page_num in selected:
+                kind = page_kinds.get(page_num, PAGE_TEXT)
+                if page_num in cached_layouts:
+                    lines = [LayoutLine(page_num, *values) for values in cached_layouts[page_num]["lines"]]
+                    kind = page_kinds.get(page_num, cached_layouts[page_num].get("kind", PAGE_TEXT))
+                    page_time, cached = 0.0, True
+                else:
+                    if page_num in skipped:
+                        lines, page_time = [], 0.0
+                    else:
+                        _, lines, page_time = next(extracted)
+                    cached = False
+                    entry = {"lines": [list(line[1:]) for line in lines]}
+                    if kind != PAGE_TEXT:
+                        entry["kind"] = kind
+                    new_pages[_layout_cache_key(backend, doc_hash, page_num)] = entry
+
+                page = PageResult(page_num, num_pages, lines_to_text(lines), page_time, cached, kind)
+                yield page, lines
+                total_chars += len(page.text)
+                if options.max_chars is not None and total_chars >= options.max_chars and page_num != selected[-1]:
+                    logger.info(f"✂️ Orçamento de {options.max_chars} caracteres atingido na página {page_num + 1}/{num_pages}")
+                    summary["truncated"] = True
+                    break
+        finally:
+            extracted.close()
+    finally:
+        session.close()
+        if options.use_cache and new_pages:
+            set_cache_many(new_pages)
+
+
+def extract_pages(pdf_source: PdfSource, options: Optional[ExtractionOptions] = None) -> List[str]:
+    """
+    Extrai o texto de cada página do PDF, preservando a ordem
+
+    Args:
+        pdf_source: Bytes do PDF ou buffer binário
+        options: Faixa, limites e uso de cache
+
+    Returns:
+        Lista com o texto de cada página extraída
+    """
+    return [page.text for page in iter_pages(pdf_source, options)]
+
+
+def extract_document(pdf_source: PdfSource, options: Optional[ExtractionOptions] = None) -> DocumentExtraction:
+    """Extrai o texto do PDF com metadados de páginas e cache (função síncrona)."""
+    start_time = time.time()
+    try:
+        logger.info(f"📄 Iniciando extração de PDF ({source_size(pdf_source)} bytes)")
+
+        lines: Optional[List[LayoutLine]] = None
+        summary: Dict[str, Any] = {}
+        if options is not None and options.layout:
+            pages = []
+            lines = []
+            for page, page_lines in iter_layout_pages(pdf_source, options, summary):
+                pages.append(page)
+                lines.extend(page_lines)
+        else:
+            pages = list(iter_pages(pdf_source, options, summary))
+
+        text = "\n".join(page.text for page in pages).strip()
+        cached_pages = sum(1 for page in pages if page.cached)
+        page_kinds = {page.index: page.kind for page in pages}
+        total_pages = summary["total_pages"]
+        truncated = summary["truncated"]
+
+        total_time = time.time() - start_time
+        logger.info(f"✅ Extração completa em {total_time:.3f}s - Total: {len(text)} caracteres ({len(pages)}/{total_pages} páginas, {cached_pages} do cache)")
+
+        return DocumentExtraction(text, total_pages, len(pages), cached_pages, truncated, lines, page_kinds)
+    except Exception as e:
+        error_time = time.time() - start_time
+        logger.error(f"❌ Erro ao extrair texto do PDF após {error_time:.3f}s: {e}")
+        raise
+
+
+def extract_text_from_pdf(pdf_source: PdfSource) -> str:
+    """Extrai texto de um arquivo PDF em bytes ou buffer binário (função síncrona)."""
+    return extract_document(pdf_source).text
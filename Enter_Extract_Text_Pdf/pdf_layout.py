@@ -0,0 +1,161 @@
+"""
+Layout do PDF: linhas com coordenadas e índice posicional
+
+As linhas usam coordenadas em pontos com origem no canto SUPERIOR esquerdo
+da página (y cresce para baixo), independentemente do backend que as gerou.
+O índice posicional responde consultas geométricas do tipo "o texto à
+direita de / abaixo deste label", sem embeddings.
+"""
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional
+
+# Tolerância (em pontos) para considerar duas caixas alinhadas/encostadas
+LAYOUT_TOLERANCE = 2.0
+
+
+class LayoutLine(NamedTuple):
+    """Linha de texto posicionada na página"""
+    page: int  # base 0
+    text: str
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    font_size: float
+
+    @property
+    def height(self) -> float:
+        return self.y1 - self.y0
+
+
+class LayoutMatch(NamedTuple):
+    """Valor encontrado para um label pelo índice posicional"""
+    label_line: LayoutLine
+    value: str
+    value_line: LayoutLine
+    relation: str  # same_line | right | below
+
+
+def lines_to_text(lines: List[LayoutLine]) -> str:
+    """Texto plano equivalente (uma linha por LayoutLine, na ordem de leitura)"""
+    return "\n".join(line.text for line in lines)
+
+
+def _normalize(text: str) -> str:
+    """Minúsculas e sem acentos, preservando o tamanho (posição i ↔ posição i)"""
+    return "".join((unicodedata.normalize("NFKD", ch)[:1] or ch).lower() for ch in text)
+
+
+def _vertical_overlap(a: LayoutLine, b: LayoutLine) -> float:
+    """Fração da menor altura em que as duas linhas se sobrepõem verticalmente"""
+    overlap = min(a.y1, b.y1) - max(a.y0, b.y0)
+    smallest = min(a.height, b.height) or 1.0
+    return max(0.0, overlap) / smallest
+
+
+class PositionalIndex:
+    """
+    Índice geométrico das linhas de um documento
+
+    As linhas de cada página ficam ordenadas pelo topo (y0), permitindo
+    localizar por busca binária a faixa vertical relevante de cada consulta.
+    """
+
+    def __init__(self, lines: List[LayoutLine]):
+        self._pages: Dict[int, List[LayoutLine]] = {}
+        for line in lines:
+            if line.text.strip():
+                self._pages.setdefault(line.page, []).append(line)
+
+        self._tops: Dict[int, List[float]] = {}
+        self._max_height: Dict[int, float] = {}
+        for page, page_lines in self._pages.items():
+            page_lines.sort(key=lambda line: (line.y0, line.x0))
+            self._tops[page] = [line.y0 for line in page_lines]
+            self._max_height[page] = max(line.height for line in page_lines)
+
+    @property
+    def lines(self) -> List[LayoutLine]:
+        """Todas as linhas em ordem de leitura (página, topo, esquerda)"""
+        return [line for page in sorted(self._pages) for line in self._pages[page]]
+
+    def find(self, label: str, page: Optional[int] = None) -> List[LayoutLine]:
+        """Linhas que contêm o label (sem diferenciar maiúsculas e acentos)"""
+        needle = _normalize(label.strip())
+        pages = [page] if page is not None else sorted(self._pages)
+        return [
+            line
+            for page_num in pages
+            for line in self._pages.get(page_num, [])
+            if needle in _normalize(line.text)
+        ]
+
+    def right_of(self, line: LayoutLine, max_gap: Optional[float] = None) -> List[LayoutLine]:
+        """Linhas na mesma altura e à direita da linha, da mais próxima para a mais distante"""
+        page_lines = self._pages.get(line.page, [])
+        tops = self._tops.get(line.page, [])
+        # Só linhas cujo topo está entre (y0 - maior altura) e y1 podem se sobrepor verticalmente
+        start = bisect_left(tops, line.y0 - self._max_height.get(line.page, 0.0))
+        end = bisect_left(tops, line.y1)
+
+        candidates = [
+            other for other in page_lines[start:end]
+            if other is not line
+            and other.x0 >= line.x1 - LAYOUT_TOLERANCE
+            and _vertical_overlap(line, other) >= 0.5
+            and (max_gap is None or other.x0 - line.x1 <= max_gap)
+        ]
+        return sorted(candidates, key=lambda other: other.x0)
+
+    def below(self, line: LayoutLine, max_distance: Optional[float] = None) -> List[LayoutLine]:
+        """Linhas abaixo da linha e na mesma coluna (sobreposição horizontal), da mais próxima para a mais distante"""
+        page_lines = self._pages.get(line.page, [])
+        tops = self._tops.get(line.page, [])
+        start = bisect_left(tops, line.y1 - LAYOUT_TOLERANCE)
+
+        candidates = []
+        for other in page_lines[start:]:
+            if max_distance is not None and other.y0 - line.y1 > max_distance:
+                break
+            if other is line:
+                continue
+            if min(line.x1, other.x1) - max(line.x0, other.x0) > 0 or abs(other.x0 - line.x0) <= LAYOUT_TOLERANCE:
+                candidates.append(other)
+        return candidates
+
+    def value_for(self, label: str, direction: str = "auto", page: Optional[int] = None,
+                  max_gap: Optional[float] = None) -> Optional[LayoutMatch]:
+        """
+        Valor associado a um label do documento
+
+        Ordem de busca em "auto": restante da própria linha ("Nome: João"),
+        linha à direita e, por fim, linha abaixo.
+
+        Args:
+            label: Texto do label como aparece no documento
+            direction: auto, right ou below
+            page: Restringe a busca a uma página (base 0)
+            max_gap: Distância máxima (em pontos) entre label e valor
+
+        Returns:
+            LayoutMatch da primeira ocorrência do label com valor, ou None
+        """
+        needle = _normalize(label.strip())
+        for label_line in self.find(label, page):
+            if direction == "auto":
+                position = _normalize(label_line.text).find(needle)
+                remainder = label_line.text[position + len(needle):].strip(" \t:-–")
+                if remainder:
+                    return LayoutMatch(label_line, remainder, label_line, "same_line")
+
+            if direction in ("auto", "right"):
+                right = self.right_of(label_line, max_gap)
+                if right:
+                    return LayoutMatch(label_line, right[0].text.strip(), right[0], "right")
+
+            if direction in ("auto", "below"):
+                below = self.below(label_line, max_gap)
+                if below:
+                    return LayoutMatch(label_line, below[0].text.strip(), below[0], "below")
+        return None
@@ -0,0 +1,324 @@
+"""
+Pool de processos "matáveis" para extração de PDF
+
+Diferente do ProcessPoolExecutor, cada worker tem um pipe próprio e o
+processo principal acompanha a tarefa página a página. Isso permite:
+- orçamento de tempo e de memória por requisição (o worker é morto e
+  substituído quando estoura, e o erro informa a página em andamento)
+- cancelamento real (cliente desconectou → worker morto na hora)
+- um PDF patológico não bloqueia um thread nem um worker para sempre
+
+As tarefas são geradores executados no worker: cada item produzido é
+enviado ao processo principal; PageMarker apenas informa a página atual.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import wait as wait_connections
+from typing import Any, Callable, Deque, Iterator, List, NamedTuple, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Intervalo de verificação de prazo, memória e cancelamento
+PDF_WORKER_POLL_INTERVAL = float(os.getenv("PDF_WORKER_POLL_INTERVAL", "0.05"))
+
+
+class PdfExtractionError(Exception):
+    """Falha na extração, com a página (base 0) em andamento quando conhecida"""
+
+    def __init__(self, message: str, page: Optional[int] = None):
+        super().__init__(message)
+        self.page = page
+
+
+class PdfBudgetExceeded(PdfExtractionError):
+    """Tempo ou memória da requisição esgotados"""
+
+    def __init__(self, reason: str, limit: float, page: Optional[int] = None):
+        self.reason = reason  # timeout | memory
+        self.limit = limit
+        if reason == "timeout":
+            message = f"Tempo limite de {limit:g}s excedido"
+        else:
+            message = f"Limite de memória de {limit:g} MB excedido"
+        super().__init__(f"{message} {_describe_page(page)}", page)
+
+
+class PdfExtractionCancelled(PdfExtractionError):
+    """Extração cancelada (ex: cliente desconectou)"""
+
+    def __init__(self, page: Optional[int] = None):
+        super().__init__(f"Extração cancelada {_describe_page(page)}", page)
+
+
+def _describe_page(page: Optional[int]) -> str:
+    return f"na página {page + 1}" if page is not None else "antes da leitura das páginas"
+
+
+class PageMarker(NamedTuple):
+    """Produzido pela tarefa ao começar uma página (não é repassado ao consumidor)"""
+    page: int
+
+
+class TaskBudget(NamedTuple):
+    """Limites de uma requisição, compartilhados por todas as suas tarefas"""
+    deadline: Optional[float] = None  # time.monotonic()
+    timeout: Optional[float] = None
+    memory_mb: Optional[float] = None
+    cancel_event: Optional[threading.Event] = None
+
+    def check(self, page: Optional[int] = None):
+        """
+        Raises:
+            PdfExtractionCancelled: Se a requisição foi cancelada
+            PdfBudgetExceeded: Se o prazo acabou
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise PdfExtractionCancelled(page)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise PdfBudgetExceeded("timeout", self.timeout, page)
+
+
+def make_budget(timeout: Optional[float], memory_mb: Optional[float],
+                cancel_event: Optional[threading.Event] = None) -> TaskBudget:
+    """Cria o orçamento da requisição (0 ou None = sem limite)"""
+    deadline = time.monotonic() + timeout if timeout else None
+    return TaskBudget(deadline, timeout or None, memory_mb or None, cancel_event)
+
+
+# ============================================================================
+# PROCESSO WORKER
+# ============================================================================
+
+def _worker_main(conn):
+    """Laço do worker: recebe (função, argumentos), envia os itens produzidos"""
+    # Ctrl+C é tratado pelo processo principal, que encerra os workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+
+        func, args = task
+        try:
+            for item in func(*args):
+                if isinstance(item, PageMarker):
+                    conn.send(("page", item.page))
+                else:
+                    conn.send(("item", item))
+            conn.send(("done", None))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+def _warmup_task() -> Iterator[int]:
+    """Tarefa vazia executada no startup para garantir que os workers subiram"""
+    yield os.getpid()
+
+
+class _Worker:
+    """Processo worker com pipe dedicado"""
+
+    _page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def rss_mb(self) -> Optional[float]:
+        """Memória residente do worker (None fora do Linux)"""
+        try:
+            with open(f"/proc/{self.process.pid}/statm") as statm:
+                return int(statm.read().split()[1]) * self._page_size / (1024 * 1024)
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(timeout=5)
+        except Exception:
+            pass
+        self.conn.close()
+
+
+class _RunningTask:
+    """Tarefa em execução em um worker: itens recebidos aguardando entrega"""
+
+    def __init__(self, worker: _Worker, func: Callable, args: Sequence[Any]):
+        self.worker = worker
+        self.items: Deque[Any] = deque()
+        self.page: Optional[int] = None
+        self.done = False
+        self.baseline_mb = worker.rss_mb()
+        worker.conn.send((func, args))
+
+    def receive(self):
+        """Lê as mensagens disponíveis no pipe"""
+        while not self.done and self.worker.conn.poll():
+            try:
+                kind, payload = self.worker.conn.recv()
+            except (EOFError, OSError):
+                exit_code = self.worker.process.exitcode
+                raise PdfExtractionError(
+                    f"Worker de extração encerrado inesperadamente (código {exit_code}) {_describe_page(self.page)}",
+                    self.page
+                )
+            if kind == "page":
+                self.page = payload
+            elif kind == "item":
+                self.items.append(payload)
+            elif kind == "done":
+                self.done = True
+            else:
+                # Erro comum (PDF inválido etc.): o worker segue saudável
+                self.done = True
+                raise PdfExtractionError(f"{payload} ({_describe_page(self.page)})", self.page)
+
+    def check_memory(self, budget: TaskBudget):
+        if budget.memory_mb is None or self.baseline_mb is None:
+            return
+        rss_mb = self.worker.rss_mb()
+        if rss_mb is not None and rss_mb - self.baseline_mb > budget.memory_mb:
+            raise PdfBudgetExceeded("memory", budget.memory_mb, self.page)
+
+
+# ============================================================================
+# POOL
+# ============================================================================
+
+class KillablePdfPool:
+    """Pool de workers com tarefas acompanhadas página a página"""
+
+    def __init__(self, num_workers: int, start_method: str = "spawn"):
+        self.num_workers = num_workers
+        self._context = multiprocessing.get_context(start_method)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(num_workers):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._context)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def warmup(self, timeout: float = 60):
+        """Executa uma tarefa vazia em cada worker (paga o custo do spawn no startup)"""
+        budget = make_budget(timeout, None)
+        workers = [self._acquire(budget) for _ in range(self.num_workers)]
+        try:
+            for worker in workers:
+                task = _RunningTask(worker, _warmup_task, ())
+                while not task.done:
+                    budget.check()
+                    if worker.conn.poll(PDF_WORKER_POLL_INTERVAL):
+                        task.receive()
+        finally:
+            for worker in workers:
+                self._release(worker)
+
+    def _acquire(self, budget: TaskBudget, page: Optional[int] = None) -> _Worker:
+        """Aguarda um worker livre, respeitando prazo e cancelamento"""
+        while True:
+            budget.check(page)
+            try:
+                return self._idle.get(timeout=PDF_WORKER_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+    def _try_acquire(self) -> Optional[_Worker]:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _release(self, worker: _Worker):
+        if self._closed:
+            self._discard(worker)
+        else:
+            self._idle.put(worker)
+
+    def _discard(self, worker: _Worker):
+        """Mata o worker e sobe um substituto em segundo plano"""
+        worker.kill()
+        with self._lock:
+            self._workers.discard(worker)
+        if not self._closed:
+            threading.Thread(target=lambda: self._idle.put(self._spawn()), daemon=True).start()
+
+    def run_ordered(self, func: Callable, args_list: List[Sequence[Any]], budget: TaskBudget,
+                    max_parallel: Optional[int] = None) -> Iterator[Any]:
+        """
+        Executa func(*args) para cada args (em workers distintos) e entrega os itens na ordem das tarefas
+
+        Itens da primeira tarefa pendente saem assim que chegam; os das seguintes
+        ficam em buffer. No máximo max_parallel tarefas rodam ao mesmo tempo e,
+        se o consumidor parar ou um limite estourar, os workers ocupados são
+        mortos (e substituídos) - tarefas ainda não iniciadas nem chegam a ser enviadas.
+
+        Raises:
+            PdfBudgetExceeded, PdfExtractionCancelled, PdfExtractionError
+        """
+        max_parallel = max_parallel or self.num_workers
+        running: Deque[_RunningTask] = deque()
+        next_task = 0
+        try:
+            while running or next_task < len(args_list):
+                while next_task < len(args_list) and len(running) < max_parallel:
+                    # Garante ao menos uma tarefa em andamento; as demais só com worker ocioso
+                    worker = self._try_acquire() if running else self._acquire(budget)
+                    if worker is None:
+                        break
+                    running.append(_RunningTask(worker, func, args_list[next_task]))
+                    next_task += 1
+
+                head = running[0]
+                while head.items:
+                    yield head.items.popleft()
+                if head.done:
+                    running.popleft()
+                    self._release(head.worker)
+                    continue
+
+                active = [task for task in running if not task.done]
+                ready = wait_connections([task.worker.conn for task in active], timeout=PDF_WORKER_POLL_INTERVAL)
+                for task in active:
+                    if task.worker.conn in ready:
+                        task.receive()
+                for task in active:
+                    if not task.done:
+                        budget.check(task.page)
+                        task.check_memory(budget)
+        finally:
+            for task in running:
+                if task.done:
+                    self._release(task.worker)
+                else:
+                    self._discard(task.worker)
+
+    def run_one(self, func: Callable, args: Sequence[Any], budget: TaskBudget) -> List[Any]:
+        """Executa uma única tarefa e retorna todos os itens produzidos"""
+        return list(self.run_ordered(func, [args], budget, max_parallel=1))
+
+    def shutdown(self):
+        """Encerra todos os workers (inclusive os ocupados)"""
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.kill()
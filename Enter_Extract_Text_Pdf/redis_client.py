@@ -9,6 +9,8 @@ import hashlib
 import numpy as np
 from typing import Optional, Dict, Any, List
 
+from cache.embedding_codec import encode_embedding, decode_embedding
+
 logger = logging.getLogger(__name__)
 
 # Configuração do Redis CACHE (volátil)
@@ -136,6 +138,63 @@ def set_cache(key: str, value: Dict[str, Any], ttl: int = REDIS_EXTRACTION_TTL)
         return False
 
 
+def get_cache_many(keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Busca vários valores do cache em um único round trip (MGET)
+
+    Args:
+        keys: Lista de chaves
+
+    Returns:
+        Lista na mesma ordem das chaves (None para cache miss)
+    """
+    if redis_cache_client is None or not keys:
+        return [None] * len(keys)
+
+    try:
+        values = redis_cache_client.mget(keys)
+        results = []
+        for value in values:
+            if value:
+                if isinstance(value, bytes):
+                    value = value.decode('utf-8')
+                results.append(json.loads(value))
+            else:
+                results.append(None)
+        hits = sum(1 for r in results if r is not None)
+        logger.debug(f"🎯 Cache MGET: {hits}/{len(keys)} hits")
+        return results
+    except Exception as e:
+        logger.error(f"❌ Erro ao buscar cache em lote: {e}")
+        return [None] * len(keys)
+
+
+def set_cache_many(items: Dict[str, Dict[str, Any]], ttl: int = REDIS_EXTRACTION_TTL) -> bool:
+    """
+    Salva vários valores no cache em um único round trip (pipeline)
+
+    Args:
+        items: Dict {chave: valor}
+        ttl: Time to live em segundos (padrão 7 dias)
+
+    Returns:
+        True se salvou com sucesso
+    """
+    if redis_cache_client is None or not items:
+        return False
+
+    try:
+        pipe = redis_cache_client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.setex(key, ttl, json.dumps(value, ensure_ascii=False))
+        pipe.execute()
+        logger.debug(f"💾 Cache SAVED em lote: {len(items)} chaves (TTL: {ttl}s)")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Erro ao salvar cache em lote: {e}")
+        return False
+
+
 def invalidate_cache(pattern: str) -> int:
     """
     Invalida cache por padrão
@@ -174,7 +233,7 @@ def get_embedding_cache(text: str, model: str = "mpnet") -> Optional[np.ndarray]
         model: Nome do modelo (default: mpnet)
         
     Returns:
-        Array numpy com embedding ou None
+        Array numpy float32 com embedding ou None
     """
     if redis_cache_client is None:
         return None
@@ -182,14 +241,16 @@ def get_embedding_cache(text: str, model: str = "mpnet") -> Optional[np.ndarray]
     try:
         text_hash = compute_text_hash(text)
         key = f"embedding:{model}:{text_hash}"
-        value = redis_cache_client.hget(key, "embedding_json")
+        value, legacy_json = redis_cache_client.hmget(key, "embedding", "embedding_json")
         
-        if value:
+        if value or legacy_json:
             logger.debug(f"🎯 Embedding cache HIT: {text[:30]}...")
-            if isinstance(value, bytes):
-                value = value.decode('utf-8')
-            embedding_list = json.loads(value)
-            return np.array(embedding_list, dtype=np.float32)
+            embedding, legacy = decode_embedding(value or legacy_json)
+            if legacy_json:
+                # Entrada antiga (JSON): regravar no formato binário
+                redis_cache_client.hset(key, "embedding", encode_embedding(embedding))
+                redis_cache_client.hdel(key, "embedding_json")
+            return embedding.astype(np.float32, copy=False)  # sem cópia quando já é float32
         else:
             logger.debug(f"⚠️ Embedding cache MISS: {text[:30]}...")
             return None
@@ -219,17 +280,17 @@ def save_embedding_cache(text: str, embedding: np.ndarray, model: str = "mpnet",
         text_hash = compute_text_hash(text)
         key = f"embedding:{model}:{text_hash}"
         
-        # Converter numpy array para JSON
-        embedding_json = json.dumps(embedding.tolist())
-        
-        # Salvar no Redis Hash
-        redis_cache_client.hset(key, mapping={
+        # Salvar no Redis Hash (binário versionado, ver cache/embedding_codec.py)
+        pipe = redis_cache_client.pipeline(transaction=False)
+        pipe.hset(key, mapping={
             "text": text[:100],  # Primeiros 100 chars
-            "embedding_json": embedding_json,
+            "embedding": encode_embedding(embedding),
             "model": model,
             "dimensions": str(len(embedding))
         })
-        redis_cache_client.expire(key, ttl)
+        pipe.hdel(key, "embedding_json")
+        pipe.expire(key, ttl)
+        pipe.execute()
         
         logger.debug(f"💾 Embedding cache SAVED: {text[:30]}... (dim={len(embedding)})")
         return True
@@ -313,6 +374,77 @@ def save_nli_cache(text: str, hypothesis: str, scores: Dict[str, float],
         return False
 
 
+def _nli_set_key(hypotheses: List[str], model: str) -> str:
+    """Prefixo da chave de um conjunto de hipóteses (ordem irrelevante) para um modelo"""
+    hypotheses_hash = compute_text_hash("\n".join(sorted(hypotheses)))
+    return f"nli:{compute_text_hash(model)}:{hypotheses_hash}"
+
+
+def get_nli_cache_many(texts: List[str], hypotheses: List[str],
+                       model: str = "mDeBERTa") -> List[Optional[Dict[str, Any]]]:
+    """
+    Busca a classificação NLI de vários textos contra o mesmo conjunto de hipóteses
+    em um único round trip (MGET)
+    
+    Args:
+        texts: Textos (premissas)
+        hypotheses: Conjunto de hipóteses (já com o template aplicado)
+        model: Nome do modelo
+        
+    Returns:
+        Lista na mesma ordem dos textos ({"scores": {label: score}, "model": ...} ou None)
+    """
+    if redis_cache_client is None or not texts:
+        return [None] * len(texts)
+    
+    try:
+        prefix = _nli_set_key(hypotheses, model)
+        values = redis_cache_client.mget([f"{prefix}:{compute_text_hash(text)}" for text in texts])
+        results = []
+        for value in values:
+            if value:
+                if isinstance(value, bytes):
+                    value = value.decode('utf-8')
+                results.append(json.loads(value))
+            else:
+                results.append(None)
+        logger.debug(f"🎯 NLI cache MGET: {sum(1 for r in results if r is not None)}/{len(texts)} hits")
+        return results
+    except Exception as e:
+        logger.error(f"❌ Erro ao buscar NLI cache em lote: {e}")
+        return [None] * len(texts)
+
+
+def save_nli_cache_many(scores_by_text: Dict[str, Dict[str, float]], hypotheses: List[str],
+                        model: str = "mDeBERTa", ttl: int = REDIS_NLI_TTL) -> bool:
+    """
+    Salva a classificação NLI de vários textos em um único round trip (pipeline)
+    
+    Args:
+        scores_by_text: Dict {texto: {label: score}}
+        hypotheses: Conjunto de hipóteses usado na classificação
+        model: Nome do modelo
+        ttl: Time to live em segundos (default: 14 dias)
+        
+    Returns:
+        True se salvou com sucesso
+    """
+    if redis_cache_client is None or not scores_by_text:
+        return False
+    
+    try:
+        prefix = _nli_set_key(hypotheses, model)
+        pipe = redis_cache_client.pipeline(transaction=False)
+        for text, scores in scores_by_text.items():
+            pipe.setex(f"{prefix}:{compute_text_hash(text)}", ttl, json.dumps({"scores": scores, "model": model}))
+        pipe.execute()
+        logger.debug(f"💾 NLI cache SAVED em lote: {len(scores_by_text)} textos")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Erro ao salvar NLI cache em lote: {e}")
+        return False
+
+
 # ============================================================================
 # ESTATÍSTICAS E MONITORAMENTO
 # ============================================================================
@@ -0,0 +1,124 @@
+"""
+Janelas deslizantes para textos longos (zero-shot e embeddings)
+
+O NLI trunca o texto no limite do modelo e o sentence-transformers corta
+em max_seq_length (128 tokens no MiniLM) sem avisar: o final de um bloco
+longo simplesmente não era considerado. Aqui cada texto acima do limite é
+dividido em janelas de tokens sobrepostas (recortes do texto original, pelos
+offsets do tokenizer), todas as janelas vão ao modelo no mesmo lote e os
+resultados são agregados de volta ao texto:
+
+- zero-shot: score de cada label = máximo ou média entre as janelas
+  (ZERO_SHOT_WINDOW_AGGREGATION);
+- embeddings: média ou máximo por dimensão dos embeddings das janelas
+  (SEMANTIC_WINDOW_POOLING).
+
+Textos curtos passam sem tokenização extra. Tokenizers sem offsets (lentos)
+não são divididos.
+"""
+import logging
+import os
+from typing import Callable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+ZERO_SHOT_WINDOW_TOKENS = int(os.getenv("ZERO_SHOT_WINDOW_TOKENS", "256"))  # tokens do texto por janela (a hipótese vai à parte)
+ZERO_SHOT_WINDOW_OVERLAP = int(os.getenv("ZERO_SHOT_WINDOW_OVERLAP", "32"))
+ZERO_SHOT_WINDOW_AGGREGATION = os.getenv("ZERO_SHOT_WINDOW_AGGREGATION", "max")  # max ou mean
+SEMANTIC_WINDOW_OVERLAP = int(os.getenv("SEMANTIC_WINDOW_OVERLAP", "16"))  # janela = max_seq_length do modelo
+SEMANTIC_WINDOW_POOLING = os.getenv("SEMANTIC_WINDOW_POOLING", "mean")  # mean ou max
+
+WINDOW_AGGREGATIONS = ("max", "mean")
+
+
+def split_windows(tokenizer, text: str, max_tokens: int, overlap: int) -> List[str]:
+    """
+    Divide o texto em janelas de até max_tokens tokens, com overlap tokens em comum
+
+    Returns:
+        Recortes do texto original ([text] se couber em uma janela)
+    """
+    # Cada token cobre ao menos ~1 caractere: textos curtos cabem sem tokenizar
+    if len(text) * 2 <= max_tokens or not getattr(tokenizer, "is_fast", False):
+        return [text]
+
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True,
+                        truncation=False)["offset_mapping"]
+    if len(offsets) <= max_tokens:
+        return [text]
+
+    step = max(max_tokens - overlap, 1)
+    windows = []
+    for start in range(0, len(offsets), step):
+        end = min(start + max_tokens, len(offsets))
+        windows.append(text[offsets[start][0]:offsets[end - 1][1]])
+        if end == len(offsets):
+            break
+    return windows
+
+
+def expand_windows(texts: Sequence[str], splitter: Callable[[str], List[str]]) -> Tuple[List[str], List[int]]:
+    """
+    Janelas de todos os textos em uma lista única (para um só lote)
+
+    Returns:
+        (janelas, dono) onde dono[i] é o índice do texto da janela i
+    """
+    windows: List[str] = []
+    owners: List[int] = []
+    for index, text in enumerate(texts):
+        parts = splitter(text)
+        windows.extend(parts)
+        owners.extend([index] * len(parts))
+    return windows, owners
+
+
+def aggregate_zero_shot(texts: Sequence[str], owners: List[int], results: Sequence[dict],
+                        aggregation: str = ZERO_SHOT_WINDOW_AGGREGATION, multi_label: bool = False) -> List[dict]:
+    """
+    Um resultado zero-shot por texto a partir dos resultados das janelas
+
+    Sem multi_label, os scores agregados são renormalizados para somar 1.
+    """
+    if len(owners) == len(texts):
+        return list(results)
+
+    grouped: List[List[dict]] = [[] for _ in texts]
+    for owner, result in zip(owners, results):
+        grouped[owner].append(result)
+
+    aggregated = []
+    for text, window_results in zip(texts, grouped):
+        if len(window_results) == 1:
+            aggregated.append({**window_results[0], "sequence": text})
+            continue
+        window_scores = [dict(zip(result["labels"], result["scores"])) for result in window_results]
+        scores = {}
+        for label in window_results[0]["labels"]:
+            values = [scores_by_label[label] for scores_by_label in window_scores]
+            scores[label] = max(values) if aggregation == "max" else sum(values) / len(values)
+        if not multi_label:
+            total = sum(scores.values()) or 1.0
+            scores = {label: score / total for label, score in scores.items()}
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        aggregated.append({
+            "sequence": text,
+            "labels": [label for label, _ in ranked],
+            "scores": [score for _, score in ranked],
+        })
+    return aggregated
+
+
+def pool_embeddings(count: int, owners: List[int], embeddings, pooling: str = SEMANTIC_WINDOW_POOLING):
+    """Um embedding por texto (média ou máximo por dimensão das janelas), mesmo tipo de tensor"""
+    import torch
+
+    if len(owners) == count:
+        return embeddings
+
+    owner_index = torch.tensor(owners, device=embeddings.device)
+    pooled = []
+    for index in range(count):
+        rows = embeddings[owner_index == index]
+        pooled.append(rows.max(dim=0).values if pooling == "max" else rows.mean(dim=0))
+    return torch.stack(pooled)
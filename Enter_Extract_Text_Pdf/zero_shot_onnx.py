@@ -0,0 +1,134 @@
+"""
+Backends do modelo zero-shot (NLI): transformers/PyTorch fp32 ou ONNX Runtime
+
+ZERO_SHOT_BACKEND escolhe como o mDeBERTa é servido:
+- torch: pipeline do transformers em PyTorch fp32 (padrão)
+- onnx: o mesmo modelo exportado para ONNX (fp32) e executado no ONNX Runtime
+- onnx-int8: exportação ONNX com quantização dinâmica int8 dos pesos
+
+Os dois backends ONNX dependem do optimum[onnxruntime] (opcional). Os
+modelos exportados ficam em ZERO_SHOT_ONNX_DIR; se não existirem, são
+exportados no startup (ou antes, com o comando abaixo).
+
+Uso:
+    python zero_shot_onnx.py export
+    python zero_shot_onnx.py export --model MoritzLaurer/mDeBERTa-v3-base-xnli-multilingual-nli-2mil7 --no-quantize
+"""
+import argparse
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+ZERO_SHOT_BACKEND = os.getenv("ZERO_SHOT_BACKEND", "torch").lower()
+ZERO_SHOT_ONNX_DIR = os.getenv("ZERO_SHOT_ONNX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "onnx"))
+# Conjunto de instruções alvo da quantização dinâmica: avx2 roda em qualquer x86 moderno; avx512_vnni/arm64 são mais rápidos onde existem
+ZERO_SHOT_ONNX_QUANT_ARCH = os.getenv("ZERO_SHOT_ONNX_QUANT_ARCH", "avx2")
+
+ZERO_SHOT_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+_QUANTIZED_FILE = "model_quantized.onnx"
+
+
+def model_tag(model_id: str, backend: str) -> str:
+    """Identificação do modelo servido (entra nas chaves do cache NLI: int8 gera scores diferentes)"""
+    return model_id if backend == "torch" else f"{model_id}@{backend}"
+
+
+def onnx_model_dir(model_id: str, quantized: bool) -> str:
+    """Diretório do modelo exportado (um por modelo e variante)"""
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "--", model_id)
+    return os.path.join(ZERO_SHOT_ONNX_DIR, name, "int8" if quantized else "fp32")
+
+
+def export_onnx(model_id: str, quantize: bool = True) -> str:
+    """
+    Exporta o modelo para ONNX (fp32) e, opcionalmente, gera a variante int8
+
+    Returns:
+        Diretório da variante pedida (int8 se quantize, senão fp32)
+
+    Raises:
+        ImportError: Se optimum[onnxruntime] não estiver instalado
+    """
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    fp32_dir = onnx_model_dir(model_id, quantized=False)
+    if not os.path.exists(os.path.join(fp32_dir, "model.onnx")):
+        logger.info(f"📦 Exportando {model_id} para ONNX em {fp32_dir}...")
+        model = ORTModelForSequenceClassification.from_pretrained(model_id, export=True)
+        model.save_pretrained(fp32_dir)
+        AutoTokenizer.from_pretrained(model_id).save_pretrained(fp32_dir)
+    if not quantize:
+        return fp32_dir
+
+    int8_dir = onnx_model_dir(model_id, quantized=True)
+    if not os.path.exists(os.path.join(int8_dir, _QUANTIZED_FILE)):
+        logger.info(f"📦 Quantizando {model_id} (int8 dinâmico, {ZERO_SHOT_ONNX_QUANT_ARCH}) em {int8_dir}...")
+        quantization_config = getattr(AutoQuantizationConfig, ZERO_SHOT_ONNX_QUANT_ARCH)(is_static=False, per_channel=False)
+        ORTQuantizer.from_pretrained(fp32_dir).quantize(save_dir=int8_dir, quantization_config=quantization_config)
+        AutoTokenizer.from_pretrained(fp32_dir).save_pretrained(int8_dir)
+    return int8_dir
+
+
+def load_zero_shot_pipeline(model_id: str, backend: str = ZERO_SHOT_BACKEND):
+    """
+    Carrega o pipeline zero-shot-classification no backend indicado
+
+    Raises:
+        ValueError: Backend desconhecido
+        ImportError: Backend ONNX sem optimum[onnxruntime]
+    """
+    from transformers import AutoTokenizer, pipeline
+
+    if backend not in ZERO_SHOT_BACKENDS:
+        raise ValueError(f"Backend zero-shot desconhecido: '{backend}' (opções: {', '.join(ZERO_SHOT_BACKENDS)})")
+
+    if backend == "torch":
+        return pipeline(
+            "zero-shot-classification",
+            model=model_id,
+            device=-1  # CPU (-1), para GPU use 0
+        )
+
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+
+    from cpu_layout import cpu_layout
+
+    quantized = backend == "onnx-int8"
+    model_dir = export_onnx(model_id, quantize=quantized)
+    # Threads do ONNX Runtime pelo plano de CPUs do worker (o padrão usa todos os núcleos do host)
+    session_options = onnxruntime.SessionOptions()
+    session_options.intra_op_num_threads = cpu_layout.intra_op_threads
+    session_options.inter_op_num_threads = cpu_layout.inter_op_threads
+    model = ORTModelForSequenceClassification.from_pretrained(
+        model_dir,
+        file_name=_QUANTIZED_FILE if quantized else "model.onnx",
+        session_options=session_options
+    )
+    return pipeline(
+        "zero-shot-classification",
+        model=model,
+        tokenizer=AutoTokenizer.from_pretrained(model_dir)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o modelo zero-shot para ONNX (fp32 e int8)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Exporta (e quantiza) o modelo")
+    export_parser.add_argument("--model", default=os.getenv("ZERO_SHOT_MODEL", "MoritzLaurer/mDeBERTa-v3-base-xnli-multilingual-nli-2mil7"))
+    export_parser.add_argument("--no-quantize", action="store_true", help="Apenas a exportação fp32")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    model_dir = export_onnx(args.model, quantize=not args.no_quantize)
+    print(f"✅ Modelo exportado em {model_dir}")
+
+
+if __name__ == "__main__":
+    main()
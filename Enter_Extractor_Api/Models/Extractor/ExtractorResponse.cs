@@ -12,6 +12,37 @@ namespace Enter_Extractor_Api.Models.Extractor
     {
         public string Text { get; set; } = string.Empty;
         public int CharCount { get; set; }
+
+        [JsonPropertyName("total_pages")]
+        public int TotalPages { get; set; }
+
+        [JsonPropertyName("pages_extracted")]
+        public int PagesExtracted { get; set; }
+
+        [JsonPropertyName("cached_pages")]
+        public int CachedPages { get; set; }
+
+        [JsonPropertyName("truncated")]
+        public bool Truncated { get; set; }
+
         public bool Success { get; set; }
     }
+
+    /// <summary>
+    /// Resultado de um documento no stream NDJSON de /extract-text/batch
+    /// </summary>
+    public class PdfBatchExtractionResult : PdfExtractionResponse
+    {
+        [JsonPropertyName("type")]
+        public string Type { get; set; } = string.Empty;
+
+        [JsonPropertyName("index")]
+        public int Index { get; set; }
+
+        [JsonPropertyName("id")]
+        public string Id { get; set; } = string.Empty;
+
+        [JsonPropertyName("detail")]
+        public string? Detail { get; set; }
+    }
 }
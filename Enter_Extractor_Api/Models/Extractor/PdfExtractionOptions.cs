@@ -0,0 +1,55 @@
+﻿using System.Text.Json.Serialization;
+
+namespace Enter_Extractor_Api.Models.Extractor
+{
+    /// <summary>
+    /// Limites opcionais da extração de texto do PDF (repassados ao /extract-text da API Python)
+    /// </summary>
+    public class PdfExtractionOptions
+    {
+        /// <summary>
+        /// Primeira página a extrair (base 1)
+        /// </summary>
+        [JsonPropertyName("page_start")]
+        public int? PageStart { get; set; }
+
+        /// <summary>
+        /// Última página a extrair (base 1, inclusiva)
+        /// </summary>
+        [JsonPropertyName("page_end")]
+        public int? PageEnd { get; set; }
+
+        /// <summary>
+        /// Máximo de páginas a extrair
+        /// </summary>
+        [JsonPropertyName("max_pages")]
+        public int? MaxPages { get; set; }
+
+        /// <summary>
+        /// Para a leitura de páginas quando o texto atinge N caracteres
+        /// </summary>
+        [JsonPropertyName("max_chars")]
+        public int? MaxChars { get; set; }
+
+        /// <summary>
+        /// Backend de extração da API Python (pypdf2, pymupdf ou pdfium); nulo usa o padrão do servidor
+        /// </summary>
+        [JsonPropertyName("backend")]
+        public string? Backend { get; set; }
+
+        /// <summary>
+        /// Query string equivalente (para o endpoint binário /extract-text/raw)
+        /// </summary>
+        public string ToQueryString()
+        {
+            var parameters = new List<string>();
+            if (PageStart.HasValue) parameters.Add($"page_start={PageStart.Value}");
+            if (PageEnd.HasValue) parameters.Add($"page_end={PageEnd.Value}");
+            if (MaxPages.HasValue) parameters.Add($"max_pages={MaxPages.Value}");
+            if (MaxChars.HasValue) parameters.Add($"max_chars={MaxChars.Value}");
+            if (!string.IsNullOrEmpty(Backend)) parameters.Add($"backend={Uri.EscapeDataString(Backend)}");
+
+            return parameters.Count > 0 ? "?" + string.Join("&", parameters) : string.Empty;
+        }
+    }
+}
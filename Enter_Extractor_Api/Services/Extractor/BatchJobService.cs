@@ -25,6 +25,8 @@ public class BatchJobService : IBatchJobService
     private readonly ILogger<BatchJobService> _logger;
     private readonly HttpClient _httpClient;
     private readonly string _pythonApiUrl;
+    private readonly bool _useRawUpload;
+    private readonly int _extractionBatchSize;
     private static readonly JsonSerializerOptions _jsonOptions = new()
     {
         PropertyNameCaseInsensitive = true
@@ -40,6 +42,8 @@ public class BatchJobService : IBatchJobService
         _logger = logger;
         _httpClient = httpClient;
         _pythonApiUrl = configuration["PythonApi:BaseUrl"] ?? "http://pdf-extractor:5000";
+        _useRawUpload = configuration.GetValue("PythonApi:UseRawUpload", true);
+        _extractionBatchSize = Math.Max(1, configuration.GetValue("PythonApi:ExtractionBatchSize", 8));
     }
 
     public string CreateJob(BatchJobRequest request)
@@ -85,8 +89,17 @@ public class BatchJobService : IBatchJobService
 
         var stopwatch = Stopwatch.StartNew();
 
+        // Textos extraídos por hash do PDF, obtidos em lotes (/extract-text/batch) a cada bloco de itens
+        var prefetchedTexts = new Dictionary<string, string>();
+
         for (int i = 0; i < request.PdfItems.Count; i++)
         {
+            if (i % _extractionBatchSize == 0)
+            {
+                prefetchedTexts = await PrefetchExtractedTextsAsync(
+                    request.PdfItems.Skip(i).Take(_extractionBatchSize).ToList());
+            }
+
             var pdfItem = request.PdfItems[i];
             var result = status.Results.FirstOrDefault(r => r.FileId == pdfItem.FileId);
             if (result == null) continue;
@@ -104,6 +117,7 @@ public class BatchJobService : IBatchJobService
 
                     var pdfBytes = Convert.FromBase64String(pdfItem.PdfBase64);
                     var pdfHash = cacheService.CalculatePdfHash(pdfBytes);
+                    var hasPrefetchedText = prefetchedTexts.TryGetValue(pdfHash, out var prefetchedText);
 
                     var schemaHash = !string.IsNullOrEmpty(pdfItem.SchemaHash)
                         ? pdfItem.SchemaHash
@@ -118,6 +132,7 @@ public class BatchJobService : IBatchJobService
                             pdfItem.ExtractionSchema,
                             schemaHash,
                             pdfBytes,
+                            prefetchedText,
                             labelDetectionService,
                             scope.ServiceProvider);
                     }
@@ -329,23 +344,17 @@ public class BatchJobService : IBatchJobService
                         continue;
                     }
 
-                    var extractedText = await cacheService.GetCachedExtractedTextAsync(pdfHash);
+                    var extractedText = hasPrefetchedText
+                        ? prefetchedText
+                        : await cacheService.GetCachedExtractedTextAsync(pdfHash);
 
-                    if (string.IsNullOrEmpty(extractedText))
+                    if (string.IsNullOrEmpty(extractedText) && !hasPrefetchedText)
                     {
+                        // Fallback individual: o PDF falhou no lote (ou o lote inteiro falhou)
 
-                        var requestPayload = new
-                        {
-                            pdf_base64 = pdfItem.PdfBase64
-                        };
-
-                        var jsonContent = JsonSerializer.Serialize(requestPayload, _jsonOptions);
-                        var httpContent = new StringContent(jsonContent, Encoding.UTF8, "application/json");
-
-                        using var httpRequest = new HttpRequestMessage(HttpMethod.Post, $"{_pythonApiUrl}/extract-text")
-                        {
-                            Content = httpContent
-                        };
+                        using var httpRequest = _useRawUpload
+                            ? PdfTextExtractor.CreateRawRequest(_pythonApiUrl, pdfBytes)
+                            : PdfTextExtractor.CreateBase64Request(_pythonApiUrl, pdfBytes);
 
                         var httpResponse = await _httpClient.SendAsync(httpRequest, HttpCompletionOption.ResponseHeadersRead)
                             .ConfigureAwait(false);
@@ -713,6 +722,70 @@ public class BatchJobService : IBatchJobService
         };
     }
 
+    /// <summary>
+    /// Obtém o texto dos PDFs de um bloco de itens: texto já cacheado ou, para os demais,
+    /// uma única chamada a /extract-text/batch (em vez de uma chamada por PDF).
+    /// Falhas não interrompem o job: os PDFs sem texto seguem pelo caminho individual.
+    /// </summary>
+    private async Task<Dictionary<string, string>> PrefetchExtractedTextsAsync(IReadOnlyList<BatchPdfItem> pdfItems)
+    {
+        var texts = new Dictionary<string, string>();
+
+        try
+        {
+            using var scope = _serviceScopeFactory.CreateScope();
+            var cacheService = scope.ServiceProvider.GetRequiredService<IExtractionCacheService>();
+            var pdfExtractor = scope.ServiceProvider.GetRequiredService<IPdfTextExtractor>();
+
+            var documents = new List<(string Id, byte[] PdfBytes)>();
+            foreach (var pdfItem in pdfItems)
+            {
+                var pdfBytes = Convert.FromBase64String(pdfItem.PdfBase64);
+                var pdfHash = cacheService.CalculatePdfHash(pdfBytes);
+                if (texts.ContainsKey(pdfHash) || documents.Any(document => document.Id == pdfHash))
+                {
+                    continue;
+                }
+
+                var cachedText = await cacheService.GetCachedExtractedTextAsync(pdfHash);
+                if (!string.IsNullOrEmpty(cachedText))
+                {
+                    texts[pdfHash] = cachedText;
+                    continue;
+                }
+
+                documents.Add((pdfHash, pdfBytes));
+            }
+
+            if (documents.Count == 0)
+            {
+                return texts;
+            }
+
+            await foreach (var item in pdfExtractor.ExtractTextBatchAsync(documents).ConfigureAwait(false))
+            {
+                if (item.Success)
+                {
+                    texts[item.Id] = item.Text ?? string.Empty;
+                }
+                else
+                {
+                    _logger.LogWarning("Batch extraction failed for PDF {PdfHash}: {Detail}",
+                        item.Id.Length >= 8 ? item.Id[..8] : item.Id, item.Detail);
+                }
+            }
+
+            _logger.LogDebug("Batch extraction: {Extracted}/{Requested} PDFs in one call",
+                documents.Count(document => texts.ContainsKey(document.Id)), documents.Count);
+        }
+        catch (Exception ex)
+        {
+            _logger.LogWarning(ex, "Batch text extraction failed; falling back to per-PDF extraction");
+        }
+
+        return texts;
+    }
+
     /// <summary>
     /// 🔥 FIRE-AND-FORGET: Detecta labels em background e salva no cache Redis
     /// Não bloqueia o fluxo principal de extração
@@ -723,6 +796,7 @@ public class BatchJobService : IBatchJobService
         Dictionary<string, string?> schema,
         string schemaHash,
         byte[] pdfBytes,
+        string? extractedText,
         Services.LabelDetection.ILabelDetectionService labelDetectionService,
         IServiceProvider serviceProvider)
     {
@@ -739,9 +813,12 @@ public class BatchJobService : IBatchJobService
                         pdfHash[..8],
                         schemaHash[..8]);
 
-                    // 1. Extrair texto do PDF
-                    var pdfExtractor = serviceProvider.GetRequiredService<IPdfTextExtractor>();
-                    var extractedText = await pdfExtractor.ExtractTextAsync(pdfBytes);
+                    // 1. Extrair texto do PDF (se não veio do lote)
+                    if (extractedText == null)
+                    {
+                        var pdfExtractor = serviceProvider.GetRequiredService<IPdfTextExtractor>();
+                        extractedText = await pdfExtractor.ExtractTextAsync(pdfBytes);
+                    }
 
                     if (string.IsNullOrWhiteSpace(extractedText))
                     {
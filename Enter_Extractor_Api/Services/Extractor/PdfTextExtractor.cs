@@ -1,5 +1,7 @@
 ﻿using Enter_Extractor_Api.Models.Extractor;
 using System.Buffers;
+using System.Net.Http.Headers;
+using System.Runtime.CompilerServices;
 using System.Text;
 using System.Text.Json;
 
@@ -8,7 +10,16 @@ namespace Enter_Extractor_Api.Services.Extractor
 
     public interface IPdfTextExtractor
     {
-        ValueTask<string> ExtractTextAsync(byte[] pdfBytes);
+        ValueTask<string> ExtractTextAsync(byte[] pdfBytes, PdfExtractionOptions? options = null);
+
+        /// <summary>
+        /// Extrai vários PDFs em uma única chamada (/extract-text/batch), entregando os resultados
+        /// na ordem em que ficam prontos. Falhas são reportadas por item (Success = false).
+        /// </summary>
+        IAsyncEnumerable<PdfBatchExtractionResult> ExtractTextBatchAsync(
+            IReadOnlyList<(string Id, byte[] PdfBytes)> documents,
+            PdfExtractionOptions? options = null,
+            CancellationToken cancellationToken = default);
     }
 
     public class PdfTextExtractor : IPdfTextExtractor
@@ -16,6 +27,7 @@ namespace Enter_Extractor_Api.Services.Extractor
         private readonly ILogger<PdfTextExtractor> _logger;
         private readonly HttpClient _httpClient;
         private readonly string _pythonApiUrl;
+        private readonly bool _useRawUpload;
         private static readonly JsonSerializerOptions _jsonOptions = new()
         {
             PropertyNameCaseInsensitive = true
@@ -26,27 +38,17 @@ namespace Enter_Extractor_Api.Services.Extractor
             _logger = logger;
             _httpClient = httpClient;
             _pythonApiUrl = configuration["PythonApi:BaseUrl"] ?? "http://pdf-extractor:5000";
+            _useRawUpload = configuration.GetValue("PythonApi:UseRawUpload", true);
         }
 
-        public async ValueTask<string> ExtractTextAsync(byte[] pdfBytes)
+        public async ValueTask<string> ExtractTextAsync(byte[] pdfBytes, PdfExtractionOptions? options = null)
         {
             try
             {
-                var pdfBase64 = Convert.ToBase64String(pdfBytes);
-
-                var requestPayload = new
-                {
-                    pdf_base64 = pdfBase64
-                };
-
-                var jsonContent = JsonSerializer.Serialize(requestPayload, _jsonOptions);
-                var httpContent = new StringContent(jsonContent, Encoding.UTF8, "application/json");
-
-                // Chamar a API Python com ConfigureAwait(false) para melhor performance
-                using var request = new HttpRequestMessage(HttpMethod.Post, $"{_pythonApiUrl}/extract-text")
-                {
-                    Content = httpContent
-                };
+                // Upload binário (/extract-text/raw) evita o overhead do base64 no fio e no parse JSON
+                using var request = _useRawUpload
+                    ? CreateRawRequest(_pythonApiUrl, pdfBytes, options)
+                    : CreateBase64Request(_pythonApiUrl, pdfBytes, options);
 
                 var response = await _httpClient.SendAsync(request, HttpCompletionOption.ResponseHeadersRead)
                     .ConfigureAwait(false);
@@ -65,6 +67,12 @@ namespace Enter_Extractor_Api.Services.Extractor
                     throw new InvalidOperationException("Failed to parse extraction result from Python API");
                 }
 
+                if (extractionResult.Truncated)
+                {
+                    _logger.LogDebug("Extração parcial: {PagesExtracted}/{TotalPages} páginas",
+                        extractionResult.PagesExtracted, extractionResult.TotalPages);
+                }
+
                 return extractionResult.Text;
             }
             catch (HttpRequestException ex)
@@ -78,5 +86,142 @@ namespace Enter_Extractor_Api.Services.Extractor
                 throw new InvalidOperationException("Failed to extract text from PDF", ex);
             }
         }
+
+        public async IAsyncEnumerable<PdfBatchExtractionResult> ExtractTextBatchAsync(
+            IReadOnlyList<(string Id, byte[] PdfBytes)> documents,
+            PdfExtractionOptions? options = null,
+            [EnumeratorCancellation] CancellationToken cancellationToken = default)
+        {
+            if (documents.Count == 0)
+            {
+                yield break;
+            }
+
+            using var request = _useRawUpload
+                ? CreateMultipartBatchRequest(_pythonApiUrl, documents, options)
+                : CreateBase64BatchRequest(_pythonApiUrl, documents, options);
+
+            using var response = await _httpClient.SendAsync(request, HttpCompletionOption.ResponseHeadersRead, cancellationToken)
+                .ConfigureAwait(false);
+
+            if (!response.IsSuccessStatusCode)
+            {
+                var errorContent = await response.Content.ReadAsStringAsync(cancellationToken).ConfigureAwait(false);
+                _logger.LogError("Batch extraction failed. API returned {StatusCode}: {Error}", response.StatusCode, errorContent);
+                throw new InvalidOperationException($"Failed to extract text from PDF batch. API returned {response.StatusCode}");
+            }
+
+            await using var stream = await response.Content.ReadAsStreamAsync(cancellationToken).ConfigureAwait(false);
+            using var reader = new StreamReader(stream, Encoding.UTF8);
+
+            // Resposta NDJSON: uma linha por documento + linha final "complete"
+            string? line;
+            while ((line = await reader.ReadLineAsync(cancellationToken).ConfigureAwait(false)) != null)
+            {
+                if (string.IsNullOrWhiteSpace(line))
+                {
+                    continue;
+                }
+
+                var item = JsonSerializer.Deserialize<PdfBatchExtractionResult>(line, _jsonOptions);
+                if (item == null || item.Type == "complete")
+                {
+                    continue;
+                }
+
+                yield return item;
+            }
+        }
+
+        /// <summary>
+        /// Monta a requisição multipart (um arquivo por documento) para /extract-text/batch
+        /// </summary>
+        internal static HttpRequestMessage CreateMultipartBatchRequest(
+            string pythonApiUrl,
+            IReadOnlyList<(string Id, byte[] PdfBytes)> documents,
+            PdfExtractionOptions? options = null)
+        {
+            var multipart = new MultipartFormDataContent();
+            foreach (var (id, pdfBytes) in documents)
+            {
+                var fileContent = new ByteArrayContent(pdfBytes);
+                fileContent.Headers.ContentType = new MediaTypeHeaderValue("application/pdf");
+                multipart.Add(fileContent, "files", id);
+            }
+
+            var query = options?.ToQueryString() ?? string.Empty;
+            return new HttpRequestMessage(HttpMethod.Post, $"{pythonApiUrl}/extract-text/batch{query}")
+            {
+                Content = multipart
+            };
+        }
+
+        /// <summary>
+        /// Monta a requisição JSON (pdf_base64 por documento) para /extract-text/batch
+        /// </summary>
+        internal static HttpRequestMessage CreateBase64BatchRequest(
+            string pythonApiUrl,
+            IReadOnlyList<(string Id, byte[] PdfBytes)> documents,
+            PdfExtractionOptions? options = null)
+        {
+            var requestPayload = new
+            {
+                documents = documents.Select(document => new
+                {
+                    id = document.Id,
+                    pdf_base64 = Convert.ToBase64String(document.PdfBytes),
+                    page_start = options?.PageStart,
+                    page_end = options?.PageEnd,
+                    max_pages = options?.MaxPages,
+                    max_chars = options?.MaxChars,
+                    backend = options?.Backend
+                })
+            };
+
+            var jsonContent = JsonSerializer.Serialize(requestPayload, _jsonOptions);
+            return new HttpRequestMessage(HttpMethod.Post, $"{pythonApiUrl}/extract-text/batch")
+            {
+                Content = new StringContent(jsonContent, Encoding.UTF8, "application/json")
+            };
+        }
+
+        /// <summary>
+        /// Monta a requisição binária (application/pdf) para /extract-text/raw
+        /// </summary>
+        internal static HttpRequestMessage CreateRawRequest(string pythonApiUrl, byte[] pdfBytes, PdfExtractionOptions? options = null)
+        {
+            var httpContent = new ByteArrayContent(pdfBytes);
+            httpContent.Headers.ContentType = new MediaTypeHeaderValue("application/pdf");
+
+            var query = options?.ToQueryString() ?? string.Empty;
+            return new HttpRequestMessage(HttpMethod.Post, $"{pythonApiUrl}/extract-text/raw{query}")
+            {
+                Content = httpContent
+            };
+        }
+
+        /// <summary>
+        /// Monta a requisição JSON legada (pdf_base64) para /extract-text
+        /// </summary>
+        internal static HttpRequestMessage CreateBase64Request(string pythonApiUrl, byte[] pdfBytes, PdfExtractionOptions? options = null)
+        {
+            var requestPayload = new
+            {
+                pdf_base64 = Convert.ToBase64String(pdfBytes),
+                page_start = options?.PageStart,
+                page_end = options?.PageEnd,
+                max_pages = options?.MaxPages,
+                max_chars = options?.MaxChars,
+                backend = options?.Backend
+            };
+
+            var jsonContent = JsonSerializer.Serialize(requestPayload, _jsonOptions);
+            var httpContent = new StringContent(jsonContent, Encoding.UTF8, "application/json");
+
+            return new HttpRequestMessage(HttpMethod.Post, $"{pythonApiUrl}/extract-text")
+            {
+                Content = httpContent
+            };
+        }
     }
 }
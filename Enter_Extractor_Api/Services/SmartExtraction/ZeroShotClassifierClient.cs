@@ -10,6 +10,8 @@ public interface IZeroShotClassifier
     Task<Dictionary<string, float>> ClassifyMultipleAsync(string premise, params string[] hypotheses);
     Task<ClassificationResult> ClassifyBestMatchAsync(string text, params string[] candidateLabels);
     Task<BinaryClassificationResult> IsCategoryOfAsync(string text, string category);
+    Task<List<ClassificationResult>> ClassifyBestMatchBatchAsync(IReadOnlyList<string> texts, params string[] candidateLabels);
+    Task<List<BinaryClassificationResult>> IsCategoryOfBatchAsync(IReadOnlyList<(string Text, string Category)> items);
     bool IsReady { get; }
 }
 
@@ -194,6 +196,104 @@ public class ZeroShotClassifierClient : IZeroShotClassifier
             throw;
         }
     }
+
+    // Vários textos em uma única chamada (o modelo processa os pares em lote)
+    public async Task<List<ClassificationResult>> ClassifyBestMatchBatchAsync(IReadOnlyList<string> texts, params string[] candidateLabels)
+    {
+        try
+        {
+            _logger.LogInformation("🔍 Classificando {Count} textos em lote com {Labels} labels",
+                texts.Count, candidateLabels.Length);
+
+            var request = new ZeroShotBatchRequest
+            {
+                Texts = texts.ToList(),
+                CandidateLabels = candidateLabels.ToList(),
+                HypothesisTemplate = "Este texto é sobre {}",
+                MultiLabel = false
+            };
+
+            var result = await PostAsync<ZeroShotBatchRequest, ZeroShotBatchResponse>("/zero-shot/classify/batch", request);
+
+            return result.Results.Select(item =>
+            {
+                var allScores = new Dictionary<string, float>();
+                for (int i = 0; i < item.Labels.Count; i++)
+                {
+                    allScores[item.Labels[i]] = item.Scores[i];
+                }
+
+                return new ClassificationResult
+                {
+                    Text = item.Text,
+                    PredictedLabel = item.BestLabel,
+                    Confidence = item.BestScore,
+                    AllScores = allScores
+                };
+            }).ToList();
+        }
+        catch (Exception ex)
+        {
+            _logger.LogError(ex, "Erro ao classificar textos em lote");
+            throw;
+        }
+    }
+
+    // Vários pares texto/categoria em uma única chamada (resultados na ordem enviada)
+    public async Task<List<BinaryClassificationResult>> IsCategoryOfBatchAsync(IReadOnlyList<(string Text, string Category)> items)
+    {
+        try
+        {
+            _logger.LogInformation("✓ Validando {Count} pares em lote", items.Count);
+
+            var request = new BinaryClassificationBatchRequest
+            {
+                Items = items.Select(item => new BinaryClassificationItem
+                {
+                    Text = item.Text,
+                    Category = item.Category
+                }).ToList(),
+                HypothesisTemplate = "Este texto é {}"
+            };
+
+            var result = await PostAsync<BinaryClassificationBatchRequest, BinaryClassificationBatchResponse>("/zero-shot/validate/batch", request);
+
+            return result.Results.Select(item => new BinaryClassificationResult
+            {
+                Text = item.Text,
+                Category = item.Category,
+                IsCategory = item.IsCategory,
+                Confidence = item.Confidence
+            }).ToList();
+        }
+        catch (Exception ex)
+        {
+            _logger.LogError(ex, "Erro ao validar pares em lote");
+            throw;
+        }
+    }
+
+    private async Task<TResponse> PostAsync<TRequest, TResponse>(string path, TRequest request)
+    {
+        var json = JsonSerializer.Serialize(request);
+        var content = new StringContent(json, Encoding.UTF8, "application/json");
+        var response = await _httpClient.PostAsync(path, content);
+
+        if (!response.IsSuccessStatusCode)
+        {
+            var error = await response.Content.ReadAsStringAsync();
+            _logger.LogError("Erro em {Path}: {StatusCode} - {Error}", path, response.StatusCode, error);
+            throw new HttpRequestException($"Erro em {path}: {response.StatusCode}");
+        }
+
+        var resultJson = await response.Content.ReadAsStringAsync();
+        var result = JsonSerializer.Deserialize<TResponse>(resultJson, new JsonSerializerOptions
+        {
+            PropertyNameCaseInsensitive = true
+        });
+
+        return result ?? throw new InvalidOperationException("Resposta inválida da API Python");
+    }
 }
 
 // DTOs para comunicação com a API Python
@@ -245,6 +345,63 @@ internal class BinaryClassificationRequest
     public string HypothesisTemplate { get; set; } = "Este texto é {}";
 }
 
+internal class ZeroShotBatchRequest
+{
+    [JsonPropertyName("texts")]
+    public List<string> Texts { get; set; } = new();
+
+    [JsonPropertyName("candidate_labels")]
+    public List<string> CandidateLabels { get; set; } = new();
+
+    [JsonPropertyName("hypothesis_template")]
+    public string HypothesisTemplate { get; set; } = "Este texto é sobre {}";
+
+    [JsonPropertyName("multi_label")]
+    public bool MultiLabel { get; set; } = false;
+}
+
+internal class ZeroShotBatchResponse
+{
+    [JsonPropertyName("results")]
+    public List<ZeroShotResponse> Results { get; set; } = new();
+
+    [JsonPropertyName("total")]
+    public int Total { get; set; }
+
+    [JsonPropertyName("processing_time_ms")]
+    public int ProcessingTimeMs { get; set; }
+}
+
+internal class BinaryClassificationItem
+{
+    [JsonPropertyName("text")]
+    public string Text { get; set; } = string.Empty;
+
+    [JsonPropertyName("category")]
+    public string Category { get; set; } = string.Empty;
+}
+
+internal class BinaryClassificationBatchRequest
+{
+    [JsonPropertyName("items")]
+    public List<BinaryClassificationItem> Items { get; set; } = new();
+
+    [JsonPropertyName("hypothesis_template")]
+    public string HypothesisTemplate { get; set; } = "Este texto é {}";
+}
+
+internal class BinaryClassificationBatchResponse
+{
+    [JsonPropertyName("results")]
+    public List<BinaryClassificationResponse> Results { get; set; } = new();
+
+    [JsonPropertyName("total")]
+    public int Total { get; set; }
+
+    [JsonPropertyName("processing_time_ms")]
+    public int ProcessingTimeMs { get; set; }
+}
+
 internal class BinaryClassificationResponse
 {
     [JsonPropertyName("text")]